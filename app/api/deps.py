@@ -10,6 +10,7 @@ from app.provisioner.manager import ProvisionManager
 from app.dao.api_keys_dao import get_api_key_for_verification
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.milvus.searching import SearchOps
+from app.embeddings.cache import EmbeddingCache
 
 
 oauth2_scheme = HTTPBearer(auto_error=False)
@@ -51,11 +52,18 @@ def get_search_ops(request: Request) -> SearchOps:
     return request.app.state.search_ops
 
 
+def get_embedding_cache(request: Request) -> EmbeddingCache:
+    if not hasattr(request.app.state, "embedding_cache"):
+        raise RuntimeError("EmbeddingCache not initialized. Check lifespan events")
+    return request.app.state.embedding_cache
+
+
 SessionDep = Annotated[AsyncSession, Depends(get_db)]
 TokenDep = Annotated[TokenManager, Depends(get_token_manager)]
 AwsDep = Annotated[AwsClientManager, Depends(get_aws_client_manager)]
 ProvisionDep = Annotated[ProvisionManager, Depends(get_provision_manager)]
 SearchOpsDep = Annotated[SearchOps, Depends(get_search_ops)]
+EmbeddingCacheDep = Annotated[EmbeddingCache, Depends(get_embedding_cache)]
 
 
 async def get_token_payload(
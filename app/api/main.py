@@ -8,6 +8,8 @@ from app.api.routes import knowledge_base_ops
 from app.api.routes import ingestion
 from app.api.routes import pool_stats
 from app.api.routes import search
+from app.api.routes import embedding_cache
+from app.api.routes import metrics
 
 api_router = APIRouter()
 api_router.include_router(health.router)
@@ -18,3 +20,5 @@ api_router.include_router(knowledge_base_ops.router)
 api_router.include_router(ingestion.router)
 api_router.include_router(pool_stats.router)
 api_router.include_router(search.router)
+api_router.include_router(embedding_cache.router)
+api_router.include_router(metrics.router)
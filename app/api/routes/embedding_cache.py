@@ -0,0 +1,27 @@
+import logging
+from fastapi import APIRouter, status, HTTPException
+from app.dao.models import EmbeddingCacheStats
+from app.api.deps import TokenPayloadDep, EmbeddingCacheDep
+from app.dao.schema import ClientRoleEnum
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/embeddings", tags=["embeddings"])
+
+
+@router.get(
+    "/cache/stats",
+    response_model=EmbeddingCacheStats,
+    status_code=status.HTTP_200_OK,
+    summary="embedding cache hit and miss counters",
+)
+async def get_embedding_cache_stats(
+    payload: TokenPayloadDep, embedding_cache: EmbeddingCacheDep
+):
+    if payload.role != ClientRoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="you are not authorized to perform this action",
+        )
+
+    return embedding_cache.stats()
@@ -1,10 +1,44 @@
-from fastapi import APIRouter
-from app.dao.models import StandardResponse
+from fastapi import APIRouter, Depends, Request
+from app.api.deps import get_api_payload
+from app.dao.models import (
+    StandardResponse,
+    EventLoopLagStats,
+    EmbeddingGatewayStats,
+    SqsConsumerStats,
+)
 from typing import Any
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
 
+# liveness stays open, the internals below need an api key like the rest of the api
 @router.get("/", response_model=StandardResponse)
 def server_health_check() -> Any:
     return StandardResponse(message="server healthy, up and running")
+
+
+@router.get(
+    "/loop",
+    response_model=EventLoopLagStats,
+    dependencies=[Depends(get_api_payload)],
+)
+def event_loop_lag(request: Request) -> Any:
+    return request.app.state.loop_monitor.stats()
+
+
+@router.get(
+    "/embeddings",
+    response_model=EmbeddingGatewayStats,
+    dependencies=[Depends(get_api_payload)],
+)
+def embedding_gateway(request: Request) -> Any:
+    return request.app.state.embedding_gateway.stats()
+
+
+@router.get(
+    "/consumer",
+    response_model=SqsConsumerStats,
+    dependencies=[Depends(get_api_payload)],
+)
+def sqs_consumer(request: Request) -> Any:
+    return request.app.state.consumer_manager.stats()
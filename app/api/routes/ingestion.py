@@ -56,6 +56,7 @@ async def ingest_documents(
             kb_id=req.kb_id,
             job_resource_id=job_resource_id,
             user_id=payload.user_id,
+            parsing_tier=req.parsing_tier,
         )
 
         if result.documents:
@@ -66,6 +67,11 @@ async def ingest_documents(
                 category=result.category,
                 user_id=result.user_id,
                 kb_id=result.kb_id,
+                parsing_tier=result.parsing_tier,
+                dimension=result.dimension,
+                search_method=result.search_method,
+                chunking_strategy=result.chunking_strategy,
+                deduplicate_chunks=result.deduplicate_chunks,
             )
 
             aws_client.send_sqs_message(message_body=message)
@@ -146,6 +152,8 @@ async def delete_ingested_data(
                 category=result.category,
                 user_id=result.user_id,
                 kb_id=result.kb_id,
+                dimension=result.dimension,
+                search_method=result.search_method,
             )
 
             aws_client.send_sqs_message(message_body=message)
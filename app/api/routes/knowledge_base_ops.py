@@ -5,6 +5,7 @@ from sqlalchemy.exc import NoResultFound
 from app.api.deps import SessionDep, TokenPayloadDep, ProvisionDep
 from app.dao.knowledge_base_dao import (
     KnowledgeBaseAlreadyExists,
+    NoCollectionAvailable,
     create_kb_db,
     delete_kb_db,
     list_users_kb,
@@ -42,8 +43,21 @@ async def create_knowledge_base(
             name=req.name,
             category=req.category,
             type=req.type,
+            parsing_tier=req.parsing_tier,
+            chunking_strategy=req.chunking_strategy,
+            deduplicate_chunks=req.deduplicate_chunks,
+            dimension=req.dimension,
         )
-        created_kb = await create_kb_db(db=db, kb=args)
+        try:
+            created_kb = await create_kb_db(db=db, kb=args)
+        except NoCollectionAvailable as e:
+            # only the default dimension has a warm pool, anything else gets a
+            # collection provisioned on demand
+            logger.info(f"{e}, provisioning one for this knowledge base")
+            await provisioner.provision_new_collection(
+                search_method=req.type, dimension=req.dimension
+            )
+            created_kb = await create_kb_db(db=db, kb=args)
         provisioner.trigger_reconcilation()
         return CreatedKb(
             message="succcessfully created knowledge base",
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.api.deps import get_api_payload
+
+router = APIRouter(tags=["Metrics"], dependencies=[Depends(get_api_payload)])
+
+
+@router.get("/metrics", response_class=Response)
+def get_metrics() -> Response:
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
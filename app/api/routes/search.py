@@ -29,14 +29,17 @@ async def search(
                 detail="please provide knowledge base id",
             )
 
-        collection_name = await get_kb_collection(
+        kb_collection = await get_kb_collection(
             db=db, user_id=payload.user_id, kb_id=req.knowledge_base_id
         )
 
-        search_result = search_ops.perform_hybrid_search(
-            collection_name=collection_name,
+        search_result = await search_ops.perform_hybrid_search(
+            collection_name=kb_collection.collection_name,
+            dimension=kb_collection.dimension,
+            search_method=kb_collection.search_method,
             query=req.user_query,
             limit=req.search_limit,
+            rerank=req.rerank,
         )
 
         if len(search_result) == 0:
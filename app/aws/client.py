@@ -1,13 +1,19 @@
 import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import IO, Any, Dict, List, Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
 from pydantic import ValidationError
 
 from app.constants.content_type import S3_CONTENT_TYPE_MAP
+from app.constants.globals import (
+    S3_MULTIPART_THRESHOLD,
+    S3_MULTIPART_CHUNKSIZE,
+    S3_TRANSFER_MAX_CONCURRENCY,
+)
 from app.core.config import Settings
 from app.dao.models import ReceivedSqsMessage, SqsMessage
 
@@ -85,6 +91,12 @@ class AwsClientManager:
             logger.info("using default aws credentials provider")
 
         self.session = boto3.Session(**self.session_kwargs)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=S3_TRANSFER_MAX_CONCURRENCY,
+            use_threads=True,
+        )
         self._kms_client = None
         self._s3_client = None
         self._sqs_client = None
@@ -297,7 +309,10 @@ class AwsClientManager:
     def download_file(self, object_key: str, temp_file_path: str):
         try:
             self.s3.download_file(
-                self.settings.AWS_BUCKET_NAME, object_key, temp_file_path
+                self.settings.AWS_BUCKET_NAME,
+                object_key,
+                temp_file_path,
+                Config=self.transfer_config,
             )
             logger.debug(f"downloaded the file: {object_key}")
         except ClientError as e:
@@ -306,6 +321,30 @@ class AwsClientManager:
                 f"error downloading file: {str(e)}", object_key=object_key
             )
 
+    def get_object_size(self, object_key: str) -> int:
+        try:
+            response = self.s3.head_object(
+                Bucket=self.settings.AWS_BUCKET_NAME, Key=object_key
+            )
+            return response["ContentLength"]
+        except ClientError as e:
+            self._handle_client_error(e, "object size lookup", object_key)
+
+    def download_fileobj(self, object_key: str, fileobj: IO[bytes]):
+        try:
+            self.s3.download_fileobj(
+                self.settings.AWS_BUCKET_NAME,
+                object_key,
+                fileobj,
+                Config=self.transfer_config,
+            )
+            logger.debug(f"streamed the file into memory: {object_key}")
+        except ClientError as e:
+            logger.error("error streaming file", extra={"error": str(e)})
+            raise S3OperationError(
+                f"error streaming file: {str(e)}", object_key=object_key
+            )
+
     def _format_message_attributes(
         self, attributes: Dict[str, Any]
     ) -> Dict[str, Dict[str, str]]:
@@ -373,6 +412,7 @@ class AwsClientManager:
                 "QueueUrl": self.settings.AWS_QUEUE_URL,
                 "MaxNumberOfMessages": min(max_messages, 10),
                 "WaitTimeSeconds": min(wait_time_seconds, 20),
+                "AttributeNames": ["SentTimestamp", "ApproximateReceiveCount"],
             }
 
             if message_attribute_names:
@@ -435,3 +475,30 @@ class AwsClientManager:
         except Exception as e:
             logger.error("unexpected error deleting message", exc_info=True)
             raise SqsMessageError(f"unexpected error: {e}")
+
+    def change_message_visibility(
+        self, receipt_handle: str, visibility_timeout: int
+    ) -> bool:
+        try:
+
+            self.sqs.change_message_visibility(
+                QueueUrl=self.settings.AWS_QUEUE_URL,
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=visibility_timeout,
+            )
+
+            logger.debug(f"message visibility extended by {visibility_timeout}s")
+            return True
+        except ClientError as e:
+            error_code = e.response.get("Error", {}).get("Code", "Unknown")
+            error_message = e.response.get("Error", {}).get("Message", str(e))
+
+            logger.error(f"failed to change message visibility: {error_message}")
+            raise SqsMessageError(
+                f"failed to change message visibility: {error_message}",
+                error_code=error_code,
+            )
+
+        except Exception as e:
+            logger.error("unexpected error changing message visibility", exc_info=True)
+            raise SqsMessageError(f"unexpected error: {e}")
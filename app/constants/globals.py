@@ -1,5 +1,33 @@
+import os
+
 GRADIENT_BREAKPOINT = "gradient"
+REUSE_SENTENCE_EMBEDDINGS = False
+MAX_CHUNKING_CONCURRENCY = 8
+RECURSIVE_PARENT_CHUNK_TOKENS = 1024
+RECURSIVE_PARENT_CHUNK_OVERLAP = 0
+RECURSIVE_CHILD_CHUNK_TOKENS = 256
+RECURSIVE_CHILD_CHUNK_OVERLAP = 32
+NEAR_DUPLICATE_SHINGLE_SIZE = 3
+NEAR_DUPLICATE_BANDS = 4
+NEAR_DUPLICATE_MAX_DISTANCE = 3
+NEAR_DUPLICATE_MIN_WORDS = 8
+INGESTION_STREAM_BATCH_CHARS = 2_000_000
+INGESTION_STREAM_PREFETCH_BATCHES = 2
+TEXT_STREAM_BLOCK_CHARS = 200_000
+
+SQS_VISIBILITY_TIMEOUT_SECONDS = 300
+SQS_VISIBILITY_HEARTBEAT_SECONDS = 60
+SQS_MAX_IN_FLIGHT_JOBS = 4
+SQS_MAX_RECEIVE_BATCH = 10
+SQS_MAX_WAIT_SECONDS = 20
+SQS_BUSY_WAIT_SECONDS = 1
+SQS_RECEIVE_ERROR_BACKOFF_SECONDS = 5
+
+SENTENCE_SPLIT_PROCESSES = max(1, (os.cpu_count() or 1) // 2)
+SENTENCE_SPLIT_BATCH_SIZE = 64
+SENTENCE_SPLIT_POOL_MIN_CHARS = 200_000
 MODEL_DIMENSION = 3072
+EMBEDDING_DIMENSIONS = (256, 512, 1024, 3072)
 
 POOL_FLAT = 10
 POOL_HNSW = 5
@@ -10,5 +38,55 @@ MAX_CONCURRENT_PROVISIONER = 10
 TIME_THRESHOLD = 12
 
 HNSW_EF = 10
+BIN_IVF_NLIST = 128
+BIN_IVF_NPROBE = 16
+SEARCH_RERANK_CANDIDATE_FACTOR = 4
+SEARCH_RERANK_MAX_CANDIDATES = 200
 SPARSE_DROP_RATIO = 0.2
-RERANKER_SMOOTHING_PARAMETERS = 60
\ No newline at end of file
+RERANKER_SMOOTHING_PARAMETERS = 60
+
+EMBEDDING_CACHE_MEMORY_BYTES = 256 * 1024 * 1024
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000
+EMBEDDING_CACHE_LOOKUP_BATCH = 1000
+EMBEDDING_MAX_TOKENS_PER_REQUEST = 250_000
+EMBEDDING_MAX_TOKENS_PER_INPUT = 8191
+EMBEDDING_MAX_INPUTS_PER_REQUEST = 2048
+EMBEDDING_MAX_IN_FLIGHT_REQUESTS = 4
+EMBEDDING_RETRY_ATTEMPTS = 5
+EMBEDDING_RETRY_MAX_WAIT = 30
+EMBEDDING_REQUESTS_PER_MINUTE = 5000
+EMBEDDING_TOKENS_PER_MINUTE = 5_000_000
+EMBEDDING_GATEWAY_INITIAL_CONCURRENCY = 4
+EMBEDDING_GATEWAY_MIN_CONCURRENCY = 1
+EMBEDDING_GATEWAY_MAX_CONCURRENCY = 32
+EMBEDDING_GATEWAY_RESERVED_INTERACTIVE_SLOTS = 1
+EMBEDDING_GATEWAY_RATE_LIMIT_RETRIES = 5
+LOCAL_EMBEDDING_BATCH_SIZE = 64
+LOCAL_EMBEDDING_MAX_SEQ_LENGTH = 256
+
+LOOP_LAG_SAMPLE_INTERVAL = 0.1
+LOOP_LAG_BUDGET_SECONDS = 0.1
+LOOP_LAG_WINDOW_SIZE = 600
+
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+SCRATCH_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+S3_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+S3_MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+S3_TRANSFER_MAX_CONCURRENCY = 8
+PREFETCH_MAX_BYTES_IN_FLIGHT = 1024 * 1024 * 1024
+PREFETCH_MAX_DOWNLOADS = 4
+
+MILVUS_BATCH_MAX_BYTES = 16 * 1024 * 1024
+MILVUS_BATCH_MAX_ROWS = 1000
+MILVUS_MAX_IN_FLIGHT_BATCHES = 4
+MILVUS_BATCH_RETRY_ATTEMPTS = 4
+MILVUS_BATCH_RETRY_MAX_WAIT = 10
+MILVUS_DELETE_BATCH_SIZE = 1000
+
+AUTO_HI_RES_MEDIA_RATIO = 0.5
+
+PDF_EXTRACT_PROCESSES = max(1, (os.cpu_count() or 1) // 2)
+PDF_PAGES_PER_SHARD = 25
+PDF_PARALLEL_MIN_PAGES = 100
+PDF_MAX_PENDING_SHARDS = 2 * PDF_EXTRACT_PROCESSES
@@ -5,3 +5,4 @@ SPACY_NER = "ner"
 SPACY_LEM = "lemmatizer"
 SPACY_SENTENCIZER = "sentencizer"
 OPENAI_EMBEDDINGS_MODEL = "text-embedding-3-large"
+LOCAL_EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
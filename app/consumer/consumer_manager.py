@@ -1,10 +1,28 @@
 import logging
 import asyncio
+import time
+from typing import Dict, List, Optional
 from app.aws.client import AwsClientManager
+from app.constants.globals import (
+    SQS_BUSY_WAIT_SECONDS,
+    SQS_MAX_IN_FLIGHT_JOBS,
+    SQS_MAX_RECEIVE_BATCH,
+    SQS_MAX_WAIT_SECONDS,
+    SQS_RECEIVE_ERROR_BACKOFF_SECONDS,
+    SQS_VISIBILITY_HEARTBEAT_SECONDS,
+    SQS_VISIBILITY_TIMEOUT_SECONDS,
+)
 from app.core.config import Settings
+from app.core.metrics import (
+    SQS_CONSUMER_IDLE_SECONDS,
+    SQS_IN_FLIGHT_JOBS,
+    SQS_RECEIVED_MESSAGES,
+)
 from app.processor.processor_manager import ProcessorManager
-from app.dao.models import ReceivedSqsMessage
+from app.dao.models import ReceivedSqsMessage, SqsConsumerStats
 from app.milvus.client import MilvusOps
+from app.embeddings.cache import EmbeddingCache
+from app.embeddings.gateway import EmbeddingGateway
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +33,28 @@ class ConsumerManager:
         aws_client_manager: AwsClientManager,
         settings: Settings,
         milvus_ops: MilvusOps,
+        embedding_cache: EmbeddingCache,
+        embedding_gateway: EmbeddingGateway,
     ):
         self.aws_client_manager = aws_client_manager
         self.settings = settings
         self.is_running = False
         self.consumer_task = None
+        self.max_in_flight = settings.SQS_MAX_IN_FLIGHT_JOBS or SQS_MAX_IN_FLIGHT_JOBS
+        self.receive_batch_size = min(SQS_MAX_RECEIVE_BATCH, self.max_in_flight)
+        self.receive_wait_seconds = SQS_MAX_WAIT_SECONDS
+        self.messages_received = 0
+        self.empty_receives = 0
+        self.last_receive_lag: Optional[float] = None
+        self.idle_seconds = 0.0
+        self._idle_since: Optional[float] = time.monotonic()
+        self._in_flight: Dict[asyncio.Task, float] = {}
         self.process_manager = ProcessorManager(
             aws_client_manager=aws_client_manager,
             settings=settings,
             milvus_ops=milvus_ops,
+            embedding_cache=embedding_cache,
+            embedding_gateway=embedding_gateway,
         )
 
     async def start(self):
@@ -48,7 +79,24 @@ class ConsumerManager:
 
         self.consumer_task.add_done_callback(task_done_callback)
 
+    async def _extend_visibility(self, message: ReceivedSqsMessage):
+        # long files outlive the queue's visibility timeout, without this the
+        # message is handed to another worker while the first is still on it
+        while True:
+            await asyncio.sleep(SQS_VISIBILITY_HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(
+                    self.aws_client_manager.change_message_visibility,
+                    message.receipt_handle,
+                    SQS_VISIBILITY_TIMEOUT_SECONDS,
+                )
+            except Exception as e:
+                logger.warning(
+                    f"failed to extend visibility of message {message.message_id}: {e}"
+                )
+
     async def _process_and_delete_message(self, message: ReceivedSqsMessage):
+        heartbeat = asyncio.create_task(self._extend_visibility(message))
         try:
             logger.info(f"processing message: {message.message_id}")
 
@@ -65,21 +113,87 @@ class ConsumerManager:
                 f"failed to process messgae {message.message_id}, it will not be deleted",
                 exc_info=e,
             )
+        finally:
+            heartbeat.cancel()
+
+    def _plan_receive(self, received: Optional[int]):
+        # never take more messages than there are free slots, whatever is left in
+        # the queue stays visible to other workers
+        self.receive_batch_size = min(
+            SQS_MAX_RECEIVE_BATCH, self.max_in_flight - len(self._in_flight)
+        )
+        if received is None:
+            return
+        if received:
+            # while messages keep coming the polls stay short, so the batch size
+            # follows the slots that free up instead of being fixed for 20s
+            self.receive_wait_seconds = SQS_BUSY_WAIT_SECONDS
+        else:
+            # every empty poll waits longer, up to the long poll maximum
+            self.receive_wait_seconds = min(
+                SQS_MAX_WAIT_SECONDS, self.receive_wait_seconds * 2
+            )
+
+    def _start_message(self, message: ReceivedSqsMessage):
+        now = time.monotonic()
+        if self._idle_since is not None:
+            idle = now - self._idle_since
+            self.idle_seconds += idle
+            SQS_CONSUMER_IDLE_SECONDS.inc(idle)
+            self._idle_since = None
+
+        task = asyncio.create_task(
+            self._process_and_delete_message(message),
+            name=f"sqs_message_{message.message_id}",
+        )
+        self._in_flight[task] = now
+        SQS_IN_FLIGHT_JOBS.set(len(self._in_flight))
+        task.add_done_callback(self._message_done)
+
+    def _message_done(self, task: asyncio.Task):
+        self._in_flight.pop(task, None)
+        SQS_IN_FLIGHT_JOBS.set(len(self._in_flight))
+        if not self._in_flight:
+            self._idle_since = time.monotonic()
 
     async def _consumer_loop(self):
+        received: Optional[int] = None
         while self.is_running:
             try:
-                messages = await self._receive_message()
-                if messages:
-                    logger.info(f"received: {len(messages)} messages from SQS")
-
-                    processing_tasks = [
-                        self._process_and_delete_message(message)
-                        for message in messages
-                    ]
-                    await asyncio.gather(*processing_tasks)
-                else:
-                    await asyncio.sleep(1)
+                # a finished job frees its slot right away, the next receive does
+                # not wait for the rest of the batch it came with
+                if len(self._in_flight) >= self.max_in_flight:
+                    await asyncio.wait(
+                        set(self._in_flight), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    continue
+
+                self._plan_receive(received=received)
+                messages = await self._receive_message(
+                    max_messages=self.receive_batch_size,
+                    wait_time_seconds=self.receive_wait_seconds,
+                )
+                received = len(messages)
+                SQS_RECEIVED_MESSAGES.observe(received)
+                if not messages:
+                    self.empty_receives += 1
+                    continue
+
+                logger.info(
+                    f"received: {len(messages)} messages from SQS, "
+                    f"{len(self._in_flight)} jobs already in flight"
+                )
+                self.messages_received += len(messages)
+                lags = [
+                    message.receive_lag_seconds
+                    for message in messages
+                    if message.receive_lag_seconds is not None
+                ]
+                if lags:
+                    self.last_receive_lag = max(lags)
+
+                for message in messages:
+                    self._start_message(message)
 
             except asyncio.CancelledError:
                 logger.info("manager cancelled the consumer")
@@ -90,11 +204,18 @@ class ConsumerManager:
                     extra={"error": str(e)},
                     exc_info=True,
                 )
+                await asyncio.sleep(SQS_RECEIVE_ERROR_BACKOFF_SECONDS)
 
         logger.info("consumer loop has stopped.")
 
-    async def _receive_message(self):
-        return await asyncio.to_thread(self.aws_client_manager.receive_sqs_message)
+    async def _receive_message(
+        self, max_messages: int, wait_time_seconds: int
+    ) -> List[ReceivedSqsMessage]:
+        return await asyncio.to_thread(
+            self.aws_client_manager.receive_sqs_message,
+            max_messages=max_messages,
+            wait_time_seconds=wait_time_seconds,
+        )
 
     async def _delete_message(self, receipt_handle: str):
         return await asyncio.to_thread(
@@ -113,4 +234,31 @@ class ConsumerManager:
                 await asyncio.wait_for(self.consumer_task, timeout=5.0)
             except asyncio.CancelledError:
                 pass
+        # unfinished messages are redelivered and resume from their checkpoints
+        in_flight = set(self._in_flight)
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=5.0)
+        self.process_manager.close()
         logger.info("manager stopped the consumer")
+
+    def stats(self) -> SqsConsumerStats:
+        now = time.monotonic()
+        idle = self.idle_seconds
+        if self._idle_since is not None:
+            idle += now - self._idle_since
+        return SqsConsumerStats(
+            message="successfully fetched sqs consumer stats",
+            max_in_flight=self.max_in_flight,
+            in_flight=len(self._in_flight),
+            oldest_in_flight_seconds=(
+                now - min(self._in_flight.values()) if self._in_flight else 0.0
+            ),
+            receive_batch_size=self.receive_batch_size,
+            receive_wait_seconds=self.receive_wait_seconds,
+            messages_received=self.messages_received,
+            empty_receives=self.empty_receives,
+            last_receive_lag_seconds=self.last_receive_lag,
+            idle_seconds=idle,
+        )
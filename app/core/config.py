@@ -11,6 +11,11 @@ class Environment(str, Enum):
     PRODUCTION = "prod"
 
 
+class EmbeddingProviderType(str, Enum):
+    OPENAI = "openai"
+    LOCAL = "local"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(__file__), "..", "..", ".env.example"),
@@ -73,11 +78,15 @@ class Settings(BaseSettings):
     FIRST_ADMIN: EmailStr
 
     OPENAI_KEY: str
+    CHUNK_EMBEDDING_PROVIDER: EmbeddingProviderType = EmbeddingProviderType.OPENAI
 
     MILVUS_URL: str
     MILVUS_USER: Optional[str] = None
     MILVUS_PASSWORD: Optional[str] = None
     MILVUS_DATABASE: str
 
+    SCRATCH_DIR: Optional[str] = None
+    SQS_MAX_IN_FLIGHT_JOBS: Optional[int] = None
+
 
 settings = Settings()
@@ -0,0 +1,230 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+BYTES_BUCKETS = tuple(1024 * 4**i for i in range(12))
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+INGESTION_STAGE_SECONDS = Histogram(
+    "neurostash_ingestion_stage_seconds",
+    "time spent per file in each ingestion stage",
+    labelnames=("stage",),
+    buckets=LATENCY_BUCKETS,
+)
+INGESTION_FILE_SECONDS = Histogram(
+    "neurostash_ingestion_file_seconds",
+    "end to end time to ingest a single file",
+    labelnames=("status",),
+    buckets=LATENCY_BUCKETS,
+)
+INGESTION_JOB_SECONDS = Histogram(
+    "neurostash_ingestion_job_seconds",
+    "end to end time to process an ingestion job message",
+    labelnames=("status",),
+    buckets=LATENCY_BUCKETS,
+)
+SQS_RECEIVE_LAG_SECONDS = Histogram(
+    "neurostash_sqs_receive_lag_seconds",
+    "time between a job message being sent and being received",
+    buckets=LATENCY_BUCKETS,
+)
+SQS_IN_FLIGHT_JOBS = Gauge(
+    "neurostash_sqs_in_flight_jobs",
+    "job messages the consumer is processing right now",
+)
+SQS_RECEIVED_MESSAGES = Histogram(
+    "neurostash_sqs_received_messages",
+    "messages returned by a single receive call",
+    buckets=(0, 1, 2, 3, 5, 8, 10),
+)
+# prometheus_client appends _total to counter names
+SQS_CONSUMER_IDLE_SECONDS = Counter(
+    "neurostash_sqs_consumer_idle_seconds",
+    "time the consumer spent with no job in flight",
+)
+INGESTION_FILE_BYTES = Histogram(
+    "neurostash_ingestion_file_bytes",
+    "size of downloaded source files",
+    buckets=BYTES_BUCKETS,
+)
+INGESTION_FILE_PAGES = Histogram(
+    "neurostash_ingestion_file_pages",
+    "pages or loader documents per source file",
+    buckets=COUNT_BUCKETS,
+)
+INGESTION_FILE_CHUNKS = Histogram(
+    "neurostash_ingestion_file_chunks",
+    "chunks produced per source file",
+    labelnames=("kind",),
+    buckets=COUNT_BUCKETS,
+)
+INGESTION_DEDUPLICATED_CHUNKS = Counter(
+    "neurostash_ingestion_deduplicated_chunks",
+    "child chunks skipped as near duplicates of a stored chunk",
+)
+EMBEDDING_GATEWAY_WAIT_SECONDS = Histogram(
+    "neurostash_embedding_gateway_wait_seconds",
+    "time an embedding request waited for the shared rate limiter",
+    labelnames=("priority",),
+    buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_RATE_LIMITED = Counter(
+    "neurostash_embedding_rate_limited",
+    "embedding requests rejected with 429 by the provider",
+    labelnames=("priority",),
+)
+EMBEDDING_TOKENS = Counter(
+    "neurostash_embedding_tokens",
+    "tokens sent to the embedding model",
+    labelnames=("stage",),
+)
+
+
+@dataclass
+class FileMetrics:
+    kb_doc_id: int
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    embedding_tokens: Dict[str, int] = field(default_factory=dict)
+    bytes: int = 0
+    pages: int = 0
+    parent_chunks: int = 0
+    child_chunks: int = 0
+    deduplicated_chunks: int = 0
+    total_seconds: float = 0.0
+    status: str = "pending"
+
+    def add_stage(self, stage: str, seconds: float):
+        # stages exit many times per file, the histogram gets one sample per
+        # stage once the file finishes
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def add_tokens(self, stage: str, tokens: int):
+        self.embedding_tokens[stage] = self.embedding_tokens.get(stage, 0) + tokens
+
+    def finish(self, status: str, seconds: float):
+        self.status = status
+        self.total_seconds = seconds
+        INGESTION_FILE_SECONDS.labels(status=status).observe(seconds)
+        for stage, stage_seconds in self.stage_seconds.items():
+            INGESTION_STAGE_SECONDS.labels(stage=stage).observe(stage_seconds)
+        for stage, tokens in self.embedding_tokens.items():
+            EMBEDDING_TOKENS.labels(stage=stage).inc(tokens)
+        if self.bytes:
+            INGESTION_FILE_BYTES.observe(self.bytes)
+        if self.pages:
+            INGESTION_FILE_PAGES.observe(self.pages)
+        if self.parent_chunks:
+            INGESTION_FILE_CHUNKS.labels(kind="parent").observe(self.parent_chunks)
+            INGESTION_FILE_CHUNKS.labels(kind="child").observe(self.child_chunks)
+        if self.deduplicated_chunks:
+            INGESTION_DEDUPLICATED_CHUNKS.inc(self.deduplicated_chunks)
+
+
+@dataclass
+class JobMetrics:
+    ingestion_job_id: int
+    receive_lag_seconds: Optional[float] = None
+    files: List[FileMetrics] = field(default_factory=list)
+    total_seconds: float = 0.0
+
+    def file(self, kb_doc_id: int) -> FileMetrics:
+        metrics = FileMetrics(kb_doc_id=kb_doc_id)
+        self.files.append(metrics)
+        return metrics
+
+    def summary(self) -> dict:
+        stage_seconds: Dict[str, float] = {}
+        embedding_tokens: Dict[str, int] = {}
+        for metrics in self.files:
+            for stage, seconds in metrics.stage_seconds.items():
+                stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+            for stage, tokens in metrics.embedding_tokens.items():
+                embedding_tokens[stage] = embedding_tokens.get(stage, 0) + tokens
+
+        return {
+            "total_seconds": round(self.total_seconds, 3),
+            "receive_lag_seconds": (
+                round(self.receive_lag_seconds, 3)
+                if self.receive_lag_seconds is not None
+                else None
+            ),
+            "files": len(self.files),
+            "failed_files": sum(1 for m in self.files if m.status != "success"),
+            "bytes": sum(m.bytes for m in self.files),
+            "pages": sum(m.pages for m in self.files),
+            "parent_chunks": sum(m.parent_chunks for m in self.files),
+            "child_chunks": sum(m.child_chunks for m in self.files),
+            "deduplicated_chunks": sum(m.deduplicated_chunks for m in self.files),
+            "stage_seconds": {k: round(v, 3) for k, v in stage_seconds.items()},
+            "embedding_tokens": embedding_tokens,
+            "slowest_files": [
+                {"kb_doc_id": m.kb_doc_id, "seconds": round(m.total_seconds, 3)}
+                for m in sorted(self.files, key=lambda m: m.total_seconds)[-5:][::-1]
+            ],
+        }
+
+
+current_file_metrics: ContextVar[Optional[FileMetrics]] = ContextVar(
+    "current_file_metrics", default=None
+)
+
+
+# stage time spent by the current task alone, concurrent tasks working on the
+# same file keep separate tallies
+current_stage_tally: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "current_stage_tally", default=None
+)
+
+
+@contextmanager
+def tally_stages() -> Iterator[Dict[str, float]]:
+    tally: Dict[str, float] = {}
+    token = current_stage_tally.set(tally)
+    try:
+        yield tally
+    finally:
+        current_stage_tally.reset(token)
+
+
+@contextmanager
+def measure_stage(stage: str) -> Iterator[None]:
+    # stages that run concurrently within one file add up, so a stage total can
+    # exceed the wall clock time of the file. outside of a file there is nothing
+    # to attribute the time to
+    metrics = current_file_metrics.get()
+    tally = current_stage_tally.get()
+    if metrics is None and tally is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if metrics is not None:
+            metrics.add_stage(stage, elapsed)
+        if tally is not None:
+            tally[stage] = tally.get(stage, 0.0) + elapsed
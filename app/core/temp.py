@@ -1,5 +1,99 @@
+import logging
 import os
+import shutil
+import socket
 import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+from app.utils.byte_budget import ByteBudget
 
-def get_system_temp_file_path(filename: str) -> str:
-    return os.path.join(tempfile.gettempdir(), filename)
+logger = logging.getLogger(__name__)
+
+# directories owned by scratch spaces of this process, a pid reused by a restart
+# on the same host must not keep its predecessor's leftovers alive
+_process_directories: Set[str] = set()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScratchSpace:
+    def __init__(self, max_bytes: int, directory: Optional[str] = None):
+        # the base directory is shared by every worker on the host, each process
+        # writes to its own subdirectory named after its host, pid and a nonce
+        self.base_directory = directory or os.path.join(
+            tempfile.gettempdir(), "neurostash-scratch"
+        )
+        self.hostname = socket.gethostname()
+        self.directory = os.path.join(
+            self.base_directory,
+            f"{self.hostname}-{os.getpid()}-{uuid.uuid4().hex[:8]}",
+        )
+        self.max_bytes = max_bytes
+        self._in_flight: Dict[str, int] = {}
+        self._budget = ByteBudget(max_bytes=max_bytes)
+
+        os.makedirs(self.directory, exist_ok=True)
+        _process_directories.add(os.path.basename(self.directory))
+        self._purge_leftovers()
+
+    def _is_stale(self, name: str) -> bool:
+        hostname, _, rest = name.rpartition("-")[0].rpartition("-")
+        if hostname != self.hostname or not rest.isdigit():
+            # another host or container shares the volume, its pids mean nothing here
+            return False
+        pid = int(rest)
+        if pid == os.getpid():
+            return name not in _process_directories
+        return not _pid_alive(pid)
+
+    def _purge_leftovers(self):
+        for name in os.listdir(self.base_directory):
+            path = os.path.join(self.base_directory, name)
+            if not os.path.isdir(path) or not self._is_stale(name):
+                continue
+            try:
+                shutil.rmtree(path)
+                logger.info(f"removed leftover scratch directory: {path}")
+            except OSError:
+                logger.warning(f"cannot remove leftover scratch directory: {path}")
+
+    @property
+    def used_bytes(self) -> int:
+        return self._budget.used_bytes
+
+    def in_flight(self) -> Dict[str, int]:
+        return dict(self._in_flight)
+
+    @asynccontextmanager
+    async def reserve(self, size: int, suffix: str = "") -> AsyncIterator[str]:
+        path = os.path.join(self.directory, f"{uuid.uuid4()}{suffix}")
+
+        await self._budget.acquire(size)
+        self._in_flight[path] = size
+
+        logger.debug(
+            f"reserved {size} bytes of scratch space, "
+            f"{self.used_bytes}/{self.max_bytes} bytes in use"
+        )
+
+        try:
+            yield path
+        finally:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.error(f"cannot remove scratch file: {path}", exc_info=True)
+
+            self._in_flight.pop(path, None)
+            await self._budget.release(size)
@@ -0,0 +1,76 @@
+import logging
+from typing import Dict, List
+
+from sqlalchemy import delete, select, update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dao.schema import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+async def get_cached_embeddings(
+    *, db: AsyncSession, model: str, dimension: int, content_hashes: List[str]
+) -> Dict[str, bytes]:
+    if not content_hashes:
+        return {}
+
+    stmt = (
+        update(EmbeddingCacheEntry)
+        .where(
+            EmbeddingCacheEntry.model == model,
+            EmbeddingCacheEntry.dimension == dimension,
+            EmbeddingCacheEntry.content_hash.in_(content_hashes),
+        )
+        .values(last_used_at=func.now())
+        .returning(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding)
+        .execution_options(synchronize_session=False)
+    )
+
+    result = await db.execute(stmt)
+
+    return {row.content_hash: row.embedding for row in result.all()}
+
+
+async def store_embeddings(
+    *, db: AsyncSession, model: str, dimension: int, entries: Dict[str, bytes]
+):
+    if not entries:
+        return
+
+    stmt = (
+        pg_insert(EmbeddingCacheEntry)
+        .values(
+            [
+                {
+                    "model": model,
+                    "dimension": dimension,
+                    "content_hash": content_hash,
+                    "embedding": embedding,
+                }
+                for content_hash, embedding in entries.items()
+            ]
+        )
+        .on_conflict_do_nothing(
+            index_elements=["model", "dimension", "content_hash"],
+        )
+    )
+
+    await db.execute(stmt)
+
+
+async def evict_embedding_cache(*, db: AsyncSession, max_entries: int) -> int:
+    stale_ids = (
+        select(EmbeddingCacheEntry.id)
+        .order_by(EmbeddingCacheEntry.last_used_at.desc())
+        .offset(max_entries)
+    )
+
+    stmt = delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.id.in_(stale_ids))
+
+    result = await db.execute(stmt)
+    await db.commit()
+
+    evicted = result.rowcount or 0
+    logger.info(f"evicted {evicted} entries from embedding cache")
+    return evicted
@@ -1,9 +1,9 @@
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, insert, update, delete, and_, or_, func
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import timedelta
 from app.dao.models import CreatedIngestionJob, FileForIngestion
 from app.dao.schema import (
@@ -14,6 +14,9 @@ from app.dao.schema import (
     KnowledgeBase,
     MilvusCollections,
     ParentChunkedDoc,
+    ParsingTierEnum,
+    ChunkFingerprint,
+    IngestionCheckpoint,
 )
 from uuid import UUID
 from app.utils.application_timezone import get_current_time
@@ -37,10 +40,19 @@ async def create_ingestion_job(
     kb_id: int,
     job_resource_id: UUID,
     user_id: int,
+    parsing_tier: Optional[ParsingTierEnum] = None,
 ) -> CreatedIngestionJob:
     try:
         kb_stmt = (
-            select(MilvusCollections.collection_name, KnowledgeBase.category)
+            select(
+                MilvusCollections.collection_name,
+                MilvusCollections.dimension,
+                MilvusCollections.search_method,
+                KnowledgeBase.category,
+                KnowledgeBase.parsing_tier,
+                KnowledgeBase.chunking_strategy,
+                KnowledgeBase.deduplicate_chunks,
+            )
             .join(
                 MilvusCollections, KnowledgeBase.collection_id == MilvusCollections.id
             )
@@ -132,6 +144,11 @@ async def create_ingestion_job(
             user_id=user_id,
             documents=file_for_ingestion,
             kb_id=kb_id,
+            parsing_tier=parsing_tier or knowledge_base_result.parsing_tier,
+            dimension=knowledge_base_result.dimension,
+            search_method=knowledge_base_result.search_method,
+            chunking_strategy=knowledge_base_result.chunking_strategy,
+            deduplicate_chunks=knowledge_base_result.deduplicate_chunks,
         )
 
     except (KnowledgeBaseNotFound, SQLAlchemyError) as e:
@@ -166,9 +183,314 @@ async def create_parent_chunk(
     return parent_doc
 
 
-async def delete_parent_chunk(*, db: AsyncSession, document_id: int):
+async def bulk_create_parent_chunks(
+    *,
+    db: AsyncSession,
+    document_id: int,
+    kb_doc_id: Optional[int],
+    chunks: List[str],
+    content_hashes: List[str],
+    ingestion_job_id: Optional[int] = None,
+) -> List[int]:
+    if not chunks:
+        return []
+
+    stmt = insert(ParentChunkedDoc).returning(
+        ParentChunkedDoc.id, sort_by_parameter_order=True
+    )
+
+    result = await db.execute(
+        stmt,
+        [
+            {
+                "document_id": document_id,
+                "kb_doc_id": kb_doc_id,
+                "chunk": chunk,
+                "content_hash": content_hash,
+                "ingestion_job_id": ingestion_job_id,
+            }
+            for chunk, content_hash in zip(chunks, content_hashes)
+        ],
+    )
+
+    return list(result.scalars().all())
+
+
+async def get_parent_chunk_hashes(
+    *, db: AsyncSession, kb_doc_id: int
+) -> List[Tuple[int, Optional[str]]]:
+    stmt = (
+        select(ParentChunkedDoc.id, ParentChunkedDoc.content_hash)
+        .where(ParentChunkedDoc.kb_doc_id == kb_doc_id)
+        .order_by(ParentChunkedDoc.id)
+    )
+
+    result = await db.execute(stmt)
+
+    return [(row.id, row.content_hash) for row in result.all()]
+
+
+async def confirm_parent_chunks(
+    *, db: AsyncSession, parent_ids: List[int], ingestion_job_id: int
+):
+    if not parent_ids:
+        return
+
+    await db.execute(
+        update(ParentChunkedDoc)
+        .where(ParentChunkedDoc.id.in_(parent_ids))
+        .values(ingestion_job_id=ingestion_job_id)
+    )
+
+
+async def get_confirmed_hash_counts(
+    *, db: AsyncSession, kb_doc_id: int, ingestion_job_id: int
+) -> Dict[Optional[str], int]:
+    stmt = (
+        select(ParentChunkedDoc.content_hash, func.count())
+        .where(
+            ParentChunkedDoc.kb_doc_id == kb_doc_id,
+            ParentChunkedDoc.ingestion_job_id == ingestion_job_id,
+        )
+        .group_by(ParentChunkedDoc.content_hash)
+    )
+
+    result = await db.execute(stmt)
+    return {content_hash: count for content_hash, count in result.all()}
+
+
+async def get_unconfirmed_parent_ids(
+    *, db: AsyncSession, kb_doc_id: int, ingestion_job_id: int
+) -> List[int]:
+    stmt = select(ParentChunkedDoc.id).where(
+        ParentChunkedDoc.kb_doc_id == kb_doc_id,
+        ParentChunkedDoc.ingestion_job_id.is_distinct_from(ingestion_job_id),
+    )
+
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def get_ingestion_checkpoint(
+    *, db: AsyncSession, ingestion_job_id: int, kb_doc_id: int
+) -> Optional[IngestionCheckpoint]:
+    stmt = select(IngestionCheckpoint).where(
+        IngestionCheckpoint.ingestion_job_id == ingestion_job_id,
+        IngestionCheckpoint.kb_doc_id == kb_doc_id,
+    )
+
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def save_ingestion_checkpoint(
+    *,
+    db: AsyncSession,
+    ingestion_job_id: int,
+    kb_doc_id: int,
+    documents_done: int,
+    parent_chunks_done: int,
+    child_chunks_done: int,
+    deduplicated_chunks: int,
+    completed: bool = False,
+):
+    progress = {
+        "documents_done": documents_done,
+        "parent_chunks_done": parent_chunks_done,
+        "child_chunks_done": child_chunks_done,
+        "deduplicated_chunks": deduplicated_chunks,
+        "completed": completed,
+    }
+
+    stmt = (
+        pg_insert(IngestionCheckpoint)
+        .values(ingestion_job_id=ingestion_job_id, kb_doc_id=kb_doc_id, **progress)
+        .on_conflict_do_update(
+            index_elements=["ingestion_job_id", "kb_doc_id"],
+            set_={**progress, "updated_at": func.now()},
+        )
+    )
+
+    await db.execute(stmt)
+
+
+async def get_completed_kb_doc_ids(
+    *, db: AsyncSession, ingestion_job_id: int
+) -> List[int]:
+    stmt = select(IngestionCheckpoint.kb_doc_id).where(
+        IngestionCheckpoint.ingestion_job_id == ingestion_job_id,
+        IngestionCheckpoint.completed.is_(True),
+    )
+
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def delete_ingestion_checkpoints(
+    *, db: AsyncSession, ingestion_job_ids: List[int]
+):
+    if not ingestion_job_ids:
+        return
+
     await db.execute(
-        delete(ParentChunkedDoc).where(ParentChunkedDoc.document_id == document_id)
+        delete(IngestionCheckpoint).where(
+            IngestionCheckpoint.ingestion_job_id.in_(ingestion_job_ids)
+        )
+    )
+
+
+async def delete_parent_chunks_by_ids(*, db: AsyncSession, parent_ids: List[int]):
+    if not parent_ids:
+        return
+
+    await db.execute(
+        delete(ParentChunkedDoc).where(ParentChunkedDoc.id.in_(parent_ids))
+    )
+
+
+async def delete_parent_chunks_for_kb_docs(
+    *, db: AsyncSession, kb_doc_ids: List[int], document_ids: List[int]
+) -> int:
+    if not kb_doc_ids:
+        return 0
+
+    # rows written before parent chunks tracked their kb document only carry document_id
+    stmt = delete(ParentChunkedDoc).where(
+        or_(
+            ParentChunkedDoc.kb_doc_id.in_(kb_doc_ids),
+            and_(
+                ParentChunkedDoc.kb_doc_id.is_(None),
+                ParentChunkedDoc.document_id.in_(document_ids),
+            ),
+        )
+    )
+
+    result = await db.execute(stmt)
+    return result.rowcount or 0
+
+
+async def get_parent_chunk_ids_for_kb_docs(
+    *, db: AsyncSession, kb_doc_ids: List[int], document_ids: List[int]
+) -> List[int]:
+    if not kb_doc_ids:
+        return []
+
+    stmt = select(ParentChunkedDoc.id).where(
+        or_(
+            ParentChunkedDoc.kb_doc_id.in_(kb_doc_ids),
+            and_(
+                ParentChunkedDoc.kb_doc_id.is_(None),
+                ParentChunkedDoc.document_id.in_(document_ids),
+            ),
+        )
+    )
+
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def find_fingerprints_sharing_bands(
+    *, db: AsyncSession, kb_id: int, bands: List[int]
+) -> List[Tuple[str, int]]:
+    if not bands:
+        return []
+
+    stmt = select(ChunkFingerprint.chunk_id, ChunkFingerprint.simhash).where(
+        ChunkFingerprint.kb_id == kb_id,
+        ChunkFingerprint.bands.overlap(bands),
+        ChunkFingerprint.duplicate_of.is_(None),
+    )
+
+    result = await db.execute(stmt)
+    return [(row.chunk_id, row.simhash) for row in result.all()]
+
+
+async def get_orphaned_duplicates(
+    *, db: AsyncSession, removed_parent_ids: List[int]
+) -> List[Tuple[ChunkFingerprint, FileForIngestion]]:
+    if not removed_parent_ids:
+        return []
+
+    removed_chunk_ids = select(ChunkFingerprint.chunk_id).where(
+        ChunkFingerprint.parent_id.in_(removed_parent_ids),
+        ChunkFingerprint.duplicate_of.is_(None),
+    )
+    stmt = (
+        select(
+            ChunkFingerprint,
+            ParentChunkedDoc.kb_doc_id,
+            DocumentRegistry.id.label("doc_id"),
+            DocumentRegistry.file_name,
+            DocumentRegistry.object_key,
+        )
+        .join(ParentChunkedDoc, ParentChunkedDoc.id == ChunkFingerprint.parent_id)
+        .join(DocumentRegistry, DocumentRegistry.id == ParentChunkedDoc.document_id)
+        .where(
+            ChunkFingerprint.duplicate_of.in_(removed_chunk_ids),
+            ChunkFingerprint.parent_id.not_in(removed_parent_ids),
+        )
+        .order_by(ChunkFingerprint.id)
+    )
+
+    result = await db.execute(stmt)
+    return [
+        (
+            row.ChunkFingerprint,
+            FileForIngestion(
+                kb_doc_id=row.kb_doc_id,
+                doc_id=row.doc_id,
+                file_name=row.file_name,
+                object_key=row.object_key,
+            ),
+        )
+        for row in result.all()
+    ]
+
+
+async def promote_chunk_fingerprints(*, db: AsyncSession, fingerprint_ids: List[int]):
+    if not fingerprint_ids:
+        return
+
+    await db.execute(
+        update(ChunkFingerprint)
+        .where(ChunkFingerprint.id.in_(fingerprint_ids))
+        .values(duplicate_of=None, content=None)
+    )
+
+
+async def repoint_chunk_fingerprints(
+    *, db: AsyncSession, fingerprint_ids: List[int], duplicate_of: str
+):
+    if not fingerprint_ids:
+        return
+
+    await db.execute(
+        update(ChunkFingerprint)
+        .where(ChunkFingerprint.id.in_(fingerprint_ids))
+        .values(duplicate_of=duplicate_of)
+    )
+
+
+async def bulk_create_chunk_fingerprints(
+    *, db: AsyncSession, fingerprints: List[Dict[str, Any]]
+):
+    if not fingerprints:
+        return
+
+    await db.execute(insert(ChunkFingerprint), fingerprints)
+
+
+async def record_document_parsing(
+    *,
+    db: AsyncSession,
+    kb_doc_id: int,
+    parsing_tier: ParsingTierEnum,
+    parse_seconds: float,
+):
+    await db.execute(
+        update(KnowledgeBaseDocument)
+        .where(KnowledgeBaseDocument.id == kb_doc_id)
+        .values(parsing_tier=parsing_tier, parse_seconds=parse_seconds)
     )
 
 
@@ -190,16 +512,27 @@ async def get_ingestion_job_status(
 async def cleanup_ingestion_job(*, db: AsyncSession):
     current_time = get_current_time()
     cutoff_time = current_time - timedelta(hours=1)
+    # a job that checkpointed within the hour is still being worked on, however
+    # long ago it was created
+    recent_checkpoint = select(IngestionCheckpoint.id).where(
+        IngestionCheckpoint.ingestion_job_id == IngestionJob.id,
+        IngestionCheckpoint.updated_at >= cutoff_time,
+    )
     stmt = (
         update(IngestionJob)
         .where(
             IngestionJob.op_status == OperationStatusEnum.PENDING,
             IngestionJob.updated_at < cutoff_time,
+            ~recent_checkpoint.exists(),
         )
         .values(op_status=OperationStatusEnum.FAILED)
+        .returning(IngestionJob.id)
     )
 
-    await db.execute(stmt)
+    result = await db.execute(stmt)
+    await delete_ingestion_checkpoints(
+        db=db, ingestion_job_ids=list(result.scalars().all())
+    )
     await db.commit()
 
 
@@ -9,8 +9,9 @@ from app.dao.schema import (
     OperationStatusEnum,
     MilvusCollections,
     ProvisionerStatusEnum,
+    SearchMethodEnum,
 )
-from typing import List, Tuple
+from typing import List, NamedTuple, Tuple
 from sqlalchemy.orm import selectinload
 import psycopg
 
@@ -27,6 +28,22 @@ class KnowledgeBaseNotFound(Exception):
         super().__init__(f"knowledge base with id {kb_id} not found")
 
 
+class NoCollectionAvailable(Exception):
+    def __init__(self, search_method: SearchMethodEnum, dimension: int):
+        self.search_method = search_method
+        self.dimension = dimension
+        super().__init__(
+            f"no available milvus collection for {search_method.value} "
+            f"with dimension {dimension}"
+        )
+
+
+class KbCollection(NamedTuple):
+    collection_name: str
+    dimension: int
+    search_method: SearchMethodEnum
+
+
 async def create_kb_db(*, db: AsyncSession, kb: CreateKbInDb) -> KnowledgeBase:
     try:
         async with db.begin():
@@ -34,6 +51,7 @@ async def create_kb_db(*, db: AsyncSession, kb: CreateKbInDb) -> KnowledgeBase:
                 select(MilvusCollections)
                 .where(
                     MilvusCollections.search_method == kb.type,
+                    MilvusCollections.dimension == kb.dimension,
                     MilvusCollections.status == ProvisionerStatusEnum.AVAILABLE,
                 )
                 .order_by(func.random())
@@ -52,6 +70,9 @@ async def create_kb_db(*, db: AsyncSession, kb: CreateKbInDb) -> KnowledgeBase:
                 name=kb.name,
                 collection_id=available_collection.id,
                 category=kb.category,
+                parsing_tier=kb.parsing_tier,
+                chunking_strategy=kb.chunking_strategy,
+                deduplicate_chunks=kb.deduplicate_chunks,
                 milvus_collections=available_collection,
             )
 
@@ -62,7 +83,7 @@ async def create_kb_db(*, db: AsyncSession, kb: CreateKbInDb) -> KnowledgeBase:
 
     except NoResultFound:
         await db.rollback()
-        raise RuntimeError("no available milvus collection found.")
+        raise NoCollectionAvailable(search_method=kb.type, dimension=kb.dimension)
 
     except IntegrityError as e:
         await db.rollback()
@@ -76,18 +97,26 @@ async def create_kb_db(*, db: AsyncSession, kb: CreateKbInDb) -> KnowledgeBase:
         raise RuntimeError(f"failed to create knowledge base in database: {e}")
 
 
-async def get_kb_collection(*, db: AsyncSession, user_id, kb_id: int) -> str:
+async def get_kb_collection(*, db: AsyncSession, user_id, kb_id: int) -> KbCollection:
     try:
         stmt = (
-            select(MilvusCollections.collection_name)
+            select(
+                MilvusCollections.collection_name,
+                MilvusCollections.dimension,
+                MilvusCollections.search_method,
+            )
             .join(KnowledgeBase, KnowledgeBase.collection_id == MilvusCollections.id)
             .where(KnowledgeBase.id == kb_id, KnowledgeBase.user_id == user_id)
         )
 
         result = await db.execute(stmt)
-        collection_name = result.scalar_one()
+        row = result.one()
 
-        return collection_name
+        return KbCollection(
+            collection_name=row.collection_name,
+            dimension=row.dimension,
+            search_method=row.search_method,
+        )
     except NoResultFound:
         raise KnowledgeBaseNotFound(kb_id=kb_id)
     except SQLAlchemyError:
@@ -126,6 +155,8 @@ async def list_kb_docs(
             DocumentRegistry.file_name,
             KnowledgeBaseDocument.id.label("kb_doc_id"),
             KnowledgeBaseDocument.status,
+            KnowledgeBaseDocument.parsing_tier,
+            KnowledgeBaseDocument.parse_seconds,
         )
         .join(
             KnowledgeBaseDocument,
@@ -156,6 +187,8 @@ async def list_kb_docs(
             doc_id=row.id,
             file_name=row.file_name,
             status=row.status.value,
+            parsing_tier=row.parsing_tier.value if row.parsing_tier else None,
+            parse_seconds=row.parse_seconds,
         )
         for row in result.all()
     ]
@@ -1,10 +1,12 @@
 import os
+import time
 from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
 from app.constants.content_type import ALLOWED_EXTENSIONS
-from app.dao.schema import SearchMethodEnum
+from app.constants.globals import EMBEDDING_DIMENSIONS, MODEL_DIMENSION
+from app.dao.schema import SearchMethodEnum, ParsingTierEnum, ChunkingStrategyEnum
 from app.dao.schema import ClientRoleEnum
 
 
@@ -147,12 +149,31 @@ class CreateKbInDb(BaseModel):
     name: str
     category: str
     type: SearchMethodEnum
+    parsing_tier: ParsingTierEnum = ParsingTierEnum.AUTO
+    dimension: int = MODEL_DIMENSION
+    chunking_strategy: ChunkingStrategyEnum = ChunkingStrategyEnum.SEMANTIC
+    deduplicate_chunks: bool = False
 
 
 class CreateKbReq(BaseModel):
     name: str = Field(..., min_length=5, max_length=50)
     category: str = Field(..., min_length=3, max_length=50)
     type: SearchMethodEnum
+    parsing_tier: ParsingTierEnum = ParsingTierEnum.AUTO
+    dimension: int = MODEL_DIMENSION
+    chunking_strategy: ChunkingStrategyEnum = ChunkingStrategyEnum.SEMANTIC
+    # skip child chunks that nearly repeat one already stored in the knowledge base
+    deduplicate_chunks: bool = False
+
+    @field_validator("dimension")
+    @classmethod
+    def check_dimension(cls, dimension: int) -> int:
+        if dimension not in EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"dimension {dimension} is not supported, "
+                f"allowed dimensions are: {','.join(map(str, EMBEDDING_DIMENSIONS))}"
+            )
+        return dimension
 
     class Config:
         json_schema_extra = {
@@ -160,6 +181,10 @@ class CreateKbReq(BaseModel):
                 "name": "dummy-knowledge-base",
                 "category": "dummy-category",
                 "type": "dummy-type",
+                "parsing_tier": "AUTO",
+                "dimension": MODEL_DIMENSION,
+                "chunking_strategy": "SEMANTIC",
+                "deduplicate_chunks": False,
             }
         }
 
@@ -200,6 +225,11 @@ class SqsMessage(BaseModel):
     kb_id: int
     category: str
     user_id: int
+    parsing_tier: ParsingTierEnum = ParsingTierEnum.AUTO
+    dimension: int = MODEL_DIMENSION
+    search_method: SearchMethodEnum = SearchMethodEnum.HNSW
+    chunking_strategy: ChunkingStrategyEnum = ChunkingStrategyEnum.SEMANTIC
+    deduplicate_chunks: bool = False
 
 
 class ReceivedSqsMessage(BaseModel):
@@ -208,11 +238,20 @@ class ReceivedSqsMessage(BaseModel):
     body: SqsMessage
     attributes: Optional[Dict[str, Any]] = None
     message_attributes: Optional[Dict[str, Any]] = None
+    received_at: float = Field(default_factory=time.time)
+
+    @property
+    def receive_lag_seconds(self) -> Optional[float]:
+        sent_timestamp = (self.attributes or {}).get("SentTimestamp")
+        if sent_timestamp is None:
+            return None
+        return max(0.0, self.received_at - int(sent_timestamp) / 1000)
 
 
 class IngestionRequest(BaseModel):
     kb_id: int
     file_ids: List[int]
+    parsing_tier: Optional[ParsingTierEnum] = None
 
     class Config:
         json_schema_extra = {
@@ -241,6 +280,11 @@ class CreatedIngestionJob(BaseModel):
     category: str
     user_id: int
     kb_id: int
+    parsing_tier: ParsingTierEnum
+    dimension: int
+    search_method: SearchMethodEnum
+    chunking_strategy: ChunkingStrategyEnum
+    deduplicate_chunks: bool
     documents: List[FileForIngestion]
 
 
@@ -249,6 +293,8 @@ class KbDoc(BaseModel):
     doc_id: int
     file_name: str
     status: str
+    parsing_tier: Optional[str] = None
+    parse_seconds: Optional[float] = None
 
 
 class ListKbDocs(StandardResponse):
@@ -272,7 +318,53 @@ class SearchRequest(BaseModel):
     knowledge_base_id: int
     search_limit: int
     user_query: str
+    # defaults to rescoring only for the lossy int8 and binary layouts
+    rerank: Optional[bool] = None
 
 
 class SearchResponse(StandardResponse):
     response: List[Dict[str, Any]]
+
+
+class EmbeddingCacheStats(StandardResponse):
+    model: str
+    memory_hits: int
+    persistent_hits: int
+    misses: int
+    hit_ratio: float
+    memory_entries: int
+    memory_bytes: int
+    evicted: int
+
+
+class EventLoopLagStats(StandardResponse):
+    budget_ms: float
+    last_lag_ms: float
+    p50_lag_ms: float
+    p99_lag_ms: float
+    max_lag_ms: float
+    samples: int
+    budget_violations: int
+
+
+class SqsConsumerStats(StandardResponse):
+    max_in_flight: int
+    in_flight: int
+    oldest_in_flight_seconds: float
+    receive_batch_size: int
+    receive_wait_seconds: int
+    messages_received: int
+    empty_receives: int
+    last_receive_lag_seconds: Optional[float]
+    idle_seconds: float
+
+
+class EmbeddingGatewayStats(StandardResponse):
+    concurrency: float
+    in_flight: int
+    waiting: int
+    requests_per_minute: float
+    requests_available: float
+    tokens_per_minute: float
+    tokens_available: float
+    paused_seconds: float
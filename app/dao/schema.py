@@ -8,6 +8,7 @@ from sqlalchemy import (
     ForeignKey,
     Integer,
     BigInteger,
+    Float,
     String,
     Boolean,
     LargeBinary,
@@ -19,9 +20,10 @@ from sqlalchemy import (
     Text,
     Identity,
 )
-from sqlalchemy.dialects.postgresql import UUID as pg_uuid
+from sqlalchemy.dialects.postgresql import UUID as pg_uuid, JSONB, ARRAY
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
+from app.constants.globals import MODEL_DIMENSION
 
 
 class Base(DeclarativeBase):
@@ -61,6 +63,20 @@ class SearchMethodEnum(enum.Enum):
     FLAT = "FLAT"
     HNSW = "HNSW"
     IVF_SQ8 = "IVF_SQ8"
+    HNSW_FP16 = "HNSW_FP16"
+    HNSW_INT8 = "HNSW_INT8"
+    BIN_IVF_FLAT = "BIN_IVF_FLAT"
+
+
+class ParsingTierEnum(enum.Enum):
+    FAST = "FAST"
+    HI_RES = "HI_RES"
+    AUTO = "AUTO"
+
+
+class ChunkingStrategyEnum(enum.Enum):
+    SEMANTIC = "SEMANTIC"
+    RECURSIVE = "RECURSIVE"
 
 
 class EncryptionKey(Base, TimestampMixin):
@@ -185,6 +201,9 @@ class MilvusCollections(Base, TimestampMixin):
         SQLEnum(SearchMethodEnum, name="search_category", create_type=False),
         nullable=False,
     )
+    dimension: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=str(MODEL_DIMENSION)
+    )
 
     knowledge_bases: Mapped[List["KnowledgeBase"]] = relationship(
         back_populates="milvus_collections"
@@ -205,6 +224,19 @@ class KnowledgeBase(Base, TimestampMixin):
     )
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     category: Mapped[str] = mapped_column(String(100), nullable=False)
+    parsing_tier: Mapped[ParsingTierEnum] = mapped_column(
+        SQLEnum(ParsingTierEnum, name="parsing_tier", create_type=False),
+        nullable=False,
+        server_default=ParsingTierEnum.AUTO.value,
+    )
+    chunking_strategy: Mapped[ChunkingStrategyEnum] = mapped_column(
+        SQLEnum(ChunkingStrategyEnum, name="chunking_strategy", create_type=False),
+        nullable=False,
+        server_default=ChunkingStrategyEnum.SEMANTIC.value,
+    )
+    deduplicate_chunks: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default=text("false")
+    )
     user_client: Mapped["UserClient"] = relationship(back_populates="knowledge_bases")
     document_associations: Mapped[List["KnowledgeBaseDocument"]] = relationship(
         back_populates="knowledge_base", cascade="all, delete-orphan"
@@ -244,6 +276,11 @@ class KnowledgeBaseDocument(Base, TimestampMixin):
         nullable=False,
         server_default=OperationStatusEnum.PENDING.value,
     )
+    parsing_tier: Mapped[Optional[ParsingTierEnum]] = mapped_column(
+        SQLEnum(ParsingTierEnum, name="parsing_tier", create_type=False),
+        nullable=True,
+    )
+    parse_seconds: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
 
     knowledge_base: Mapped["KnowledgeBase"] = relationship(
         back_populates="document_associations"
@@ -276,6 +313,7 @@ class IngestionJob(Base, TimestampMixin):
         nullable=False,
         server_default=OperationStatusEnum.PENDING.value,
     )
+    metrics_summary: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
 
     knowledge_base: Mapped["KnowledgeBase"] = relationship(
         back_populates="ingestion_jobs"
@@ -318,11 +356,118 @@ class ParentChunkedDoc(Base, TimestampMixin):
         ForeignKey("documents_registry.id", onupdate="CASCADE", ondelete="CASCADE"),
         nullable=False,
     )
+    kb_doc_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey(
+            "knowledge_base_documents.id", onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        nullable=True,
+    )
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     chunk: Mapped[str] = mapped_column(Text, nullable=False)
+    # the last ingestion job that found this chunk in the document
+    ingestion_job_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("ingestion_jobs.id", onupdate="CASCADE", ondelete="SET NULL"),
+        nullable=True,
+    )
 
     document: Mapped["DocumentRegistry"] = relationship(
         back_populates="parent_chunk_docs"
     )
 
+    __table_args__ = (
+        Index("idx_parent_chunk_kb_doc_hash", "kb_doc_id", "content_hash"),
+    )
+
     def __repr__(self) -> str:
         return f"<ParentChunkedDoc(parent_doc_id={self.id}, doc_id={self.document_id})>"
+
+
+class IngestionCheckpoint(Base, TimestampMixin):
+    __tablename__ = "ingestion_checkpoints"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    ingestion_job_id: Mapped[int] = mapped_column(
+        ForeignKey("ingestion_jobs.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    kb_doc_id: Mapped[int] = mapped_column(
+        ForeignKey(
+            "knowledge_base_documents.id", onupdate="CASCADE", ondelete="CASCADE"
+        ),
+        nullable=False,
+    )
+    documents_done: Mapped[int] = mapped_column(Integer, nullable=False)
+    parent_chunks_done: Mapped[int] = mapped_column(Integer, nullable=False)
+    child_chunks_done: Mapped[int] = mapped_column(Integer, nullable=False)
+    deduplicated_chunks: Mapped[int] = mapped_column(Integer, nullable=False)
+    # finished files keep their row until the job ends, so a redelivered message
+    # skips them instead of parsing them again
+    completed: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default=text("false")
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "ingestion_job_id", "kb_doc_id", name="idx_unique_ingestion_checkpoint"
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<IngestionCheckpoint(job_id={self.ingestion_job_id}, kb_doc_id={self.kb_doc_id}, documents_done={self.documents_done})>"
+
+
+class ChunkFingerprint(Base):
+    __tablename__ = "chunk_fingerprints"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    kb_id: Mapped[int] = mapped_column(
+        ForeignKey("knowledge_bases.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    parent_id: Mapped[int] = mapped_column(
+        ForeignKey("parent_chunked_docs.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    chunk_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    simhash: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    bands: Mapped[List[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    # set on chunks skipped as near duplicates, the text is kept so the chunk can
+    # be indexed again when the copy it repeats goes away
+    duplicate_of: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("idx_chunk_fingerprint_kb", "kb_id"),
+        Index("idx_chunk_fingerprint_parent", "parent_id"),
+        Index("idx_chunk_fingerprint_bands", "bands", postgresql_using="gin"),
+        Index("idx_chunk_fingerprint_duplicate_of", "duplicate_of"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ChunkFingerprint(id={self.id}, kb_id={self.kb_id}, chunk_id='{self.chunk_id}')>"
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    dimension: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now()
+    )
+    last_used_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "model", "dimension", "content_hash", name="idx_unique_embedding_key"
+        ),
+        Index("idx_embedding_cache_last_used", "last_used_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<EmbeddingCacheEntry(id={self.id}, model='{self.model}', dimension={self.dimension})>"
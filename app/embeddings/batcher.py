@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import List, Tuple
+
+import openai
+from tenacity import (
+    AsyncRetrying,
+    before_sleep_log,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
+from langchain_core.embeddings import Embeddings
+from app.constants.globals import (
+    EMBEDDING_MAX_IN_FLIGHT_REQUESTS,
+    EMBEDDING_MAX_INPUTS_PER_REQUEST,
+    EMBEDDING_MAX_TOKENS_PER_INPUT,
+    EMBEDDING_MAX_TOKENS_PER_REQUEST,
+    EMBEDDING_RETRY_ATTEMPTS,
+    EMBEDDING_RETRY_MAX_WAIT,
+)
+from app.embeddings.metered import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# connection resets, timeouts and 5xx responses
+TRANSIENT_EMBEDDING_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+
+
+def pack_batches(
+    token_counts: List[int], max_tokens: int, max_inputs: int
+) -> List[range]:
+    batches: List[range] = []
+    start = 0
+    current_tokens = 0
+
+    for i, tokens in enumerate(token_counts):
+        if i > start and (
+            current_tokens + tokens > max_tokens or i - start >= max_inputs
+        ):
+            batches.append(range(start, i))
+            start = i
+            current_tokens = 0
+        current_tokens += tokens
+
+    if start < len(token_counts):
+        batches.append(range(start, len(token_counts)))
+
+    return batches
+
+
+class TokenBudgetBatcher(Embeddings):
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        max_tokens_per_request: int = EMBEDDING_MAX_TOKENS_PER_REQUEST,
+        max_tokens_per_input: int = EMBEDDING_MAX_TOKENS_PER_INPUT,
+        max_inputs_per_request: int = EMBEDDING_MAX_INPUTS_PER_REQUEST,
+        max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT_REQUESTS,
+        retry_attempts: int = EMBEDDING_RETRY_ATTEMPTS,
+    ):
+        self.embeddings = embeddings
+        self.encoding = get_encoding(model)
+        self.max_tokens_per_request = max_tokens_per_request
+        self.max_tokens_per_input = max_tokens_per_input
+        self.max_inputs_per_request = max_inputs_per_request
+        self.retry_attempts = retry_attempts
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    def _fit_inputs(self, texts: List[str]) -> Tuple[List[str], List[int]]:
+        fitted: List[str] = []
+        token_counts: List[int] = []
+        for text, tokens in zip(texts, self.encoding.encode_ordinary_batch(texts)):
+            if len(tokens) > self.max_tokens_per_input:
+                logger.warning(
+                    f"truncating embedding input from {len(tokens)} to "
+                    f"{self.max_tokens_per_input} tokens"
+                )
+                tokens = tokens[: self.max_tokens_per_input]
+                text = self.encoding.decode(tokens)
+            fitted.append(text)
+            token_counts.append(len(tokens))
+        return fitted, token_counts
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def _embed_batch(self, texts: List[str], index: int) -> List[List[float]]:
+        async with self._in_flight:
+            # only this sub batch is retried, finished ones are kept by the caller.
+            # 429s are paced and retried by the gateway, backing off here as well
+            # would stack a second delay on top of its pause
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.retry_attempts),
+                wait=wait_exponential(multiplier=1, max=EMBEDDING_RETRY_MAX_WAIT),
+                retry=retry_if_exception_type(TRANSIENT_EMBEDDING_ERRORS),
+                before_sleep=before_sleep_log(logger, logging.WARNING),
+                reraise=True,
+            ):
+                with attempt:
+                    embeddings = await self.embeddings.aembed_documents(texts)
+
+        logger.debug(f"embedded batch {index} of {len(texts)} inputs")
+        return embeddings
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        fitted, token_counts = await asyncio.to_thread(self._fit_inputs, texts)
+        batches = pack_batches(
+            token_counts=token_counts,
+            max_tokens=self.max_tokens_per_request,
+            max_inputs=self.max_inputs_per_request,
+        )
+
+        results = await asyncio.gather(
+            *[
+                self._embed_batch(texts=fitted[batch.start : batch.stop], index=i)
+                for i, batch in enumerate(batches)
+            ],
+            return_exceptions=True,
+        )
+
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            logger.error(
+                f"{len(failures)} of {len(batches)} embedding batches failed after "
+                f"{self.retry_attempts} attempts"
+            )
+            raise failures[0]
+
+        logger.debug(
+            f"embedded {len(texts)} inputs, {sum(token_counts)} tokens in "
+            f"{len(batches)} batches"
+        )
+        return [embedding for batch in results for embedding in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async with self._in_flight:
+            return await self.embeddings.aembed_query(text)
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+from app.constants.globals import (
+    EMBEDDING_CACHE_MEMORY_BYTES,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_LOOKUP_BATCH,
+)
+from app.core.db import SessionLocal
+from app.dao.embedding_cache_dao import (
+    get_cached_embeddings,
+    store_embeddings,
+    evict_embedding_cache,
+)
+from app.dao.models import EmbeddingCacheStats
+
+logger = logging.getLogger(__name__)
+
+
+EmbedFunction = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _encode(embedding: Sequence[float]) -> bytes:
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def _decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        model: str,
+        memory_bytes: int = EMBEDDING_CACHE_MEMORY_BYTES,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.model = model
+        self.max_entries = max_entries
+        self._memory: LRUCache = LRUCache(maxsize=memory_bytes, getsizeof=len)
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    async def aembed_documents(
+        self,
+        texts: List[str],
+        dimension: int,
+        embed_missing: EmbedFunction,
+        model: Optional[str] = None,
+    ) -> np.ndarray:
+        model = model or self.model
+        hashes = [content_hash(text) for text in texts]
+        resolved: Dict[str, bytes] = {}
+
+        for key in set(hashes):
+            blob = self._memory.get((model, dimension, key))
+            if blob is not None:
+                resolved[key] = blob
+
+        pending = [key for key in dict.fromkeys(hashes) if key not in resolved]
+        persisted = await self._lookup_persistent(
+            keys=pending, model=model, dimension=dimension
+        )
+        for key, blob in persisted.items():
+            self._memory[(model, dimension, key)] = blob
+        resolved.update(persisted)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in resolved and key not in missing:
+                missing[key] = text
+
+        if missing:
+            embeddings = await embed_missing(list(missing.values()))
+            fresh = {
+                key: _encode(embedding)
+                for key, embedding in zip(missing.keys(), embeddings)
+            }
+            for key, blob in fresh.items():
+                self._memory[(model, dimension, key)] = blob
+            resolved.update(fresh)
+            await self._store_persistent(
+                entries=fresh, model=model, dimension=dimension
+            )
+
+        for key in hashes:
+            if key in missing:
+                self.misses += 1
+            elif key in persisted:
+                self.persistent_hits += 1
+            else:
+                self.memory_hits += 1
+
+        embeddings = np.empty((len(hashes), dimension), dtype=np.float32)
+        for i, key in enumerate(hashes):
+            embeddings[i] = _decode(resolved[key])
+        return embeddings
+
+    async def _lookup_persistent(
+        self, keys: List[str], model: str, dimension: int
+    ) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+
+        found: Dict[str, bytes] = {}
+        try:
+            async with SessionLocal() as db:
+                for i in range(0, len(keys), EMBEDDING_CACHE_LOOKUP_BATCH):
+                    found.update(
+                        await get_cached_embeddings(
+                            db=db,
+                            model=model,
+                            dimension=dimension,
+                            content_hashes=keys[i : i + EMBEDDING_CACHE_LOOKUP_BATCH],
+                        )
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning(
+                f"embedding cache lookup failed, treating as misses: {e}",
+                exc_info=True,
+            )
+        return found
+
+    async def _store_persistent(
+        self, entries: Dict[str, bytes], model: str, dimension: int
+    ):
+        try:
+            async with SessionLocal() as db:
+                items = list(entries.items())
+                for i in range(0, len(items), EMBEDDING_CACHE_LOOKUP_BATCH):
+                    await store_embeddings(
+                        db=db,
+                        model=model,
+                        dimension=dimension,
+                        entries=dict(items[i : i + EMBEDDING_CACHE_LOOKUP_BATCH]),
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning(
+                f"error persisting embeddings into cache: {e}", exc_info=True
+            )
+
+    async def evict(self):
+        async with SessionLocal() as db:
+            self.evicted += await evict_embedding_cache(
+                db=db, max_entries=self.max_entries
+            )
+
+    def stats(self) -> EmbeddingCacheStats:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        hit_ratio = (
+            (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0
+        )
+        return EmbeddingCacheStats(
+            message="successfully fetched embedding cache stats",
+            model=self.model,
+            memory_hits=self.memory_hits,
+            persistent_hits=self.persistent_hits,
+            misses=self.misses,
+            hit_ratio=hit_ratio,
+            memory_entries=len(self._memory),
+            memory_bytes=int(self._memory.currsize),
+            evicted=self.evicted,
+        )
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        dimension: int,
+        model: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.dimension = dimension
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        embeddings = await self.cache.aembed_documents(
+            texts=texts,
+            dimension=self.dimension,
+            embed_missing=self.embeddings.aembed_documents,
+            model=self.model,
+        )
+        return embeddings.tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,355 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+from enum import IntEnum
+from typing import List, Mapping, Optional
+
+import openai
+from langchain_core.embeddings import Embeddings
+from app.core.config import Settings
+from app.dao.models import EmbeddingGatewayStats
+from app.constants.models import OPENAI_EMBEDDINGS_MODEL
+from app.constants.globals import (
+    EMBEDDING_GATEWAY_INITIAL_CONCURRENCY,
+    EMBEDDING_GATEWAY_MAX_CONCURRENCY,
+    EMBEDDING_GATEWAY_MIN_CONCURRENCY,
+    EMBEDDING_GATEWAY_RATE_LIMIT_RETRIES,
+    EMBEDDING_GATEWAY_RESERVED_INTERACTIVE_SLOTS,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+)
+from app.core.metrics import EMBEDDING_GATEWAY_WAIT_SECONDS, EMBEDDING_RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+class EmbeddingPriority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    # openai reports resets as go style durations, e.g. "6m0s" or "20ms"
+    if not value:
+        return None
+    matches = DURATION_PATTERN.findall(value)
+    if not matches:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in matches)
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _retry_after(headers: Mapping[str, str]) -> float:
+    retry_after_ms = _parse_int(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return (
+        _parse_duration(headers.get("retry-after"))
+        or _parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        or DEFAULT_RETRY_AFTER_SECONDS
+    )
+
+
+class _MinuteBudget:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        self.available = min(
+            self.capacity, self.available + elapsed * self.capacity / 60
+        )
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # a request larger than the whole budget goes out once the budget is full
+        missing = min(amount, self.capacity) - self.available
+        return 0.0 if missing <= 0 else missing * 60 / self.capacity
+
+    def take(self, amount: float):
+        self.available -= amount
+
+    def give_back(self, amount: float):
+        self.available = min(self.capacity, self.available + amount)
+
+    def observe(self, limit: Optional[int], remaining: Optional[int]):
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.available = min(self.available, float(remaining))
+
+
+class EmbeddingGateway:
+    def __init__(
+        self,
+        settings: Settings,
+        model: str = OPENAI_EMBEDDINGS_MODEL,
+        requests_per_minute: int = EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = EMBEDDING_TOKENS_PER_MINUTE,
+        initial_concurrency: int = EMBEDDING_GATEWAY_INITIAL_CONCURRENCY,
+        min_concurrency: int = EMBEDDING_GATEWAY_MIN_CONCURRENCY,
+        max_concurrency: int = EMBEDDING_GATEWAY_MAX_CONCURRENCY,
+        reserved_interactive_slots: int = EMBEDDING_GATEWAY_RESERVED_INTERACTIVE_SLOTS,
+        rate_limit_retries: int = EMBEDDING_GATEWAY_RATE_LIMIT_RETRIES,
+    ):
+        self.model = model
+        # retries go through the gateway so they are paced by the shared budgets
+        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_KEY, max_retries=0)
+        self.requests = _MinuteBudget(requests_per_minute)
+        self.tokens = _MinuteBudget(tokens_per_minute)
+        self.concurrency = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive_slots = reserved_interactive_slots
+        self.rate_limit_retries = rate_limit_retries
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._tickets = itertools.count()
+        self._waiting: List = []
+        self._condition = asyncio.Condition()
+        # the loop the queue lives on, synchronous callers submit to it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    def _slots(self, priority: EmbeddingPriority) -> int:
+        slots = int(self.concurrency)
+        # bulk ingestion leaves headroom so a search never queues behind a backlog
+        if (
+            priority == EmbeddingPriority.BULK
+            and slots > self.reserved_interactive_slots
+        ):
+            slots -= self.reserved_interactive_slots
+        return slots
+
+    def _admission_delay(
+        self, ticket: tuple, priority: EmbeddingPriority, tokens: int
+    ) -> Optional[float]:
+        # None waits for a release, a positive delay waits for the budgets to refill
+        if self._waiting[0] != ticket or self.in_flight >= self._slots(priority):
+            return None
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    async def _acquire(self, priority: EmbeddingPriority, tokens: int):
+        started = time.perf_counter()
+        async with self._condition:
+            ticket = (int(priority), next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    delay = self._admission_delay(ticket, priority, tokens)
+                    if delay == 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+
+        EMBEDDING_GATEWAY_WAIT_SECONDS.labels(priority=priority.name.lower()).observe(
+            time.perf_counter() - started
+        )
+
+    def _observe_headers(self, headers: Mapping[str, str], now: float):
+        self.requests.observe(
+            limit=_parse_int(headers.get("x-ratelimit-limit-requests")),
+            remaining=_parse_int(headers.get("x-ratelimit-remaining-requests")),
+        )
+        self.tokens.observe(
+            limit=_parse_int(headers.get("x-ratelimit-limit-tokens")),
+            remaining=_parse_int(headers.get("x-ratelimit-remaining-tokens")),
+        )
+        if _parse_int(headers.get("x-ratelimit-remaining-requests")) == 0:
+            reset = _parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.paused_until = max(self.paused_until, now + reset)
+
+    async def _release(
+        self,
+        reserved_tokens: int,
+        used_tokens: int,
+        headers: Optional[Mapping[str, str]],
+        succeeded: bool,
+        rate_limited: bool,
+    ):
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            self.tokens.refill(now)
+            self.tokens.give_back(reserved_tokens - used_tokens)
+
+            if rate_limited:
+                # concurrent 429s from one burst only halve the window once
+                if now >= self.paused_until:
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                retry_after = _retry_after(headers or {})
+                self.paused_until = max(self.paused_until, now + retry_after)
+                logger.warning(
+                    f"embedding requests rate limited, concurrency "
+                    f"{self.concurrency:.1f}, pausing {retry_after:.2f}s"
+                )
+            elif succeeded:
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + 1 / self.concurrency
+                )
+            # timeouts and server errors say nothing about spare capacity, the
+            # window holds until a request goes through again
+
+            if headers is not None:
+                self._observe_headers(headers, now)
+
+            self._condition.notify_all()
+
+    def _estimate_tokens(self, texts: List[str]) -> int:
+        # reserved up front and reconciled with the reported usage afterwards
+        return sum(len(text) for text in texts) // 4 + len(texts)
+
+    def _request_params(self, dimensions: Optional[int]) -> dict:
+        params = {"model": self.model, "encoding_format": "float"}
+        if dimensions is not None:
+            params["dimensions"] = dimensions
+        return params
+
+    async def aembed(
+        self,
+        texts: List[str],
+        priority: EmbeddingPriority,
+        dimensions: Optional[int] = None,
+    ) -> List[List[float]]:
+        self._loop = asyncio.get_running_loop()
+        reserved_tokens = self._estimate_tokens(texts)
+
+        for attempt in itertools.count(1):
+            await self._acquire(priority=priority, tokens=reserved_tokens)
+            used_tokens = reserved_tokens
+            headers = None
+            succeeded = False
+            rate_limited = False
+            try:
+                raw = await self.client.embeddings.with_raw_response.create(
+                    input=texts, **self._request_params(dimensions)
+                )
+                headers = raw.headers
+                response = raw.parse()
+                used_tokens = response.usage.total_tokens
+                succeeded = True
+                return [
+                    item.embedding
+                    for item in sorted(response.data, key=lambda item: item.index)
+                ]
+            except openai.RateLimitError as e:
+                headers = e.response.headers
+                rate_limited = True
+                EMBEDDING_RATE_LIMITED.labels(priority=priority.name.lower()).inc()
+                if attempt > self.rate_limit_retries:
+                    raise
+            finally:
+                await self._release(
+                    reserved_tokens=reserved_tokens,
+                    used_tokens=used_tokens,
+                    headers=headers,
+                    succeeded=succeeded,
+                    rate_limited=rate_limited,
+                )
+
+    def embed(
+        self,
+        texts: List[str],
+        priority: EmbeddingPriority,
+        dimensions: Optional[int] = None,
+    ) -> List[List[float]]:
+        # synchronous callers run on worker threads, their requests are queued on
+        # the event loop that owns the gateway like every other request
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            raise RuntimeError("embedding gateway has no running event loop")
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            raise RuntimeError(
+                "synchronous embeddings would block the embedding gateway loop, "
+                "use aembed instead"
+            )
+        return asyncio.run_coroutine_threadsafe(
+            self.aembed(texts, priority=priority, dimensions=dimensions), loop
+        ).result()
+
+    def stats(self) -> EmbeddingGatewayStats:
+        return EmbeddingGatewayStats(
+            message="successfully fetched embedding gateway stats",
+            concurrency=self.concurrency,
+            in_flight=self.in_flight,
+            waiting=len(self._waiting),
+            requests_per_minute=self.requests.capacity,
+            requests_available=self.requests.available,
+            tokens_per_minute=self.tokens.capacity,
+            tokens_available=self.tokens.available,
+            paused_seconds=max(0.0, self.paused_until - time.monotonic()),
+        )
+
+
+class GatewayEmbeddings(Embeddings):
+    def __init__(
+        self,
+        gateway: EmbeddingGateway,
+        priority: EmbeddingPriority,
+        dimensions: Optional[int] = None,
+    ):
+        self.gateway = gateway
+        self.priority = priority
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.gateway.embed(
+            texts, priority=self.priority, dimensions=self.dimensions
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.gateway.embed(
+            [text], priority=self.priority, dimensions=self.dimensions
+        )[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.gateway.aembed(
+            texts, priority=self.priority, dimensions=self.dimensions
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        embeddings = await self.gateway.aembed(
+            [text], priority=self.priority, dimensions=self.dimensions
+        )
+        return embeddings[0]
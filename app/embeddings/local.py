@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+from app.constants.globals import (
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_MAX_SEQ_LENGTH,
+)
+from app.constants.models import LOCAL_EMBEDDINGS_MODEL
+from app.processor.device_manager import DeviceManager
+from app.processor.processor_config import EmbeddingConfig
+
+logger = logging.getLogger(__name__)
+
+
+def local_embedding_config(
+    model_name: str = LOCAL_EMBEDDINGS_MODEL,
+    max_seq_length: int = LOCAL_EMBEDDING_MAX_SEQ_LENGTH,
+    base_batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+) -> EmbeddingConfig:
+    device = DeviceManager.get_optimal_device()
+    return EmbeddingConfig(
+        model_name=model_name,
+        batch_size=DeviceManager.optimize_batch_size(
+            device=device, base_batch_size=base_batch_size
+        ),
+        max_seq_length=max_seq_length,
+        device=device,
+    )
+
+
+class LocalEmbeddings(Embeddings):
+    def __init__(self, config: EmbeddingConfig):
+        self.config = config
+        self.model = SentenceTransformer(config.model_name, device=config.device.value)
+        self.model.max_seq_length = config.max_seq_length
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        # torch already spreads one encode call over the cores, a single worker
+        # keeps concurrent files from oversubscribing them
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="local-embeddings"
+        )
+        logger.info(
+            f"loaded local embedding model {config.model_name} on "
+            f"{config.device.value} with batch size {config.batch_size}, "
+            f"dimension {self.dimension}"
+        )
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.config.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(self._executor, self._encode, texts)
+        return embeddings.tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import List
+
+import tiktoken
+from langchain_core.embeddings import Embeddings
+from app.core.metrics import current_file_metrics, measure_stage
+
+logger = logging.getLogger(__name__)
+
+
+def get_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class MeteredEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model: str, stage: str):
+        self.embeddings = embeddings
+        self.stage = stage
+        self.encoding = get_encoding(model)
+
+    def count_tokens(self, texts: List[str]) -> int:
+        return sum(len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts))
+
+    def _record_tokens(self, tokens: int):
+        metrics = current_file_metrics.get()
+        if metrics is not None:
+            metrics.add_tokens(self.stage, tokens)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with measure_stage(self.stage):
+            embeddings = self.embeddings.embed_documents(texts)
+        if current_file_metrics.get() is not None:
+            self._record_tokens(self.count_tokens(texts))
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with measure_stage(self.stage):
+            embeddings = await self.embeddings.aembed_documents(texts)
+        if current_file_metrics.get() is not None:
+            self._record_tokens(await asyncio.to_thread(self.count_tokens, texts))
+        return embeddings
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,94 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from app.constants.globals import EMBEDDING_GATEWAY_MAX_CONCURRENCY, MODEL_DIMENSION
+from app.constants.models import OPENAI_EMBEDDINGS_MODEL
+from app.core.config import EmbeddingProviderType
+from app.embeddings.batcher import TokenBudgetBatcher
+from app.embeddings.gateway import (
+    EmbeddingGateway,
+    EmbeddingPriority,
+    GatewayEmbeddings,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider(ABC):
+    model: str
+    dimension: int
+
+    @abstractmethod
+    def embeddings(
+        self, priority: EmbeddingPriority, dimension: Optional[int] = None
+    ) -> Embeddings:
+        pass
+
+    def close(self):
+        pass
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    def __init__(
+        self,
+        gateway: EmbeddingGateway,
+        model: str = OPENAI_EMBEDDINGS_MODEL,
+        dimension: int = MODEL_DIMENSION,
+    ):
+        self.gateway = gateway
+        self.model = model
+        self.dimension = dimension
+        self._embeddings: Dict[Tuple[EmbeddingPriority, int], Embeddings] = {}
+
+    def embeddings(
+        self, priority: EmbeddingPriority, dimension: Optional[int] = None
+    ) -> Embeddings:
+        # text-embedding-3 models shorten their output server side when asked for
+        # fewer dimensions
+        key = (priority, dimension or self.dimension)
+        if key not in self._embeddings:
+            # the gateway paces requests against the shared rate limits, so the
+            # batcher may keep as many in flight as the gateway could ever admit
+            self._embeddings[key] = TokenBudgetBatcher(
+                embeddings=GatewayEmbeddings(
+                    gateway=self.gateway, priority=priority, dimensions=key[1]
+                ),
+                model=self.model,
+                max_in_flight=EMBEDDING_GATEWAY_MAX_CONCURRENCY,
+            )
+        return self._embeddings[key]
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    def __init__(self):
+        # sentence-transformers and torch are only imported when a local backend
+        # is configured
+        from app.embeddings.local import LocalEmbeddings, local_embedding_config
+
+        self._embeddings = LocalEmbeddings(config=local_embedding_config())
+        self.model = self._embeddings.config.model_name
+        self.dimension = self._embeddings.dimension
+
+    def embeddings(
+        self, priority: EmbeddingPriority, dimension: Optional[int] = None
+    ) -> Embeddings:
+        if dimension is not None and dimension != self.dimension:
+            raise ValueError(
+                f"{self.model} produces {self.dimension} dimensions, not {dimension}"
+            )
+        return self._embeddings
+
+    def close(self):
+        self._embeddings.close()
+
+
+def create_embedding_provider(
+    provider_type: EmbeddingProviderType, gateway: EmbeddingGateway
+) -> EmbeddingProvider:
+    if provider_type == EmbeddingProviderType.LOCAL:
+        return LocalEmbeddingProvider()
+    elif provider_type == EmbeddingProviderType.OPENAI:
+        return OpenAIEmbeddingProvider(gateway=gateway)
+    raise ValueError(f"unsupported embedding provider: {provider_type}")
@@ -14,6 +14,10 @@ from app.milvus.client import MilvusOps
 from app.utils.scheduler import scheduler
 from app.core.exceptions import request_validation_exception_handler
 from app.milvus.searching import SearchOps
+from app.embeddings.cache import EmbeddingCache
+from app.embeddings.gateway import EmbeddingGateway
+from app.constants.models import OPENAI_EMBEDDINGS_MODEL
+from app.utils.loop_monitor import EventLoopLagMonitor
 
 import logging
 import sys
@@ -73,10 +77,24 @@ async def schedule_cleanup_job(
         )
 
 
+async def schedule_embedding_cache_eviction(embedding_cache: EmbeddingCache):
+    logger.info("scheduler starting 'embedding_cache_eviction' job")
+    try:
+        await embedding_cache.evict()
+        logger.info("scheduler finished 'embedding_cache_eviction' job successfully.")
+    except Exception as e:
+        logger.error(
+            f"scheduled 'embedding_cache_eviction' job failed: {e}", exc_info=True
+        )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("application startup: initializing resources...")
 
+    app.state.loop_monitor = EventLoopLagMonitor()
+    app.state.loop_monitor.start()
+
     app.state.aws_client_manager = AwsClientManager(settings=settings)
     app.state.milvus_ops = MilvusOps(settings=settings)
 
@@ -86,7 +104,14 @@ async def lifespan(app: FastAPI):
         settings=settings, milvusOps=app.state.milvus_ops
     )
 
-    search_ops = SearchOps(settings=settings)
+    app.state.embedding_gateway = EmbeddingGateway(settings=settings)
+
+    app.state.embedding_cache = EmbeddingCache(model=OPENAI_EMBEDDINGS_MODEL)
+
+    search_ops = SearchOps(
+        settings=settings,
+        embedding_gateway=app.state.embedding_gateway,
+    )
 
     app.state.search_ops = search_ops
 
@@ -109,6 +134,13 @@ async def lifespan(app: FastAPI):
         name="daily_collection_cleanup",
         args=[provision_manager, file_cleaner],
     )
+    scheduler.add_job(
+        schedule_embedding_cache_eviction,
+        "cron",
+        minute=17,
+        name="hourly_embedding_cache_eviction",
+        args=[app.state.embedding_cache],
+    )
     scheduler.start()
 
     app.state.token_manager = await TokenManager.create(
@@ -120,6 +152,8 @@ async def lifespan(app: FastAPI):
         aws_client_manager=app.state.aws_client_manager,
         settings=settings,
         milvus_ops=app.state.milvus_ops,
+        embedding_cache=app.state.embedding_cache,
+        embedding_gateway=app.state.embedding_gateway,
     )
 
     await app.state.consumer_manager.start()
@@ -134,6 +168,8 @@ async def lifespan(app: FastAPI):
     if scheduler.running:
         scheduler.shutdown()
 
+    await app.state.loop_monitor.stop()
+
     reconcilation_task.cancel()
     cleanup_task.cancel()
 
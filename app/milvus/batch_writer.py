@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from tenacity import (
+    AsyncRetrying,
+    before_sleep_log,
+    stop_after_attempt,
+    wait_exponential,
+)
+from app.constants.globals import (
+    MILVUS_BATCH_MAX_BYTES,
+    MILVUS_BATCH_MAX_ROWS,
+    MILVUS_MAX_IN_FLIGHT_BATCHES,
+    MILVUS_BATCH_RETRY_ATTEMPTS,
+    MILVUS_BATCH_RETRY_MAX_WAIT,
+)
+from app.milvus.client import MilvusOps
+from app.milvus.entity import CollectionSchemaBatch
+
+logger = logging.getLogger(__name__)
+
+# rough allowance for the scalar fields and per-row protobuf framing
+ROW_OVERHEAD_BYTES = 512
+
+
+def split_into_batches(
+    data: CollectionSchemaBatch, max_bytes: int, max_rows: int
+) -> List[CollectionSchemaBatch]:
+    vector_bytes = data.text_dense_vectors[0].nbytes if len(data) else 0
+    fixed_bytes = (
+        vector_bytes
+        + len(data.object_key)
+        + len(data.file_name)
+        + len(data.category)
+        + ROW_OVERHEAD_BYTES
+    )
+
+    batches: List[CollectionSchemaBatch] = []
+    start = 0
+    current_bytes = 0
+
+    for i, text in enumerate(data.text_contents):
+        size = fixed_bytes + len(text.encode("utf-8"))
+        if i > start and (current_bytes + size > max_bytes or i - start >= max_rows):
+            batches.append(data.slice(start, i))
+            start = i
+            current_bytes = 0
+        current_bytes += size
+
+    if start < len(data):
+        batches.append(data.slice(start, len(data)))
+
+    return batches
+
+
+class MilvusBatchWriter:
+    def __init__(
+        self,
+        milvus_ops: MilvusOps,
+        max_batch_bytes: int = MILVUS_BATCH_MAX_BYTES,
+        max_batch_rows: int = MILVUS_BATCH_MAX_ROWS,
+        max_in_flight: int = MILVUS_MAX_IN_FLIGHT_BATCHES,
+        retry_attempts: int = MILVUS_BATCH_RETRY_ATTEMPTS,
+    ):
+        self.milvus_ops = milvus_ops
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_rows = max_batch_rows
+        self.max_in_flight = max_in_flight
+        self.retry_attempts = retry_attempts
+        self._in_flight: Dict[str, asyncio.Semaphore] = {}
+
+    def _collection_slots(self, collection_name: str) -> asyncio.Semaphore:
+        if collection_name not in self._in_flight:
+            self._in_flight[collection_name] = asyncio.Semaphore(self.max_in_flight)
+        return self._in_flight[collection_name]
+
+    async def _upsert_batch(
+        self, collection_name: str, batch: CollectionSchemaBatch, index: int
+    ):
+        async with self._collection_slots(collection_name):
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.retry_attempts),
+                wait=wait_exponential(multiplier=0.5, max=MILVUS_BATCH_RETRY_MAX_WAIT),
+                before_sleep=before_sleep_log(logger, logging.WARNING),
+                reraise=True,
+            ):
+                with attempt:
+                    await asyncio.to_thread(
+                        self.milvus_ops.upsert_into_collection,
+                        collection_name=collection_name,
+                        data=batch,
+                    )
+
+        logger.debug(
+            f"upserted batch {index} of {len(batch)} rows into {collection_name}"
+        )
+
+    async def upsert(self, collection_name: str, data: CollectionSchemaBatch):
+        if len(data) == 0:
+            return
+
+        batches = split_into_batches(
+            data=data,
+            max_bytes=self.max_batch_bytes,
+            max_rows=self.max_batch_rows,
+        )
+
+        results = await asyncio.gather(
+            *[
+                self._upsert_batch(
+                    collection_name=collection_name, batch=batch, index=i
+                )
+                for i, batch in enumerate(batches)
+            ],
+            return_exceptions=True,
+        )
+
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if failures:
+            logger.error(
+                f"{len(failures)} of {len(batches)} batches failed upserting into "
+                f"{collection_name} after {self.retry_attempts} attempts"
+            )
+            raise failures[0]
+
+        logger.info(
+            f"upserted {len(data)} rows into {collection_name} in {len(batches)} batches"
+        )
@@ -7,15 +7,30 @@ from pymilvus import (
 )
 from app.core.config import Settings
 from app.constants.globals import MODEL_DIMENSION
-from app.milvus.entity import CollectionSchemaEntity, auto_generated_fields
+from app.milvus.entity import CollectionSchemaBatch
+from app.milvus.vector_layout import (
+    DENSE_VECTOR_LAYOUTS,
+    RERANK_VECTOR_FIELD,
+    encode_dense_vectors,
+)
 from app.milvus.entity import get_global_searching_configuration, SearchingConfiguration
 from app.dao.schema import SearchMethodEnum
 from typing import List
-from dataclasses import asdict
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+SEARCH_OUTPUT_FIELDS = [
+    "category",
+    "object_key",
+    "file_name",
+    "text_content",
+    "file_id",
+    "user_id",
+    "parent_id",
+]
+
 
 class MilvusOps:
     def __init__(self, settings: Settings):
@@ -62,8 +77,12 @@ class MilvusOps:
             raise
 
     def create_collection(
-        self, collection_name: str, collection_type: SearchMethodEnum
+        self,
+        collection_name: str,
+        collection_type: SearchMethodEnum,
+        dimension: int = MODEL_DIMENSION,
     ):
+        layout = DENSE_VECTOR_LAYOUTS[collection_type]
         try:
             schema = self.client.create_schema()
             schema.add_field(
@@ -75,9 +94,17 @@ class MilvusOps:
             )
             schema.add_field(
                 field_name="text_dense_vector",
-                datatype=DataType.FLOAT_VECTOR,
-                dim=MODEL_DIMENSION,
+                datatype=layout.datatype,
+                dim=dimension,
             )
+            if layout.rerank_datatype is not None:
+                # only read back for rerank candidates, so it stays on disk
+                schema.add_field(
+                    field_name=RERANK_VECTOR_FIELD,
+                    datatype=layout.rerank_datatype,
+                    dim=dimension,
+                    mmap_enabled=True,
+                )
             schema.add_field(
                 field_name="text_sparse_vector",
                 datatype=DataType.SPARSE_FLOAT_VECTOR,
@@ -134,29 +161,22 @@ class MilvusOps:
 
             index_params = self.client.prepare_index_params()
 
-            if collection_type == SearchMethodEnum.HNSW:
-                index_params.add_index(
-                    field_name="text_dense_vector",
-                    index_name="text_dense_index",
-                    index_type="HNSW",
-                    metric_type="COSINE",
-                    params={"M": 32, "efConstruction": 400},
-                )
-            elif collection_type == SearchMethodEnum.FLAT:
+            index_params.add_index(
+                field_name="text_dense_vector",
+                index_name="text_dense_index",
+                index_type=layout.index_type,
+                metric_type=layout.metric_type,
+                params=layout.index_params,
+            )
+
+            if layout.rerank_datatype is not None:
+                # milvus only loads collections whose vector fields are all indexed
                 index_params.add_index(
-                    field_name="text_dense_vector",
-                    index_name="text_dense_index",
+                    field_name=RERANK_VECTOR_FIELD,
+                    index_name="text_rerank_index",
                     index_type="FLAT",
                     metric_type="COSINE",
-                    params={},
-                )
-            elif collection_type == SearchMethodEnum.IVF_SQ8:
-                index_params.add_index(
-                    field_name="text_dense_vector",
-                    index_name="text_dense_index",
-                    index_type="IVF_SQ8",
-                    metric_type="COSINE",
-                    params={"nlist": 128},
+                    params={"mmap.enabled": True},
                 )
 
             index_params.add_index(
@@ -206,22 +226,9 @@ class MilvusOps:
             logger.error("error dropping collection", exc_info=True)
             raise
 
-    def upsert_into_collection(
-        self, collection_name: str, data: List[CollectionSchemaEntity]
-    ):
-        data_to_upsert = []
-        for entity in data:
-            entity_dict = asdict(entity)
-
-            cleaned_dict = {
-                key: value
-                for key, value in entity_dict.items()
-                if key not in auto_generated_fields
-            }
-            data_to_upsert.append(cleaned_dict)
-
+    def upsert_into_collection(self, collection_name: str, data: CollectionSchemaBatch):
         try:
-            self.client.upsert(collection_name=collection_name, data=data_to_upsert)
+            self.client.upsert(collection_name=collection_name, data=data.rows())
             logger.info("successfully inserted the data into collection")
         except Exception as e:
             logger.error(f"error inserting data into collection: {e}", exc_info=e)
@@ -245,27 +252,93 @@ class MilvusOps:
             logger.error(f"error listing collections from milvus: {e}")
             raise
 
+    def _dense_search_params(
+        self,
+        generated_embeddings: List[float],
+        search_method: SearchMethodEnum,
+        limit: int,
+    ) -> dict:
+        layout = DENSE_VECTOR_LAYOUTS[search_method]
+        query_vector = encode_dense_vectors(
+            np.asarray([generated_embeddings], dtype=np.float32), layout
+        )
+        param = dict(layout.search_params)
+        if "ef" in param:
+            param["ef"] = self.search_config.hnsw_ef
+        return {
+            "data": [query_vector[0]],
+            "anns_field": "text_dense_vector",
+            "param": param,
+            "limit": limit,
+        }
+
+    def _sparse_search_params(self, query: str, limit: int) -> dict:
+        return {
+            "data": [query],
+            "anns_field": "text_sparse_vector",
+            "param": {"drop_ratio_search": self.search_config.sparse_drop_ratio},
+            "limit": limit,
+        }
+
+    def search(
+        self,
+        collection_name: str,
+        search_params: dict,
+        output_fields: List[str] = SEARCH_OUTPUT_FIELDS,
+    ):
+        try:
+            return self.client.search(
+                collection_name=collection_name,
+                data=search_params["data"],
+                anns_field=search_params["anns_field"],
+                search_params={"params": search_params["param"]},
+                limit=search_params["limit"],
+                output_fields=output_fields,
+            )
+        except Exception as e:
+            logger.error(f"error performing search remotely: {e}", exc_info=True)
+            raise
+
+    def dense_search(
+        self,
+        collection_name: str,
+        generated_embeddings: List[float],
+        search_method: SearchMethodEnum,
+        limit: int,
+        output_fields: List[str] = SEARCH_OUTPUT_FIELDS,
+    ):
+        return self.search(
+            collection_name=collection_name,
+            search_params=self._dense_search_params(
+                generated_embeddings=generated_embeddings,
+                search_method=search_method,
+                limit=limit,
+            ),
+            output_fields=output_fields,
+        )
+
+    def sparse_search(self, collection_name: str, query: str, limit: int):
+        return self.search(
+            collection_name=collection_name,
+            search_params=self._sparse_search_params(query=query, limit=limit),
+        )
+
     def hybrid_search(
         self,
         collection_name: str,
         query: str,
         generated_embeddings: List[float],
         limit: int = 10,
+        search_method: SearchMethodEnum = SearchMethodEnum.HNSW,
     ):
         try:
-            hnsw_search_params = {
-                "data": [generated_embeddings],
-                "anns_field": "text_dense_vector",
-                "param": {"ef": self.search_config.hnsw_ef},
-                "limit": limit,
-            }
-
-            sparse_search_params = {
-                "data": [query],
-                "anns_field": "text_sparse_vector",
-                "param": {"drop_ratio_search": self.search_config.sparse_drop_ratio},
-                "limit": limit,
-            }
+            hnsw_search_params = self._dense_search_params(
+                generated_embeddings=generated_embeddings,
+                search_method=search_method,
+                limit=limit,
+            )
+
+            sparse_search_params = self._sparse_search_params(query=query, limit=limit)
 
             hnsw_search_request = AnnSearchRequest(**hnsw_search_params)
             sparse_search_request = AnnSearchRequest(**sparse_search_params)
@@ -287,15 +360,7 @@ class MilvusOps:
                 reqs=all_requests,
                 ranker=ranker,
                 limit=limit,
-                output_fields=[
-                    "category",
-                    "object_key",
-                    "file_name",
-                    "text_content",
-                    "file_id",
-                    "user_id",
-                    "parent_id"
-                ],
+                output_fields=SEARCH_OUTPUT_FIELDS,
             )
 
             return response
@@ -1,25 +1,67 @@
-from dataclasses import dataclass
-from typing import Optional, List, Dict
+from dataclasses import dataclass, replace
+from typing import Any, List, Dict
+import numpy as np
 from pydantic import BaseModel
 from app.constants.globals import (
     HNSW_EF,
     SPARSE_DROP_RATIO,
     RERANKER_SMOOTHING_PARAMETERS,
 )
+from app.dao.schema import SearchMethodEnum
+from app.milvus.vector_layout import (
+    DENSE_VECTOR_LAYOUTS,
+    RERANK_VECTOR_FIELD,
+    encode_dense_vectors,
+)
 
 
 @dataclass
-class CollectionSchemaEntity:
-    id: str
-    text_dense_vector: List[float]
+class CollectionSchemaBatch:
+    ids: List[str]
+    text_dense_vectors: np.ndarray
+    text_contents: List[str]
+    parent_ids: List[int]
     category: str
     object_key: str
     file_name: str
-    text_content: str
     user_id: int
     file_id: int
-    parent_id: int
-    text_sparse_vector: Optional[Dict[int, float]] = None
+    search_method: SearchMethodEnum = SearchMethodEnum.HNSW
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def slice(self, start: int, end: int) -> "CollectionSchemaBatch":
+        return replace(
+            self,
+            ids=self.ids[start:end],
+            text_dense_vectors=self.text_dense_vectors[start:end],
+            text_contents=self.text_contents[start:end],
+            parent_ids=self.parent_ids[start:end],
+        )
+
+    def rows(self) -> List[Dict[str, Any]]:
+        layout = DENSE_VECTOR_LAYOUTS[self.search_method]
+        vectors = encode_dense_vectors(self.text_dense_vectors, layout)
+        rows = [
+            {
+                "id": self.ids[i],
+                "text_dense_vector": vectors[i],
+                "text_content": self.text_contents[i],
+                "parent_id": self.parent_ids[i],
+                "category": self.category,
+                "object_key": self.object_key,
+                "file_name": self.file_name,
+                "user_id": self.user_id,
+                "file_id": self.file_id,
+            }
+            for i in range(len(self.ids))
+        ]
+        if layout.rerank_datatype is not None:
+            rerank_vectors = self.text_dense_vectors.astype(np.float16)
+            for row, vector in zip(rows, rerank_vectors):
+                row[RERANK_VECTOR_FIELD] = vector
+        return rows
 
 
 class SearchingConfiguration(BaseModel):
@@ -28,9 +70,6 @@ class SearchingConfiguration(BaseModel):
     reranker_smoothing_parameter: int = 60
 
 
-auto_generated_fields = {"text_sparse_vector"}
-
-
 def get_global_searching_configuration() -> SearchingConfiguration:
     return SearchingConfiguration(
         hnsw_ef=HNSW_EF,
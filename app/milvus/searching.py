@@ -1,24 +1,55 @@
+import asyncio
 import logging
-from langchain_openai import OpenAIEmbeddings
-from typing import List
+from typing import Dict, List, Optional
+
+import numpy as np
 from app.core.config import Settings
-from app.constants.models import OPENAI_EMBEDDINGS_MODEL
-from app.milvus.client import MilvusOps
+from app.constants.globals import (
+    MODEL_DIMENSION,
+    SEARCH_RERANK_CANDIDATE_FACTOR,
+    SEARCH_RERANK_MAX_CANDIDATES,
+)
+from app.dao.schema import SearchMethodEnum
+from app.embeddings.gateway import EmbeddingGateway, EmbeddingPriority
+from app.embeddings.providers import OpenAIEmbeddingProvider
+from app.milvus.client import SEARCH_OUTPUT_FIELDS, MilvusOps
+from app.milvus.vector_layout import (
+    DENSE_VECTOR_LAYOUTS,
+    decode_rerank_vector,
+    rerank_vector_field,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _reciprocal_rank_fusion(rankings: List[List], k: int, limit: int) -> List:
+    scores: Dict = {}
+    hits: Dict = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            scores[hit.id] = scores.get(hit.id, 0.0) + 1.0 / (k + rank + 1)
+            hits.setdefault(hit.id, hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [hits[hit_id] for hit_id in ranked]
+
+
 class SearchOps:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        embedding_gateway: EmbeddingGateway,
+    ):
         self.settings: Settings = settings
-        self.embeddings = OpenAIEmbeddings(
-            model=OPENAI_EMBEDDINGS_MODEL, api_key=self.settings.OPENAI_KEY
-        )
+        self.embedding_provider = OpenAIEmbeddingProvider(gateway=embedding_gateway)
         self.milvus_ops = MilvusOps(settings=self.settings)
 
-    def __generate_query_embeddings(self, query: str) -> List[float]:
+    async def __generate_query_embeddings(
+        self, query: str, dimension: int
+    ) -> List[float]:
         try:
-            generated_embeddings = self.embeddings.embed_query(text=query)
+            generated_embeddings = await self.embedding_provider.embeddings(
+                EmbeddingPriority.INTERACTIVE, dimension=dimension
+            ).aembed_query(text=query)
             return generated_embeddings
         except Exception as e:
             logger.error(
@@ -26,24 +57,131 @@ class SearchOps:
             )
             raise
 
-    def perform_hybrid_search(self, collection_name: str, query: str, limit: int):
+    def _rescore(
+        self,
+        hits: List,
+        generated_embeddings: List[float],
+        search_method: SearchMethodEnum,
+        limit: int,
+    ) -> List:
+        # scores against the vectors milvus returned with the candidates, the
+        # provider is never called on the search path
+        layout = DENSE_VECTOR_LAYOUTS[search_method]
+        field = rerank_vector_field(layout)
+        scored = [hit for hit in hits if hit.entity.get(field) is not None]
+        if len(scored) < len(hits):
+            logger.warning(
+                f"{len(hits) - len(scored)} rerank candidates came back without "
+                f"'{field}', keeping their index order"
+            )
+        if not scored:
+            return hits[:limit]
+
+        candidate_embeddings = np.stack(
+            [decode_rerank_vector(hit.entity.get(field), layout) for hit in scored]
+        )
+        query_embedding = np.asarray(generated_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(candidate_embeddings, axis=1) * np.linalg.norm(
+            query_embedding
+        )
+        scores = candidate_embeddings @ query_embedding / np.maximum(norms, 1e-12)
+        order = np.argsort(-scores, kind="stable")
+        unscored = [hit for hit in hits if hit.entity.get(field) is None]
+        return ([scored[i] for i in order] + unscored)[:limit]
+
+    async def _reranked_search(
+        self,
+        collection_name: str,
+        query: str,
+        generated_embeddings: List[float],
+        limit: int,
+        search_method: SearchMethodEnum,
+    ):
+        candidates = max(
+            limit,
+            min(limit * SEARCH_RERANK_CANDIDATE_FACTOR, SEARCH_RERANK_MAX_CANDIDATES),
+        )
+        dense_response, sparse_response = await asyncio.gather(
+            asyncio.to_thread(
+                self.milvus_ops.dense_search,
+                collection_name=collection_name,
+                generated_embeddings=generated_embeddings,
+                search_method=search_method,
+                limit=candidates,
+                output_fields=SEARCH_OUTPUT_FIELDS
+                + [rerank_vector_field(DENSE_VECTOR_LAYOUTS[search_method])],
+            ),
+            asyncio.to_thread(
+                self.milvus_ops.sparse_search,
+                collection_name=collection_name,
+                query=query,
+                limit=limit,
+            ),
+        )
+
+        dense_hits = list(dense_response[0]) if dense_response else []
+        sparse_hits = list(sparse_response[0]) if sparse_response else []
+        if dense_hits:
+            dense_hits = self._rescore(
+                hits=dense_hits,
+                generated_embeddings=generated_embeddings,
+                search_method=search_method,
+                limit=limit,
+            )
+        # the rerank vector was only fetched to rescore, it never goes to the client
+        rerank_field = rerank_vector_field(DENSE_VECTOR_LAYOUTS[search_method])
+        for hit in dense_hits:
+            hit["entity"].pop(rerank_field, None)
+
+        # same fusion the hybrid search applies server side
+        fused = _reciprocal_rank_fusion(
+            [dense_hits, sparse_hits],
+            k=self.milvus_ops.search_config.reranker_smoothing_parameter,
+            limit=limit,
+        )
+        return [fused] if fused else []
+
+    async def perform_hybrid_search(
+        self,
+        collection_name: str,
+        query: str,
+        limit: int,
+        dimension: int = MODEL_DIMENSION,
+        search_method: SearchMethodEnum = SearchMethodEnum.HNSW,
+        rerank: Optional[bool] = None,
+    ):
         try:
             search_limit = None
             if limit == 0:
                 search_limit = 10
             else:
                 search_limit = limit
-            generated_embeddings = self.__generate_query_embeddings(query=query)
-            search_response = self.milvus_ops.hybrid_search(
+            generated_embeddings = await self.__generate_query_embeddings(
+                query=query, dimension=dimension
+            )
+
+            if rerank is None:
+                rerank = DENSE_VECTOR_LAYOUTS[search_method].rerank
+
+            if rerank:
+                return await self._reranked_search(
+                    collection_name=collection_name,
+                    query=query,
+                    generated_embeddings=generated_embeddings,
+                    limit=search_limit,
+                    search_method=search_method,
+                )
+
+            search_response = await asyncio.to_thread(
+                self.milvus_ops.hybrid_search,
                 collection_name=collection_name,
                 query=query,
                 generated_embeddings=generated_embeddings,
                 limit=search_limit,
+                search_method=search_method,
             )
 
             return search_response
         except Exception as e:
             logger.error(f"error performing hybrid search: {e}", exc_info=True)
             raise
-
-    
@@ -0,0 +1,111 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import numpy as np
+from pymilvus import DataType
+from app.constants.globals import BIN_IVF_NLIST, BIN_IVF_NPROBE, HNSW_EF
+from app.dao.schema import SearchMethodEnum
+
+
+@dataclass(frozen=True)
+class DenseVectorLayout:
+    datatype: DataType
+    index_type: str
+    metric_type: str
+    index_params: Dict[str, Any] = field(default_factory=dict)
+    search_params: Dict[str, Any] = field(default_factory=dict)
+    # compact layouts whose ranking drifts enough to rescore candidates at
+    # full precision by default
+    rerank: bool = False
+    # compact layouts keep a half precision copy next to the index to rescore with
+    rerank_datatype: Optional[DataType] = None
+
+
+RERANK_VECTOR_FIELD = "text_rerank_vector"
+
+# memory per vector is for the raw field at dimension d, index overhead such as
+# the HNSW graph (roughly M * 8 bytes per vector) comes on top. the rerank copy
+# of the compact layouts is memory mapped, it costs 2 * d bytes of disk
+DENSE_VECTOR_LAYOUTS: Dict[SearchMethodEnum, DenseVectorLayout] = {
+    # 4 * d bytes, exact search
+    SearchMethodEnum.FLAT: DenseVectorLayout(
+        datatype=DataType.FLOAT_VECTOR,
+        index_type="FLAT",
+        metric_type="COSINE",
+        search_params={"ef": HNSW_EF},
+    ),
+    # 4 * d bytes, graph search with near exact recall
+    SearchMethodEnum.HNSW: DenseVectorLayout(
+        datatype=DataType.FLOAT_VECTOR,
+        index_type="HNSW",
+        metric_type="COSINE",
+        index_params={"M": 32, "efConstruction": 400},
+        search_params={"ef": HNSW_EF},
+    ),
+    # 4 * d bytes stored, d bytes of scalar quantised codes in the index
+    SearchMethodEnum.IVF_SQ8: DenseVectorLayout(
+        datatype=DataType.FLOAT_VECTOR,
+        index_type="IVF_SQ8",
+        metric_type="COSINE",
+        index_params={"nlist": 128},
+        search_params={"ef": HNSW_EF},
+    ),
+    # 2 * d bytes, half precision keeps recall within noise of float32
+    SearchMethodEnum.HNSW_FP16: DenseVectorLayout(
+        datatype=DataType.FLOAT16_VECTOR,
+        index_type="HNSW",
+        metric_type="COSINE",
+        index_params={"M": 32, "efConstruction": 400},
+        search_params={"ef": HNSW_EF},
+    ),
+    # d bytes, 127 levels per component loses a little recall at the tail
+    SearchMethodEnum.HNSW_INT8: DenseVectorLayout(
+        datatype=DataType.INT8_VECTOR,
+        index_type="HNSW",
+        metric_type="COSINE",
+        index_params={"M": 32, "efConstruction": 400},
+        search_params={"ef": HNSW_EF},
+        rerank=True,
+        rerank_datatype=DataType.FLOAT16_VECTOR,
+    ),
+    # d / 8 bytes, sign bits only, recall drops noticeably without a rerank
+    SearchMethodEnum.BIN_IVF_FLAT: DenseVectorLayout(
+        datatype=DataType.BINARY_VECTOR,
+        index_type="BIN_IVF_FLAT",
+        metric_type="HAMMING",
+        index_params={"nlist": BIN_IVF_NLIST},
+        search_params={"nprobe": BIN_IVF_NPROBE},
+        rerank=True,
+        rerank_datatype=DataType.FLOAT16_VECTOR,
+    ),
+}
+
+
+def encode_dense_vectors(vectors: np.ndarray, layout: DenseVectorLayout):
+    if layout.datatype == DataType.FLOAT16_VECTOR:
+        return vectors.astype(np.float16)
+    elif layout.datatype == DataType.INT8_VECTOR:
+        # embeddings are unit length, so every component already sits in [-1, 1]
+        return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8)
+    elif layout.datatype == DataType.BINARY_VECTOR:
+        return [row.tobytes() for row in np.packbits(vectors > 0, axis=-1)]
+    return vectors
+
+
+def rerank_vector_field(layout: DenseVectorLayout) -> str:
+    # float layouts already store the vector the query is scored against
+    if layout.rerank_datatype is not None:
+        return RERANK_VECTOR_FIELD
+    return "text_dense_vector"
+
+
+def decode_rerank_vector(value, layout: DenseVectorLayout) -> np.ndarray:
+    datatype = layout.rerank_datatype or layout.datatype
+    # half precision vectors come back from milvus as raw bytes, sometimes
+    # wrapped in a single element list
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], bytes):
+        value = value[0]
+    if isinstance(value, bytes):
+        dtype = np.float16 if datatype == DataType.FLOAT16_VECTOR else np.float32
+        return np.frombuffer(value, dtype=dtype).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
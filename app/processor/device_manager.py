@@ -15,7 +15,7 @@ class DeviceManager:
     @staticmethod
     def get_optimal_device() -> DeviceType:
         if torch.cuda.is_available():
-            gpu_memory = torch.cuda.get_device_properties(0).total_memory / (1024 * 3)
+            gpu_memory = torch.cuda.get_device_properties(0).total_memory / (1024**3)
             logger.info(f"GPU available with {gpu_memory:.2f} GB memory")
             return DeviceType.GPU
         else:
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import tempfile
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, AsyncIterator, Deque, Dict, List, Optional
+
+from app.aws.client import AwsClientManager
+from app.constants.globals import (
+    SPOOL_MAX_BYTES,
+    PREFETCH_MAX_BYTES_IN_FLIGHT,
+    PREFETCH_MAX_DOWNLOADS,
+)
+from app.core.file_extension_validation import is_valid_file_extension
+from app.core.temp import ScratchSpace
+from app.utils.byte_budget import ByteBudget
+from app.dao.schema import ParsingTierEnum
+from app.processor.loaders import DocumentLoaderFactory, resolve_parsing_tier
+from langchain_core.document_loaders import BaseLoader
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidFileExtension(Exception):
+    pass
+
+
+@dataclass
+class DownloadedFile:
+    object_key: str
+    size: int
+    path: Optional[str] = None
+    buffer: Optional[IO[bytes]] = None
+    download_seconds: float = 0.0
+
+    @property
+    def in_memory(self) -> bool:
+        return self.buffer is not None
+
+    def resolve_parsing_tier(self, parsing_tier: ParsingTierEnum) -> ParsingTierEnum:
+        return resolve_parsing_tier(
+            parsing_tier=parsing_tier,
+            file_name=self.object_key,
+            source=self.buffer if self.buffer is not None else self.path,
+        )
+
+    def create_loader(
+        self, parsing_tier: ParsingTierEnum = ParsingTierEnum.HI_RES
+    ) -> Optional[BaseLoader]:
+        if self.buffer is not None:
+            return DocumentLoaderFactory.create_stream_loader(
+                stream=self.buffer,
+                file_name=Path(self.object_key).name,
+                parsing_tier=parsing_tier,
+            )
+        return DocumentLoaderFactory.create_loader(
+            file_path=self.path, parsing_tier=parsing_tier
+        )
+
+
+class FileDownloader:
+    def __init__(self, aws_client: AwsClientManager, scratch_space: ScratchSpace):
+        self.aws_client = aws_client
+        self.scratch_space = scratch_space
+        self.in_memory_bytes = 0
+
+    async def object_size(self, object_key: str) -> int:
+        return await asyncio.to_thread(
+            self.aws_client.get_object_size, object_key=object_key
+        )
+
+    @asynccontextmanager
+    async def download(
+        self, object_key: str, size: Optional[int] = None
+    ) -> AsyncIterator[DownloadedFile]:
+        extension = Path(object_key).suffix
+
+        if not is_valid_file_extension(extension=extension):
+            raise InvalidFileExtension(
+                "invalid file extension, file cannot be processed"
+            )
+
+        if size is None:
+            size = await self.object_size(object_key=object_key)
+
+        if size <= SPOOL_MAX_BYTES and DocumentLoaderFactory.supports_stream(extension):
+            async with self._download_to_memory(object_key, size) as downloaded:
+                yield downloaded
+        else:
+            async with self._download_to_scratch(
+                object_key, size, extension
+            ) as downloaded:
+                yield downloaded
+
+    def prefetch(self, object_keys: List[str]) -> "DownloadPrefetcher":
+        return DownloadPrefetcher(downloader=self, object_keys=object_keys)
+
+    @asynccontextmanager
+    async def _download_to_memory(
+        self, object_key: str, size: int
+    ) -> AsyncIterator[DownloadedFile]:
+        buffer = tempfile.SpooledTemporaryFile(
+            max_size=SPOOL_MAX_BYTES, dir=self.scratch_space.directory
+        )
+        self.in_memory_bytes += size
+        try:
+            started = time.perf_counter()
+            await asyncio.to_thread(
+                self.aws_client.download_fileobj, object_key=object_key, fileobj=buffer
+            )
+            buffer.seek(0)
+            yield DownloadedFile(
+                object_key=object_key,
+                size=size,
+                buffer=buffer,
+                download_seconds=time.perf_counter() - started,
+            )
+        finally:
+            buffer.close()
+            self.in_memory_bytes -= size
+
+    @asynccontextmanager
+    async def _download_to_scratch(
+        self, object_key: str, size: int, extension: str
+    ) -> AsyncIterator[DownloadedFile]:
+        async with self.scratch_space.reserve(size=size, suffix=extension) as path:
+            started = time.perf_counter()
+            await asyncio.to_thread(
+                self.aws_client.download_file,
+                object_key=object_key,
+                temp_file_path=path,
+            )
+            yield DownloadedFile(
+                object_key=object_key,
+                size=size,
+                path=path,
+                download_seconds=time.perf_counter() - started,
+            )
+
+
+@dataclass
+class PrefetchStats:
+    files: int = 0
+    bytes_downloaded: int = 0
+    download_seconds: float = 0.0
+    network_wait_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+
+
+class DownloadPrefetcher:
+    def __init__(
+        self,
+        downloader: FileDownloader,
+        object_keys: List[str],
+        max_bytes_in_flight: int = PREFETCH_MAX_BYTES_IN_FLIGHT,
+        max_downloads: int = PREFETCH_MAX_DOWNLOADS,
+    ):
+        self.downloader = downloader
+        self.object_keys = object_keys
+        self.budget = ByteBudget(max_bytes=max_bytes_in_flight)
+        self.stats = PrefetchStats()
+        self._download_slots = asyncio.Semaphore(max_downloads)
+        # keyed by position, a key listed twice is downloaded once per consumer
+        # since each one closes its copy when it is done
+        self._ready: List[asyncio.Future] = []
+        self._done: List[asyncio.Event] = []
+        self._admitted: List[asyncio.Event] = []
+        self._positions: Dict[str, Deque[int]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def __aenter__(self) -> "DownloadPrefetcher":
+        loop = asyncio.get_running_loop()
+        previous: Optional[asyncio.Event] = None
+        for position, object_key in enumerate(self.object_keys):
+            self._ready.append(loop.create_future())
+            self._done.append(asyncio.Event())
+            self._positions.setdefault(object_key, deque()).append(position)
+            admitted = asyncio.Event()
+            self._admitted.append(admitted)
+            self._tasks.append(
+                asyncio.create_task(
+                    self._fetch(
+                        position, object_key, previous=previous, admitted=admitted
+                    ),
+                    name=f"prefetch:{position}:{object_key}",
+                )
+            )
+            previous = admitted
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _fetch(
+        self,
+        position: int,
+        object_key: str,
+        previous: Optional[asyncio.Event],
+        admitted: asyncio.Event,
+    ):
+        ready = self._ready[position]
+        size = 0
+        try:
+            async with AsyncExitStack() as stack:
+                async with self._download_slots:
+                    # files are admitted into the byte budget in the order they will be
+                    # consumed, so the bytes held are always for files ahead in the queue
+                    try:
+                        if previous is not None:
+                            await previous.wait()
+                        size = await self.downloader.object_size(object_key=object_key)
+                        await self.budget.acquire(size)
+                        stack.push_async_callback(self.budget.release, size)
+                    finally:
+                        admitted.set()
+
+                    downloaded = await stack.enter_async_context(
+                        self.downloader.download(object_key=object_key, size=size)
+                    )
+
+                ready.set_result(downloaded)
+                await self._done[position].wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            if not ready.done():
+                ready.cancel()
+
+    def claim(self, object_key: str) -> int:
+        positions = self._positions.get(object_key)
+        if not positions:
+            raise KeyError(f"{object_key} was not prefetched or is already taken")
+        return positions.popleft()
+
+    def discard(self, position: int):
+        # a consumer that failed before reading its file must not keep its bytes
+        # in the budget, the files queued behind it would never be admitted
+        if not self._ready[position].done():
+            self._tasks[position].cancel()
+            # a fetch cancelled before it started never lets the next file in
+            self._admitted[position].set()
+        self._done[position].set()
+
+    @asynccontextmanager
+    async def get(self, position: int) -> AsyncIterator[DownloadedFile]:
+        try:
+            started = time.perf_counter()
+            try:
+                downloaded: DownloadedFile = await self._ready[position]
+            finally:
+                self.stats.network_wait_seconds += time.perf_counter() - started
+
+            self.stats.files += 1
+            self.stats.bytes_downloaded += downloaded.size
+            self.stats.download_seconds += downloaded.download_seconds
+            yield downloaded
+        finally:
+            self._done[position].set()
+
+    def record_cpu(self, seconds: float):
+        self.stats.cpu_seconds += seconds
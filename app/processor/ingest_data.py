@@ -1,33 +1,106 @@
 import asyncio
+import itertools
 import logging
-import uuid
+import time
+import numpy as np
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Sequence, Tuple
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
+from langchain_core.document_loaders import BaseLoader
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-from app.constants.models import OPENAI_EMBEDDINGS_MODEL
+from langchain_core.embeddings import Embeddings
 from app.aws.client import AwsClientManager
-from app.constants.globals import MAX_CONCURRENT_PROVISIONER
-from app.core.file_extension_validation import is_valid_file_extension
-from app.core.temp import get_system_temp_file_path
+from app.constants.globals import (
+    MAX_CONCURRENT_PROVISIONER,
+    MODEL_DIMENSION,
+    SCRATCH_MAX_BYTES,
+    MILVUS_DELETE_BATCH_SIZE,
+    INGESTION_STREAM_BATCH_CHARS,
+    INGESTION_STREAM_PREFETCH_BATCHES,
+)
+from app.core.temp import ScratchSpace
 from app.dao.models import FileForIngestion
-from app.dao.schema import OperationStatusEnum, ParentChunkedDoc
+from app.dao.schema import (
+    ChunkFingerprint,
+    ChunkingStrategyEnum,
+    OperationStatusEnum,
+    ParsingTierEnum,
+    SearchMethodEnum,
+)
+from app.milvus.batch_writer import MilvusBatchWriter
 from app.milvus.client import MilvusOps
-from app.milvus.entity import CollectionSchemaEntity
-from app.processor.loaders import DocumentLoaderFactory
+from app.milvus.entity import CollectionSchemaBatch
+from app.processor.downloader import (
+    DownloadedFile,
+    DownloadPrefetcher,
+    FileDownloader,
+)
+from app.processor.pdf_extractor import (
+    ParallelPdfExtractor,
+    PdfSource,
+    count_pages,
+)
 from app.processor.parent_document_retriever import ParentDocumentRetriever
+from app.processor.recursive_chunker import RecursiveTokenChunker
+from app.processor.near_duplicates import (
+    NearDuplicateIndex,
+    fingerprint_bands,
+    is_fingerprintable,
+    simhash,
+    to_signed,
+    to_unsigned,
+)
 from app.utils.deterministic_id import generate_chunk_id
 from app.core.config import Settings
-from app.dao.ingestion_dao import create_parent_chunk, delete_parent_chunk
+from app.dao.ingestion_dao import (
+    bulk_create_chunk_fingerprints,
+    bulk_create_parent_chunks,
+    confirm_parent_chunks,
+    delete_parent_chunks_by_ids,
+    delete_parent_chunks_for_kb_docs,
+    find_fingerprints_sharing_bands,
+    get_completed_kb_doc_ids,
+    get_confirmed_hash_counts,
+    get_ingestion_checkpoint,
+    get_orphaned_duplicates,
+    get_parent_chunk_hashes,
+    get_parent_chunk_ids_for_kb_docs,
+    get_unconfirmed_parent_ids,
+    promote_chunk_fingerprints,
+    record_document_parsing,
+    repoint_chunk_fingerprints,
+    save_ingestion_checkpoint,
+)
 from app.core.db import SessionLocal
+from app.embeddings.cache import CachedEmbeddings, EmbeddingCache, content_hash
+from app.embeddings.gateway import EmbeddingGateway, EmbeddingPriority
+from app.embeddings.providers import OpenAIEmbeddingProvider, create_embedding_provider
+from app.embeddings.metered import MeteredEmbeddings
+from app.core.metrics import (
+    FileMetrics,
+    JobMetrics,
+    current_file_metrics,
+    measure_stage,
+    tally_stages,
+)
 
 
 logger = logging.getLogger(__name__)
 
-
-class InvalidFileExtension(Exception):
-    pass
+CHUNK_EMBEDDINGS_STAGE = "chunk_embeddings"
 
 
 class DocumentNotLoaded(Exception):
@@ -38,39 +111,185 @@ class DocumentNotChunked(Exception):
     pass
 
 
+def _shorten(embeddings: np.ndarray, dimension: int) -> np.ndarray:
+    if embeddings.shape[1] == dimension:
+        return embeddings
+    shortened = np.ascontiguousarray(embeddings[:, :dimension])
+    norms = np.linalg.norm(shortened, axis=1, keepdims=True)
+    return shortened / np.where(norms > 0, norms, 1)
+
+
+def _skip_documents(documents: Iterator[Document], count: int) -> int:
+    return sum(1 for _ in itertools.islice(documents, count))
+
+
+def _next_document_batch(
+    documents: Iterator[Document], max_chars: int
+) -> List[Document]:
+    batch: List[Document] = []
+    size = 0
+    for document in documents:
+        batch.append(document)
+        size += len(document.page_content)
+        if size >= max_chars:
+            break
+    return batch
+
+
+@dataclass
+class ParsedFile:
+    resolved_tier: ParsingTierEnum = ParsingTierEnum.FAST
+    parse_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    pages: int = 0
+
+
+def _child_fingerprints(chunked_docs: List[dict]) -> List[List[Optional[int]]]:
+    return [
+        [
+            simhash(doc.page_content) if is_fingerprintable(doc.page_content) else None
+            for doc in chunked_doc["child_doc"]
+        ]
+        for chunked_doc in chunked_docs
+    ]
+
+
+def _occurrence_keys(
+    hashes: List[Optional[str]], seen: Optional[Dict[Optional[str], int]] = None
+) -> List[Tuple[Optional[str], int]]:
+    # identical parent chunks within one document are told apart by occurrence,
+    # passing the same seen dict keeps counting across batches of one document
+    seen = {} if seen is None else seen
+    keys = []
+    for value in hashes:
+        occurrence = seen.get(value, 0)
+        seen[value] = occurrence + 1
+        keys.append((value, occurrence))
+    return keys
+
+
 class IngestData:
     def __init__(
         self,
         settings: Settings,
         aws_client_manager: AwsClientManager,
         milvus_ops: MilvusOps,
+        embedding_cache: EmbeddingCache,
+        embedding_gateway: EmbeddingGateway,
     ):
-        self.embeddings = OpenAIEmbeddings(
-            model=OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_KEY
+        # child vectors land in milvus next to the query vectors, so they always
+        # come from the provider search uses; chunk boundaries are never stored
+        # and may come from any provider
+        self.embedding_provider = OpenAIEmbeddingProvider(gateway=embedding_gateway)
+        self.chunk_embedding_provider = create_embedding_provider(
+            provider_type=settings.CHUNK_EMBEDDING_PROVIDER, gateway=embedding_gateway
         )
         self.aws_client = aws_client_manager
+        self.downloader = FileDownloader(
+            aws_client=aws_client_manager,
+            scratch_space=ScratchSpace(
+                max_bytes=SCRATCH_MAX_BYTES, directory=settings.SCRATCH_DIR
+            ),
+        )
         self.milvus_ops = milvus_ops
-        self.semantic_chunker = ParentDocumentRetriever(embeddings=self.embeddings)
+        self.milvus_writer = MilvusBatchWriter(milvus_ops=milvus_ops)
+        self.embedding_cache = embedding_cache
+        self.child_embeddings: Dict[int, Embeddings] = {}
+        self.semantic_chunker = ParentDocumentRetriever(
+            embeddings=CachedEmbeddings(
+                embeddings=MeteredEmbeddings(
+                    embeddings=self.chunk_embedding_provider.embeddings(
+                        EmbeddingPriority.BULK
+                    ),
+                    model=self.chunk_embedding_provider.model,
+                    stage=CHUNK_EMBEDDINGS_STAGE,
+                ),
+                cache=embedding_cache,
+                dimension=self.chunk_embedding_provider.dimension,
+                model=self.chunk_embedding_provider.model,
+            )
+        )
+        self.chunkers = {
+            ChunkingStrategyEnum.SEMANTIC: self.semantic_chunker,
+            ChunkingStrategyEnum.RECURSIVE: RecursiveTokenChunker(
+                model=self.embedding_provider.model
+            ),
+        }
+        self.pdf_extractor = ParallelPdfExtractor()
+        self.stream_batch_chars = INGESTION_STREAM_BATCH_CHARS
+        self.stream_prefetch_batches = INGESTION_STREAM_PREFETCH_BATCHES
         self.max_concurrency = MAX_CONCURRENT_PROVISIONER
 
+    def _child_embeddings(self, dimension: int) -> Embeddings:
+        if dimension not in self.child_embeddings:
+            self.child_embeddings[dimension] = MeteredEmbeddings(
+                embeddings=self.embedding_provider.embeddings(
+                    EmbeddingPriority.BULK, dimension=dimension
+                ),
+                model=self.embedding_provider.model,
+                stage="child_embeddings",
+            )
+        return self.child_embeddings[dimension]
+
+    def close(self):
+        for chunker in self.chunkers.values():
+            chunker.close()
+        self.pdf_extractor.shutdown()
+        self.chunk_embedding_provider.close()
+
     async def index_data(
         self,
         files: List[FileForIngestion],
         user_id: int,
         category: str,
         collection_name: str,
+        ingestion_job_id: int,
+        parsing_tier: ParsingTierEnum = ParsingTierEnum.AUTO,
+        dimension: int = MODEL_DIMENSION,
+        search_method: SearchMethodEnum = SearchMethodEnum.HNSW,
+        chunking_strategy: ChunkingStrategyEnum = ChunkingStrategyEnum.SEMANTIC,
+        kb_id: Optional[int] = None,
+        deduplicate_chunks: bool = False,
+        job_metrics: Optional[JobMetrics] = None,
     ) -> List[Tuple[int, OperationStatusEnum]]:
         semaphore = asyncio.Semaphore(self.max_concurrency)
         results = []
 
+        async with SessionLocal() as db:
+            completed = set(
+                await get_completed_kb_doc_ids(
+                    db=db, ingestion_job_id=ingestion_job_id
+                )
+            )
+        if completed:
+            # files a previous delivery of this job finished are not fetched again
+            logger.info(
+                f"ingestion job {ingestion_job_id} already finished "
+                f"{len(completed)} files before redelivery"
+            )
+            results.extend(
+                (file.kb_doc_id, OperationStatusEnum.SUCCESS)
+                for file in files
+                if file.kb_doc_id in completed
+            )
+            files = [file for file in files if file.kb_doc_id not in completed]
+
         async def indexing_with_limit(
             file: FileForIngestion,
             user_id: int,
             category: int,
             collection_name: str,
-            db: AsyncSession,
+            prefetcher: DownloadPrefetcher,
         ):
-            async with semaphore:
+            # files commit batch by batch, so each one gets its own session
+            async with semaphore, SessionLocal() as db:
+                file_metrics = (
+                    job_metrics.file(kb_doc_id=file.kb_doc_id)
+                    if job_metrics is not None
+                    else FileMetrics(kb_doc_id=file.kb_doc_id)
+                )
+                current_file_metrics.set(file_metrics)
+                started = time.perf_counter()
                 try:
                     await self._upsert_into_milvus(
                         file=file,
@@ -78,12 +297,26 @@ class IngestData:
                         category=category,
                         collection_name=collection_name,
                         db=db,
+                        ingestion_job_id=ingestion_job_id,
+                        parsing_tier=parsing_tier,
+                        dimension=dimension,
+                        search_method=search_method,
+                        chunking_strategy=chunking_strategy,
+                        kb_id=kb_id,
+                        deduplicate_chunks=deduplicate_chunks,
+                        prefetcher=prefetcher,
+                    )
+                    file_metrics.finish(
+                        status="success", seconds=time.perf_counter() - started
                     )
                     logger.info(
                         "successfully processed and inserted into milvus collection"
                     )
                     return (file.kb_doc_id, OperationStatusEnum.SUCCESS)
                 except Exception as e:
+                    file_metrics.finish(
+                        status="failed", seconds=time.perf_counter() - started
+                    )
                     logger.error(
                         f"error processing file and inserting into collection: {e}",
                         exc_info=True,
@@ -91,9 +324,13 @@ class IngestData:
                     return (file.kb_doc_id, OperationStatusEnum.FAILED)
 
         exceptions = None
+        # one entry per file, two files sharing an object each get their own copy
+        prefetcher = self.downloader.prefetch(
+            object_keys=[file.object_key for file in files]
+        )
         try:
-            async with asyncio.TaskGroup() as tg:
-                async with SessionLocal() as db:
+            async with prefetcher:
+                async with asyncio.TaskGroup() as tg:
                     tasks = [
                         tg.create_task(
                             indexing_with_limit(
@@ -101,7 +338,7 @@ class IngestData:
                                 user_id=user_id,
                                 category=category,
                                 collection_name=collection_name,
-                                db=db,
+                                prefetcher=prefetcher,
                             )
                         )
                         for item in files
@@ -116,134 +353,613 @@ class IngestData:
         if exceptions:
             raise
 
+        stats = prefetcher.stats
+        logger.info(
+            f"indexing job downloaded {stats.files} files ({stats.bytes_downloaded} bytes) "
+            f"in {stats.download_seconds:.2f}s, waited {stats.network_wait_seconds:.2f}s "
+            f"on network, spent {stats.cpu_seconds:.2f}s parsing and chunking"
+        )
         logger.info("successfully index the data")
         return results
 
     async def reindex_data(
-        self, files: List[FileForIngestion], collection_name: str
+        self,
+        files: List[FileForIngestion],
+        collection_name: str,
+        user_id: int,
+        category: int,
+        dimension: int = MODEL_DIMENSION,
+        search_method: SearchMethodEnum = SearchMethodEnum.HNSW,
     ) -> List[Tuple[int, OperationStatusEnum]]:
-        semaphore = asyncio.Semaphore(self.max_concurrency)
-        results = []
+        statuses = {file.kb_doc_id: OperationStatusEnum.SUCCESS for file in files}
+        kb_doc_ids = list(statuses.keys())
 
-        async def reindexing_with_limit(
-            file: FileForIngestion, collection_name: str, db: AsyncSession
-        ):
-            async with semaphore:
+        # chunks other documents skipped as near duplicates of these documents are
+        # indexed in their place before anything is deleted
+        async with SessionLocal() as db:
+            try:
+                removed_ids = await get_parent_chunk_ids_for_kb_docs(
+                    db=db,
+                    kb_doc_ids=kb_doc_ids,
+                    document_ids=[file.doc_id for file in files],
+                )
+                restored = await self._restore_orphaned_duplicates(
+                    removed_ids=removed_ids,
+                    user_id=user_id,
+                    category=category,
+                    collection_name=collection_name,
+                    db=db,
+                    dimension=dimension,
+                    search_method=search_method,
+                )
+                await db.commit()
+            except Exception as e:
+                logger.error(
+                    f"error restoring near duplicates of {len(files)} documents: {e}",
+                    exc_info=True,
+                )
+                await db.rollback()
+                return [
+                    (kb_doc_id, OperationStatusEnum.FAILED) for kb_doc_id in kb_doc_ids
+                ]
+        if restored:
+            logger.info(
+                f"reindexing restored {restored} chunks whose near duplicate was removed"
+            )
+
+        for i in range(0, len(kb_doc_ids), MILVUS_DELETE_BATCH_SIZE):
+            batch = kb_doc_ids[i : i + MILVUS_DELETE_BATCH_SIZE]
+            try:
+                await asyncio.to_thread(
+                    self.milvus_ops.delete_entities_record,
+                    collection_name=collection_name,
+                    filter=f"file_id in {batch}",
+                )
+            except Exception as e:
+                logger.error(
+                    f"error deleting {len(batch)} documents from milvus: {e}",
+                    exc_info=True,
+                )
+                for kb_doc_id in batch:
+                    statuses[kb_doc_id] = OperationStatusEnum.FAILED
+
+        deleted_from_milvus = [
+            file
+            for file in files
+            if statuses[file.kb_doc_id] == OperationStatusEnum.SUCCESS
+        ]
+
+        if deleted_from_milvus:
+            async with SessionLocal() as db:
                 try:
-                    self._process_reindexing(
-                        file=file, collection_name=collection_name, db=db
+                    await delete_parent_chunks_for_kb_docs(
+                        db=db,
+                        kb_doc_ids=[file.kb_doc_id for file in deleted_from_milvus],
+                        document_ids=[file.doc_id for file in deleted_from_milvus],
                     )
-                    logger.info("successfully deleted from milvus")
-                    return (file.kb_doc_id, OperationStatusEnum.SUCCESS)
+                    await db.commit()
                 except Exception as e:
                     logger.error(
-                        f"error processing file for reindexing and deletion from milvus: {e}",
+                        f"error deleting parent chunks for reindexing: {e}",
                         exc_info=True,
                     )
-                    return (file.kb_doc_id, OperationStatusEnum.FAILED)
+                    await db.rollback()
+                    for file in deleted_from_milvus:
+                        statuses[file.kb_doc_id] = OperationStatusEnum.FAILED
 
-        exceptions = None
+        failed = sum(
+            1 for status in statuses.values() if status == OperationStatusEnum.FAILED
+        )
+        logger.info(
+            f"reindexing deleted {len(statuses) - failed} documents, {failed} failed"
+        )
+        return list(statuses.items())
+
+    async def _stream_chunked_docs(
+        self,
+        file: FileForIngestion,
+        parsing_tier: ParsingTierEnum,
+        chunking_strategy: ChunkingStrategyEnum,
+        parsed: ParsedFile,
+        prefetcher: Optional[DownloadPrefetcher] = None,
+        prefetch_position: Optional[int] = None,
+        skip_documents: int = 0,
+    ) -> AsyncIterator[Tuple[int, List[dict]]]:
+        chunker = self.chunkers[chunking_strategy]
+        if prefetcher is not None:
+            download = prefetcher.get(position=prefetch_position)
+        else:
+            download = self.downloader.download(object_key=file.object_key)
+
+        file_metrics = current_file_metrics.get()
+
+        # loaders read the download lazily, so it is held until the last batch
+        async with download as downloaded:
+            if file_metrics is not None:
+                file_metrics.add_stage("download", downloaded.download_seconds)
+                file_metrics.bytes = downloaded.size
+            parsed.resolved_tier = await asyncio.to_thread(
+                downloaded.resolve_parsing_tier, parsing_tier
+            )
+            total_pages = await self._parallel_pdf_pages(downloaded=downloaded)
+            if total_pages:
+                batches = self._chunk_pdf_pages(
+                    pdf=(
+                        downloaded.path
+                        if downloaded.path is not None
+                        else await asyncio.to_thread(downloaded.buffer.read)
+                    ),
+                    source=downloaded.object_key,
+                    total_pages=total_pages,
+                    chunker=chunker,
+                    parsed=parsed,
+                    skip_pages=skip_documents,
+                )
+            else:
+                loader = downloaded.create_loader(parsing_tier=parsed.resolved_tier)
+                if not loader:
+                    raise DocumentNotLoaded("cannot load the downloaded document")
+                batches = self._chunk_loaded_documents(
+                    loader=loader,
+                    chunker=chunker,
+                    parsed=parsed,
+                    skip_documents=skip_documents,
+                )
+
+            async with aclosing(batches):
+                async for batch in batches:
+                    yield batch
+
+        if prefetcher is not None:
+            prefetcher.record_cpu(parsed.cpu_seconds)
+
+    async def _chunk_loaded_documents(
+        self,
+        loader: BaseLoader,
+        chunker: Union[ParentDocumentRetriever, RecursiveTokenChunker],
+        parsed: ParsedFile,
+        skip_documents: int = 0,
+    ) -> AsyncIterator[Tuple[int, List[dict]]]:
+        documents = loader.lazy_load()
         try:
-            async with asyncio.TaskGroup() as tg:
-                async with SessionLocal() as db:
-                    tasks = [
-                        tg.create_task(
-                            reindexing_with_limit(
-                                file=item, collection_name=collection_name, db=db
-                            )
-                        )
-                        for item in files
-                    ]
+            if skip_documents:
+                # batches committed by an earlier delivery are read past, not chunked
+                started = time.perf_counter()
+                with measure_stage("load"):
+                    parsed.pages += await asyncio.to_thread(
+                        _skip_documents, documents, skip_documents
+                    )
+                parsed.parse_seconds += time.perf_counter() - started
 
-            for task in tasks:
-                results.append(task.result())
-        except* Exception as eg:
-            error_msg = f"reindexing finished with {len(eg.exceptions)} errors"
-            logger.error(error_msg, exc_info=True)
-            exceptions = eg
+            while True:
+                started = time.perf_counter()
+                with measure_stage("load"):
+                    batch = await asyncio.to_thread(
+                        _next_document_batch, documents, self.stream_batch_chars
+                    )
+                parsed.parse_seconds += time.perf_counter() - started
+                parsed.cpu_seconds += time.perf_counter() - started
+                if not batch:
+                    break
+                parsed.pages += len(batch)
+                chunked_docs = await self._chunk_batch(
+                    chunker=chunker, documents=batch, parsed=parsed
+                )
+                # empty batches are still reported so the checkpoint moves past them
+                yield len(batch), chunked_docs
+        finally:
+            close = getattr(documents, "close", None)
+            if close is not None:
+                close()
 
-        if exceptions:
-            raise
+    async def _chunk_batch(
+        self,
+        chunker: Union[ParentDocumentRetriever, RecursiveTokenChunker],
+        documents: List[Document],
+        parsed: ParsedFile,
+    ) -> List[dict]:
+        started = time.perf_counter()
+        with tally_stages() as tally:
+            chunked_docs = await chunker.atransform_documents(documents=documents)
+        # semantic chunkers wait on embedding requests, that is network time
+        parsed.cpu_seconds += (
+            time.perf_counter() - started - tally.get(CHUNK_EMBEDDINGS_STAGE, 0.0)
+        )
+        return chunked_docs
 
-        logger.info("successfully reindexed the data")
-        return results
+    async def _parallel_pdf_pages(self, downloaded: DownloadedFile) -> Optional[int]:
+        if Path(downloaded.object_key).suffix.lower() != ".pdf":
+            return None
+
+        total_pages = await asyncio.to_thread(
+            count_pages,
+            downloaded.path if downloaded.path is not None else downloaded.buffer,
+        )
+        if not self.pdf_extractor.should_parallelize(total_pages):
+            return None
+        return total_pages
+
+    async def _chunk_pdf_pages(
+        self,
+        pdf: PdfSource,
+        source: str,
+        total_pages: int,
+        chunker: Union[ParentDocumentRetriever, RecursiveTokenChunker],
+        parsed: ParsedFile,
+        skip_pages: int = 0,
+    ) -> AsyncIterator[Tuple[int, List[dict]]]:
+        stream = self.pdf_extractor.astream_pages(
+            pdf=pdf, source=source, total_pages=total_pages, start_page=skip_pages
+        )
+        chunking_tasks: Deque[Tuple[int, asyncio.Task]] = deque()
+        parsed.pages += skip_pages
 
-    def _download_temp_file(self, object_key: str) -> str:
         try:
-            unique_identifier = uuid.uuid4()
-            original_extension = Path(object_key).suffix
+            while True:
+                started = time.perf_counter()
+                with measure_stage("load"):
+                    pages = await anext(stream, None)
+                parsed.parse_seconds += time.perf_counter() - started
+                parsed.cpu_seconds += time.perf_counter() - started
+                if pages is None:
+                    break
+                parsed.pages += len(pages)
+                chunking_tasks.append(
+                    (
+                        len(pages),
+                        asyncio.create_task(
+                            self._chunk_batch(
+                                chunker=chunker, documents=pages, parsed=parsed
+                            )
+                        ),
+                    )
+                )
+                # a few shards are chunked concurrently, the rest wait in the pool
+                if len(chunking_tasks) >= self.stream_prefetch_batches:
+                    page_count, task = chunking_tasks.popleft()
+                    yield page_count, await task
+
+            while chunking_tasks:
+                page_count, task = chunking_tasks.popleft()
+                yield page_count, await task
+        finally:
+            for _, task in chunking_tasks:
+                task.cancel()
+            await stream.aclose()
+
+        logger.info(
+            f"extracted {total_pages} pdf pages in parallel in "
+            f"{parsed.parse_seconds:.2f}s"
+        )
+
+    async def _drop_near_duplicates(
+        self,
+        db: AsyncSession,
+        file: FileForIngestion,
+        kb_id: int,
+        added: List[Tuple[Tuple[Optional[str], int], dict]],
+    ) -> int:
+        fingerprints_per_doc = await asyncio.to_thread(
+            _child_fingerprints, [chunked_doc for _, chunked_doc in added]
+        )
+        bands = {
+            band
+            for fingerprints in fingerprints_per_doc
+            for fingerprint in fingerprints
+            if fingerprint is not None
+            for band in fingerprint_bands(fingerprint)
+        }
+
+        stored = await find_fingerprints_sharing_bands(
+            db=db, kb_id=kb_id, bands=sorted(bands)
+        )
+
+        index = NearDuplicateIndex()
+        for chunk_id, fingerprint in stored:
+            index.add(to_unsigned(fingerprint), chunk_id)
 
-            valid = is_valid_file_extension(extension=original_extension)
-            if not valid:
-                raise InvalidFileExtension(
-                    "invalid file extension, file cannot be processed"
+        # a skipped chunk is kept as an alias of the copy it repeats, in whichever
+        # document of the knowledge base that is, so it can be indexed again if
+        # that copy is removed
+        dropped = 0
+        for ((parent_hash, occurrence), chunked_doc), fingerprints in zip(
+            added, fingerprints_per_doc
+        ):
+            chunk_ids = [
+                generate_chunk_id(
+                    kb_doc_id=file.kb_doc_id,
+                    parent_hash=parent_hash,
+                    occurrence=occurrence,
+                    chunk_index=i,
                 )
+                for i in range(len(fingerprints))
+            ]
+            kept = []
+            duplicates = []
+            for i, fingerprint in enumerate(fingerprints):
+                if fingerprint is not None:
+                    original = index.find(fingerprint)
+                    if original is not None:
+                        duplicates.append(
+                            {
+                                "chunk_id": chunk_ids[i],
+                                "fingerprint": fingerprint,
+                                "duplicate_of": original,
+                                "content": chunked_doc["child_doc"][i].page_content,
+                            }
+                        )
+                        continue
+                    index.add(fingerprint, chunk_ids[i])
+                kept.append(i)
 
-            temp_file = get_system_temp_file_path(
-                f"{unique_identifier}{original_extension}"
-            )
+            dropped += len(duplicates)
+            chunked_doc["child_doc"] = [chunked_doc["child_doc"][i] for i in kept]
+            chunked_doc["child_doc_ids"] = [chunk_ids[i] for i in kept]
+            chunked_doc["child_doc_fingerprints"] = [fingerprints[i] for i in kept]
+            chunked_doc["child_doc_duplicates"] = duplicates
+            if chunked_doc.get("child_doc_embeddings") is not None:
+                chunked_doc["child_doc_embeddings"] = chunked_doc[
+                    "child_doc_embeddings"
+                ][kept]
+
+        return dropped
+
+    async def _restore_orphaned_duplicates(
+        self,
+        removed_ids: List[int],
+        user_id: int,
+        category: int,
+        collection_name: str,
+        db: AsyncSession,
+        dimension: int,
+        search_method: SearchMethodEnum,
+    ) -> int:
+        orphans = await get_orphaned_duplicates(db=db, removed_parent_ids=removed_ids)
+        if not orphans:
+            return 0
+
+        # the first alias of every removed chunk takes its place in milvus, any
+        # other alias of it is pointed at the restored one
+        restored: Dict[str, Tuple[ChunkFingerprint, FileForIngestion]] = {}
+        repointed: Dict[str, List[int]] = {}
+        for orphan, file in orphans:
+            if orphan.duplicate_of in restored:
+                repointed.setdefault(
+                    restored[orphan.duplicate_of][0].chunk_id, []
+                ).append(orphan.id)
+            else:
+                restored[orphan.duplicate_of] = (orphan, file)
+
+        chunks = [chunk for chunk, _ in restored.values()]
+        embeddings = await self._get_concurrent_embeddings(
+            documents=[Document(page_content=chunk.content) for chunk in chunks],
+            embedding_model=self._child_embeddings(dimension),
+            dimension=dimension,
+        )
 
-            self.aws_client.download_file(
-                object_key=object_key, temp_file_path=temp_file
+        # aliases can sit in any document of the knowledge base, each is indexed
+        # under its own document
+        positions: Dict[int, List[int]] = {}
+        files: Dict[int, FileForIngestion] = {}
+        for position, (_, file) in enumerate(restored.values()):
+            positions.setdefault(file.kb_doc_id, []).append(position)
+            files[file.kb_doc_id] = file
+
+        with measure_stage("milvus_upsert"):
+            for kb_doc_id, indices in positions.items():
+                file = files[kb_doc_id]
+                await self.milvus_writer.upsert(
+                    collection_name=collection_name,
+                    data=CollectionSchemaBatch(
+                        ids=[chunks[i].chunk_id for i in indices],
+                        text_dense_vectors=embeddings[indices],
+                        text_contents=[chunks[i].content for i in indices],
+                        parent_ids=[chunks[i].parent_id for i in indices],
+                        category=category,
+                        object_key=file.object_key,
+                        file_name=file.file_name,
+                        user_id=user_id,
+                        file_id=kb_doc_id,
+                        search_method=search_method,
+                    ),
+                )
+
+        with measure_stage("postgres_write"):
+            await promote_chunk_fingerprints(
+                db=db, fingerprint_ids=[chunk.id for chunk in chunks]
             )
+            for chunk_id, fingerprint_ids in repointed.items():
+                await repoint_chunk_fingerprints(
+                    db=db, fingerprint_ids=fingerprint_ids, duplicate_of=chunk_id
+                )
 
-            return temp_file
-        except Exception as e:
-            logger.error(f"error downloading file: {e}", exc_info=True)
-            raise
+        return len(chunks)
 
-    async def _process_file(self, file: FileForIngestion) -> List[dict]:
-        try:
-            temp_file = self._download_temp_file(object_key=file.object_key)
-            loader = DocumentLoaderFactory.create_loader(file_path=temp_file)
-            if not loader:
-                raise DocumentNotLoaded("cannot load the document from temporary file")
-            document = loader.load()
-            chunked_docs = self.semantic_chunker.transform_documents(documents=document)
-
-            if not chunked_docs or len(chunked_docs) == 0:
-                raise DocumentNotChunked("none data chunked from the documents")
+    async def _embed_child_docs(self, chunked_docs: List[dict], dimension: int):
+        reusable = self.chunk_embedding_provider.model == self.embedding_provider.model
+        for chunked_doc in chunked_docs:
+            embeddings = chunked_doc.get("child_doc_embeddings")
+            if embeddings is None:
+                continue
+            if reusable and embeddings.shape[1] >= dimension:
+                # text-embedding-3 vectors stay valid when cut to a prefix and
+                # renormalised, which is what the api does for shorter outputs
+                chunked_doc["child_doc_embeddings"] = _shorten(embeddings, dimension)
+            else:
+                del chunked_doc["child_doc_embeddings"]
 
-            for chunked_doc in chunked_docs:
-                child_doc = chunked_doc["child_doc"]
-                child_doc_embeddings = await self._get_concurrent_embeddings(
-                    documents=child_doc,
-                    embedding_model=self.embeddings,
+        for chunked_doc in chunked_docs:
+            # every child of a parent can be dropped as a near duplicate
+            if not chunked_doc["child_doc"]:
+                chunked_doc["child_doc_embeddings"] = np.empty(
+                    (0, dimension), dtype=np.float32
                 )
-                chunked_doc["child_doc_embeddings"] = child_doc_embeddings
 
-            return chunked_docs
+        pending = [
+            chunked_doc
+            for chunked_doc in chunked_docs
+            if "child_doc_embeddings" not in chunked_doc
+        ]
+        if not pending:
+            return
 
-        except Exception as e:
-            logger.error(f"error processing file: {e}", exc_info=e)
-            raise
+        # one contiguous float32 array for the whole file, handed out as views
+        embeddings = await self._get_concurrent_embeddings(
+            documents=[
+                doc for chunked_doc in pending for doc in chunked_doc["child_doc"]
+            ],
+            embedding_model=self._child_embeddings(dimension),
+            dimension=dimension,
+        )
+        offset = 0
+        for chunked_doc in pending:
+            count = len(chunked_doc["child_doc"])
+            chunked_doc["child_doc_embeddings"] = embeddings[offset : offset + count]
+            offset += count
 
     async def _get_concurrent_embeddings(
         self,
         documents: Sequence[Document],
-        embedding_model: OpenAIEmbeddings,
-        batch_size: int = 2048,
-    ) -> List[List[float]]:
+        embedding_model: Embeddings,
+        dimension: int,
+    ) -> np.ndarray:
         try:
             document_texts = [doc.page_content for doc in documents]
 
-            text_batches = [
-                document_texts[i : i + batch_size]
-                for i in range(0, len(document_texts), batch_size)
-            ]
-
-            tasks = [embedding_model.aembed_documents(batch) for batch in text_batches]
-            batch_embeddings = await asyncio.gather(*tasks)
-
-            all_embeddings = [
-                embedding for batch in batch_embeddings for embedding in batch
-            ]
+            all_embeddings = await self.embedding_cache.aembed_documents(
+                texts=document_texts,
+                dimension=dimension,
+                embed_missing=embedding_model.aembed_documents,
+                model=self.embedding_provider.model,
+            )
 
             return all_embeddings
         except Exception as e:
             logger.error(f"error calculating embeddings: {e}", exc_info=True)
             raise
 
+    async def _index_parent_batch(
+        self,
+        file: FileForIngestion,
+        added: List[Tuple[Tuple[Optional[str], int], dict]],
+        user_id: int,
+        category: int,
+        collection_name: str,
+        db: AsyncSession,
+        ingestion_job_id: int,
+        dimension: int,
+        search_method: SearchMethodEnum,
+        kb_id: Optional[int],
+        deduplicate_chunks: bool,
+    ) -> int:
+        deduplicated = 0
+        if deduplicate_chunks and kb_id is not None:
+            with measure_stage("deduplicate"):
+                deduplicated = await self._drop_near_duplicates(
+                    db=db,
+                    file=file,
+                    kb_id=kb_id,
+                    added=added,
+                )
+
+        await self._embed_child_docs(
+            [chunked_doc for _, chunked_doc in added], dimension=dimension
+        )
+
+        with measure_stage("postgres_write"):
+            parent_ids = await bulk_create_parent_chunks(
+                db=db,
+                document_id=file.doc_id,
+                kb_doc_id=file.kb_doc_id,
+                chunks=[
+                    chunked_doc["parent_doc"].page_content for _, chunked_doc in added
+                ],
+                content_hashes=[parent_hash for (parent_hash, _), _ in added],
+                ingestion_job_id=ingestion_job_id,
+            )
+
+        if len(parent_ids) != len(added):
+            raise Exception(
+                f"expected {len(added)} parent doc ids, got {len(parent_ids)}"
+            )
+
+        ids: List[str] = []
+        text_contents: List[str] = []
+        row_parent_ids: List[int] = []
+        fingerprints: List[dict] = []
+
+        for parent_id, ((parent_hash, occurrence), chunked_doc) in zip(
+            parent_ids, added
+        ):
+            child_fingerprints = chunked_doc.get("child_doc_fingerprints")
+            child_ids = chunked_doc.get("child_doc_ids")
+            for index, doc in enumerate(chunked_doc["child_doc"]):
+                # after deduplication the ids keep the position of the child in
+                # its parent, so an alias never shares an id with a kept chunk
+                chunk_id = (
+                    child_ids[index]
+                    if child_ids is not None
+                    else generate_chunk_id(
+                        kb_doc_id=file.kb_doc_id,
+                        parent_hash=parent_hash,
+                        occurrence=occurrence,
+                        chunk_index=index,
+                    )
+                )
+                ids.append(chunk_id)
+                text_contents.append(doc.page_content)
+                row_parent_ids.append(parent_id)
+                if child_fingerprints and child_fingerprints[index] is not None:
+                    fingerprints.append(
+                        {
+                            "kb_id": kb_id,
+                            "parent_id": parent_id,
+                            "chunk_id": chunk_id,
+                            "simhash": to_signed(child_fingerprints[index]),
+                            "bands": fingerprint_bands(child_fingerprints[index]),
+                            "duplicate_of": None,
+                            "content": None,
+                        }
+                    )
+            for duplicate in chunked_doc.get("child_doc_duplicates", ()):
+                fingerprints.append(
+                    {
+                        "kb_id": kb_id,
+                        "parent_id": parent_id,
+                        "chunk_id": duplicate["chunk_id"],
+                        "simhash": to_signed(duplicate["fingerprint"]),
+                        "bands": fingerprint_bands(duplicate["fingerprint"]),
+                        "duplicate_of": duplicate["duplicate_of"],
+                        "content": duplicate["content"],
+                    }
+                )
+
+        data_for_milvus = CollectionSchemaBatch(
+            ids=ids,
+            text_dense_vectors=np.concatenate(
+                [chunked_doc["child_doc_embeddings"] for _, chunked_doc in added]
+            ),
+            text_contents=text_contents,
+            parent_ids=row_parent_ids,
+            category=category,
+            object_key=file.object_key,
+            file_name=file.file_name,
+            user_id=user_id,
+            file_id=file.kb_doc_id,
+            search_method=search_method,
+        )
+
+        with measure_stage("milvus_upsert"):
+            await self.milvus_writer.upsert(
+                collection_name=collection_name, data=data_for_milvus
+            )
+
+        # written with the batch so later batches of the file are checked against it
+        with measure_stage("postgres_write"):
+            await bulk_create_chunk_fingerprints(db=db, fingerprints=fingerprints)
+
+        return deduplicated
+
     async def _upsert_into_milvus(
         self,
         file: FileForIngestion,
@@ -251,71 +967,199 @@ class IngestData:
         category: int,
         collection_name: str,
         db: AsyncSession,
+        ingestion_job_id: int,
+        parsing_tier: ParsingTierEnum = ParsingTierEnum.AUTO,
+        dimension: int = MODEL_DIMENSION,
+        search_method: SearchMethodEnum = SearchMethodEnum.HNSW,
+        chunking_strategy: ChunkingStrategyEnum = ChunkingStrategyEnum.SEMANTIC,
+        kb_id: Optional[int] = None,
+        deduplicate_chunks: bool = False,
+        prefetcher: Optional[DownloadPrefetcher] = None,
     ):
+        # claimed before anything can fail, the finally below always gives it back
+        prefetch_position = (
+            prefetcher.claim(file.object_key) if prefetcher is not None else None
+        )
         try:
-            chunked_docs = await self._process_file(file=file)
+            with measure_stage("postgres_write"):
+                stored = await get_parent_chunk_hashes(db=db, kb_doc_id=file.kb_doc_id)
+                checkpoint = await get_ingestion_checkpoint(
+                    db=db, ingestion_job_id=ingestion_job_id, kb_doc_id=file.kb_doc_id
+                )
+
+            stored_ids = dict(
+                zip(
+                    _occurrence_keys([stored_hash for _, stored_hash in stored]),
+                    [parent_id for parent_id, _ in stored],
+                )
+            )
 
-            data_for_milvus: List[CollectionSchemaEntity] = []
-            parent_doc_objects: List[ParentChunkedDoc] = []
+            # parents flow through chunking, embedding, postgres and milvus a batch
+            # at a time, and every batch is committed together with a checkpoint; a
+            # redelivered message picks the file up after the last committed batch
+            parsed = ParsedFile()
+            if checkpoint is not None:
+                with measure_stage("postgres_write"):
+                    seen = await get_confirmed_hash_counts(
+                        db=db,
+                        kb_doc_id=file.kb_doc_id,
+                        ingestion_job_id=ingestion_job_id,
+                    )
+                documents_done = checkpoint.documents_done
+                parent_chunks = checkpoint.parent_chunks_done
+                child_chunks = checkpoint.child_chunks_done
+                deduplicated = checkpoint.deduplicated_chunks
+                logger.info(
+                    f"resuming kb doc {file.kb_doc_id} after {documents_done} "
+                    f"documents and {parent_chunks} parent chunks"
+                )
+            else:
+                seen = {}
+                documents_done = parent_chunks = child_chunks = deduplicated = 0
+            added_chunks = 0
 
-            for chunked_doc in chunked_docs:
-                parent_doc_obj = await create_parent_chunk(
-                    db=db,
-                    document_id=file.doc_id,
-                    chunk=chunked_doc["parent_doc"].page_content,
+            async with aclosing(
+                self._stream_chunked_docs(
+                    file=file,
+                    parsing_tier=parsing_tier,
+                    chunking_strategy=chunking_strategy,
+                    parsed=parsed,
+                    prefetcher=prefetcher,
+                    prefetch_position=prefetch_position,
+                    skip_documents=documents_done,
                 )
-                db.add(parent_doc_obj)
-                parent_doc_objects.append(parent_doc_obj)
-
-            await db.flush(parent_doc_objects)
-
-            for i, chunked_doc in enumerate(chunked_docs):
-                parent_id = parent_doc_objects[i].id
-                if parent_id is None:
-                    raise Exception(f"Parent doc ID not generated for chunk {i}")
-                for index, (doc, embedding) in enumerate(
-                    zip(chunked_doc["child_doc"], chunked_doc["child_doc_embeddings"])
-                ):
-                    id = generate_chunk_id(
-                        file_name=file.file_name, parent_id=parent_id, chunk_index=index
+            ) as batches:
+                async for document_count, chunked_docs in batches:
+                    parent_keys = _occurrence_keys(
+                        [
+                            content_hash(chunked_doc["parent_doc"].page_content)
+                            for chunked_doc in chunked_docs
+                        ],
+                        seen=seen,
                     )
-                    entity = CollectionSchemaEntity(
-                        id=id,
-                        text_dense_vector=embedding,
-                        text_content=doc.page_content,
-                        object_key=file.object_key,
-                        category=category,
-                        file_name=file.file_name,
-                        user_id=user_id,
-                        file_id=file.kb_doc_id,
-                        parent_id=parent_id,
+                    documents_done += document_count
+                    parent_chunks += len(chunked_docs)
+                    child_chunks += sum(
+                        len(chunked_doc["child_doc"]) for chunked_doc in chunked_docs
                     )
-                    data_for_milvus.append(entity)
 
-            if data_for_milvus:
-                self.milvus_ops.upsert_into_collection(
-                    collection_name=collection_name, data=data_for_milvus
+                    added = [
+                        (key, chunked_doc)
+                        for key, chunked_doc in zip(parent_keys, chunked_docs)
+                        if key not in stored_ids
+                    ]
+                    # unchanged parents are stamped with the job first, so whatever is
+                    # left unstamped at the end is what the new version dropped and
+                    # the batch can be deduplicated against the confirmed chunks
+                    with measure_stage("postgres_write"):
+                        await confirm_parent_chunks(
+                            db=db,
+                            parent_ids=[
+                                stored_ids[key]
+                                for key in parent_keys
+                                if key in stored_ids
+                            ],
+                            ingestion_job_id=ingestion_job_id,
+                        )
+
+                    if added:
+                        added_chunks += len(added)
+                        deduplicated += await self._index_parent_batch(
+                            file=file,
+                            added=added,
+                            user_id=user_id,
+                            category=category,
+                            collection_name=collection_name,
+                            db=db,
+                            ingestion_job_id=ingestion_job_id,
+                            dimension=dimension,
+                            search_method=search_method,
+                            kb_id=kb_id,
+                            deduplicate_chunks=deduplicate_chunks,
+                        )
+
+                    with measure_stage("postgres_write"):
+                        await save_ingestion_checkpoint(
+                            db=db,
+                            ingestion_job_id=ingestion_job_id,
+                            kb_doc_id=file.kb_doc_id,
+                            documents_done=documents_done,
+                            parent_chunks_done=parent_chunks,
+                            child_chunks_done=child_chunks,
+                            deduplicated_chunks=deduplicated,
+                        )
+                        await db.commit()
+
+            if not parent_chunks:
+                raise DocumentNotChunked("none data chunked from the documents")
+
+            with measure_stage("postgres_write"):
+                removed_ids = await get_unconfirmed_parent_ids(
+                    db=db, kb_doc_id=file.kb_doc_id, ingestion_job_id=ingestion_job_id
                 )
 
-            await db.commit()
-        except Exception as e:
-            logger.error(f"error inserting into milvus: {e}", exc_info=True)
-            await db.rollback()
-            raise
+            file_metrics = current_file_metrics.get()
+            if file_metrics is not None:
+                file_metrics.pages = parsed.pages
+                file_metrics.parent_chunks = parent_chunks
+                file_metrics.child_chunks = child_chunks
+                file_metrics.deduplicated_chunks = deduplicated
 
-    async def _process_reindexing(
-        self, db: AsyncSession, file: FileForIngestion, collection_name: str
-    ):
-        try:
-            expr = f"file_id == {file.kb_doc_id}"
-            self.milvus_ops.delete_entities_record(
-                collection_name=collection_name, filter=expr
+            logger.info(
+                f"parsed kb doc {file.kb_doc_id} with {parsed.resolved_tier.value} "
+                f"tier in {parsed.parse_seconds:.2f}s"
             )
-            await delete_parent_chunk(db=db, document_id=file.doc_id)
-            await db.commit()
-        except Exception as e:
-            logger.error(
-                f"error deleting entities record in milvus: {e}", exc_info=True
+            logger.info(
+                f"kb doc {file.kb_doc_id}: {added_chunks} parent chunks added in this "
+                f"run, {len(removed_ids)} removed, {deduplicated} near duplicate "
+                f"child chunks skipped"
             )
+
+            if removed_ids:
+                restored = await self._restore_orphaned_duplicates(
+                    removed_ids=removed_ids,
+                    user_id=user_id,
+                    category=category,
+                    collection_name=collection_name,
+                    db=db,
+                    dimension=dimension,
+                    search_method=search_method,
+                )
+                if restored:
+                    logger.info(
+                        f"kb doc {file.kb_doc_id}: restored {restored} chunks whose "
+                        f"near duplicate was removed"
+                    )
+                with measure_stage("milvus_upsert"):
+                    await asyncio.to_thread(
+                        self.milvus_ops.delete_entities_record,
+                        collection_name=collection_name,
+                        filter=f"file_id == {file.kb_doc_id} and parent_id in {removed_ids}",
+                    )
+
+            with measure_stage("postgres_write"):
+                await delete_parent_chunks_by_ids(db=db, parent_ids=removed_ids)
+                await record_document_parsing(
+                    db=db,
+                    kb_doc_id=file.kb_doc_id,
+                    parsing_tier=parsed.resolved_tier,
+                    parse_seconds=parsed.parse_seconds,
+                )
+                await save_ingestion_checkpoint(
+                    db=db,
+                    ingestion_job_id=ingestion_job_id,
+                    kb_doc_id=file.kb_doc_id,
+                    documents_done=documents_done,
+                    parent_chunks_done=parent_chunks,
+                    child_chunks_done=child_chunks,
+                    deduplicated_chunks=deduplicated,
+                    completed=True,
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"error inserting into milvus: {e}", exc_info=True)
             await db.rollback()
             raise
+        finally:
+            if prefetch_position is not None:
+                prefetcher.discard(prefetch_position)
@@ -1,8 +1,11 @@
-from typing import Optional
+import io
+import zipfile
+from typing import IO, Iterator, List, Optional, Union
 
+from pypdf import PdfReader
 from langchain_community.document_loaders import (
     PyPDFLoader,
-    TextLoader,
+    UnstructuredFileIOLoader,
     UnstructuredWordDocumentLoader,
     UnstructuredPowerPointLoader,
     UnstructuredHTMLLoader,
@@ -12,17 +15,96 @@ from langchain_community.document_loaders import (
     CSVLoader,
 )
 from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
 from pathlib import Path
+from app.constants.globals import AUTO_HI_RES_MEDIA_RATIO, TEXT_STREAM_BLOCK_CHARS
+from app.dao.schema import ParsingTierEnum
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class PdfStreamLoader(BaseLoader):
+    def __init__(self, stream: IO[bytes], source: str):
+        self.stream = stream
+        self.source = source
+
+    def lazy_load(self) -> Iterator[Document]:
+        reader = PdfReader(self.stream)
+        total_pages = len(reader.pages)
+        for page_number, page in enumerate(reader.pages):
+            yield Document(
+                page_content=page.extract_text(),
+                metadata={
+                    "source": self.source,
+                    "page": page_number,
+                    "total_pages": total_pages,
+                },
+            )
+
+
+class TextStreamLoader(BaseLoader):
+    def __init__(
+        self,
+        stream: IO[bytes],
+        source: str,
+        encoding: str = "utf-8",
+        block_chars: int = TEXT_STREAM_BLOCK_CHARS,
+    ):
+        self.stream = stream
+        self.source = source
+        self.encoding = encoding
+        self.block_chars = block_chars
+
+    def _document(self, lines: List[str]) -> Document:
+        return Document(page_content="".join(lines), metadata={"source": self.source})
+
+    def lazy_load(self) -> Iterator[Document]:
+        # large files are read a block at a time, cut on a paragraph break where
+        # there is one and on a line break when a paragraph runs far too long
+        reader = io.TextIOWrapper(self.stream, encoding=self.encoding)
+        try:
+            block: List[str] = []
+            size = 0
+            for line in reader:
+                block.append(line)
+                size += len(line)
+                if (size >= self.block_chars and not line.strip()) or (
+                    size >= 4 * self.block_chars
+                ):
+                    yield self._document(block)
+                    block = []
+                    size = 0
+            if block:
+                yield self._document(block)
+        finally:
+            reader.detach()
+
+
+class TextFileLoader(BaseLoader):
+    def __init__(self, file_path: str, encoding: str = "utf-8"):
+        self.file_path = file_path
+        self.encoding = encoding
+
+    def lazy_load(self) -> Iterator[Document]:
+        with open(self.file_path, "rb") as stream:
+            yield from TextStreamLoader(
+                stream=stream, source=self.file_path, encoding=self.encoding
+            ).lazy_load()
+
+
+class UnstructuredStreamLoader(UnstructuredFileIOLoader):
+    def __init__(self, stream: IO[bytes], source: str, **unstructured_kwargs):
+        super().__init__(stream, metadata_filename=source, **unstructured_kwargs)
+
+
 LOADER_MAPPING = {
-    ".pdf": {"loader": PyPDFLoader, "config": {}},
+    ".pdf": {"loader": PyPDFLoader, "config": {}, "stream_loader": PdfStreamLoader},
     ".docx": {
         "loader": UnstructuredWordDocumentLoader,
         "config": {"mode": "elements", "strategy": "hi_res"},
+        "stream_loader": UnstructuredStreamLoader,
     },
     ".doc": {
         "loader": UnstructuredWordDocumentLoader,
@@ -31,29 +113,111 @@ LOADER_MAPPING = {
     ".pptx": {
         "loader": UnstructuredPowerPointLoader,
         "config": {"mode": "elements", "strategy": "hi_res"},
+        "stream_loader": UnstructuredStreamLoader,
     },
     ".ppt": {
         "loader": UnstructuredPowerPointLoader,
         "config": {"mode": "elements", "strategy": "hi_res"},
     },
-    ".xlsx": {"loader": UnstructuredExcelLoader, "config": {"mode": "elements"}},
+    ".xlsx": {
+        "loader": UnstructuredExcelLoader,
+        "config": {"mode": "elements"},
+        "stream_loader": UnstructuredStreamLoader,
+    },
     ".xls": {"loader": UnstructuredExcelLoader, "config": {"mode": "elements"}},
-    ".html": {"loader": UnstructuredHTMLLoader, "config": {}},
-    ".htm": {"loader": UnstructuredHTMLLoader, "config": {}},
+    ".html": {
+        "loader": UnstructuredHTMLLoader,
+        "config": {},
+        "stream_loader": UnstructuredStreamLoader,
+    },
+    ".htm": {
+        "loader": UnstructuredHTMLLoader,
+        "config": {},
+        "stream_loader": UnstructuredStreamLoader,
+    },
     ".csv": {"loader": CSVLoader, "config": {"autodetect_encoding": True}},
     ".json": {
         "loader": JSONLoader,
         "config": {"jq_schema": "..", "text_content": False},
     },
-    ".txt": {"loader": TextLoader, "config": {"encoding": "utf-8"}},
-    ".md": {"loader": UnstructuredMarkdownLoader, "config": {"mode": "elements"}},
+    ".txt": {
+        "loader": TextFileLoader,
+        "config": {"encoding": "utf-8"},
+        "stream_loader": TextStreamLoader,
+    },
+    ".md": {
+        "loader": UnstructuredMarkdownLoader,
+        "config": {"mode": "elements"},
+        "stream_loader": UnstructuredStreamLoader,
+    },
 }
 
 
+# embedded media lives under these prefixes in office open xml archives
+OFFICE_MEDIA_PREFIXES = {".docx": "word/media/", ".pptx": "ppt/media/"}
+
+
+def _is_tiered(mapping: dict) -> bool:
+    return "strategy" in mapping["config"]
+
+
+def _loader_config(mapping: dict, parsing_tier: ParsingTierEnum) -> dict:
+    config = dict(mapping["config"])
+    if _is_tiered(mapping):
+        config["strategy"] = (
+            "fast" if parsing_tier == ParsingTierEnum.FAST else "hi_res"
+        )
+    return config
+
+
+def _media_ratio(source: Union[str, IO[bytes]], prefix: str) -> Optional[float]:
+    try:
+        with zipfile.ZipFile(source) as archive:
+            entries = archive.infolist()
+    except (zipfile.BadZipFile, OSError):
+        return None
+    finally:
+        if not isinstance(source, str):
+            source.seek(0)
+
+    total = sum(entry.file_size for entry in entries)
+    if not total:
+        return None
+    media = sum(
+        entry.file_size for entry in entries if entry.filename.startswith(prefix)
+    )
+    return media / total
+
+
+def resolve_parsing_tier(
+    parsing_tier: ParsingTierEnum, file_name: str, source: Union[str, IO[bytes]]
+) -> ParsingTierEnum:
+    ext = Path(file_name).suffix.lower()
+    mapping = LOADER_MAPPING.get(ext)
+
+    # formats without a layout model always go through their lightweight extractor
+    if not mapping or not _is_tiered(mapping):
+        return ParsingTierEnum.FAST
+
+    if parsing_tier != ParsingTierEnum.AUTO:
+        return parsing_tier
+
+    prefix = OFFICE_MEDIA_PREFIXES.get(ext)
+    if prefix is None:
+        return ParsingTierEnum.HI_RES
+
+    ratio = _media_ratio(source, prefix)
+    if ratio is None or ratio >= AUTO_HI_RES_MEDIA_RATIO:
+        return ParsingTierEnum.HI_RES
+    return ParsingTierEnum.FAST
+
+
 # To maintain utility of it and stateless design of the factory we use static methods
 class DocumentLoaderFactory:
     @staticmethod
-    def create_loader(file_path: str) -> Optional[BaseLoader]:
+    def create_loader(
+        file_path: str, parsing_tier: ParsingTierEnum = ParsingTierEnum.HI_RES
+    ) -> Optional[BaseLoader]:
         ext = Path(file_path).suffix.lower()
         mapping = LOADER_MAPPING.get(ext)
 
@@ -64,7 +228,7 @@ class DocumentLoaderFactory:
             return None
 
         loader_class = mapping["loader"]
-        loader_config = mapping["config"]
+        loader_config = _loader_config(mapping, parsing_tier)
 
         try:
             return loader_class(file_path, **loader_config)
@@ -75,3 +239,34 @@ class DocumentLoaderFactory:
                 exc_info=True,
             )
             return None
+
+    @staticmethod
+    def supports_stream(extension: str) -> bool:
+        mapping = LOADER_MAPPING.get(extension.lower())
+        return bool(mapping and mapping.get("stream_loader"))
+
+    @staticmethod
+    def create_stream_loader(
+        stream: IO[bytes],
+        file_name: str,
+        parsing_tier: ParsingTierEnum = ParsingTierEnum.HI_RES,
+    ) -> Optional[BaseLoader]:
+        ext = Path(file_name).suffix.lower()
+        mapping = LOADER_MAPPING.get(ext)
+
+        if not mapping or not mapping.get("stream_loader"):
+            logger.warning(f"no in-memory loader found for file extension: {ext}")
+            return None
+
+        loader_class = mapping["stream_loader"]
+        loader_config = _loader_config(mapping, parsing_tier)
+
+        try:
+            return loader_class(stream, file_name, **loader_config)
+        except Exception as e:
+            logger.error(
+                f"error instantiating in-memory loader for {file_name} with config {loader_config}",
+                extra={"error": e},
+                exc_info=True,
+            )
+            return None
@@ -0,0 +1,91 @@
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from app.constants.globals import (
+    NEAR_DUPLICATE_BANDS,
+    NEAR_DUPLICATE_MAX_DISTANCE,
+    NEAR_DUPLICATE_MIN_WORDS,
+    NEAR_DUPLICATE_SHINGLE_SIZE,
+)
+
+WORD_PATTERN = re.compile(r"\w+")
+FINGERPRINT_BITS = 64
+FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+BIT_POSITIONS = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+def simhash(text: str, shingle_size: int = NEAR_DUPLICATE_SHINGLE_SIZE) -> int:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [
+            " ".join(words[i : i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        ]
+
+    hashes = np.fromiter(
+        (_shingle_hash(shingle) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    bits = (hashes[:, None] >> BIT_POSITIONS) & np.uint64(1)
+    votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(shingles)
+
+    fingerprint = 0
+    for position in np.flatnonzero(votes > 0).tolist():
+        fingerprint |= 1 << position
+    return fingerprint
+
+
+def fingerprint_bands(
+    fingerprint: int, bands: int = NEAR_DUPLICATE_BANDS
+) -> List[int]:
+    # with b bands, fingerprints within b - 1 bits of each other share at least
+    # one band exactly, the band index is kept in the high bits so bands in
+    # different positions never collide
+    width = FINGERPRINT_BITS // bands
+    mask = (1 << width) - 1
+    return [
+        (band << width) | ((fingerprint >> (band * width)) & mask)
+        for band in range(bands)
+    ]
+
+
+def to_signed(fingerprint: int) -> int:
+    # postgres has no unsigned bigint
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >> 63 else fingerprint
+
+
+def to_unsigned(fingerprint: int) -> int:
+    return fingerprint & FINGERPRINT_MASK
+
+
+def is_fingerprintable(text: str, min_words: int = NEAR_DUPLICATE_MIN_WORDS) -> bool:
+    # a handful of words gives an unstable fingerprint, those chunks are always kept
+    return len(WORD_PATTERN.findall(text)) >= min_words
+
+
+class NearDuplicateIndex:
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._by_band: Dict[int, List[Tuple[int, str]]] = {}
+
+    def add(self, fingerprint: int, chunk_id: str):
+        for band in fingerprint_bands(fingerprint):
+            self._by_band.setdefault(band, []).append((fingerprint, chunk_id))
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        for band in fingerprint_bands(fingerprint):
+            for candidate, chunk_id in self._by_band.get(band, ()):
+                if (candidate ^ fingerprint).bit_count() <= self.max_distance:
+                    return chunk_id
+        return None
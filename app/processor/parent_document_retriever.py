@@ -1,14 +1,13 @@
+import asyncio
 import enum
 import logging
 import copy
 import numpy as np
-from langchain_experimental.text_splitter import (
-    combine_sentences,
-    calculate_cosine_distances,
-)
+from langchain_experimental.text_splitter import combine_sentences
 from langchain_core.embeddings import Embeddings
 from langchain_core.documents import Document
 from app.processor.splitters import SentenceSplitter
+from app.constants.globals import REUSE_SENTENCE_EMBEDDINGS, MAX_CHUNKING_CONCURRENCY
 from typing import List, Tuple, cast, Optional, Iterable, Sequence
 
 logger = logging.getLogger(__name__)
@@ -21,13 +20,34 @@ class BreakPointThresholdTypeEnum(enum.Enum):
     GRADIENT = "gradient"
 
 
+def adjacent_cosine_distances(embeddings: np.ndarray) -> np.ndarray:
+    # one row-wise dot product over the whole document instead of a python loop
+    # over sentence pairs, zero vectors count as orthogonal like langchain does
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+    return 1.0 - np.einsum("ij,ij->i", normalized[:-1], normalized[1:])
+
+
+def breakpoint_groups(
+    breakpoint_array: np.ndarray, threshold: float, total: int
+) -> List[Tuple[int, int]]:
+    ends = np.flatnonzero(breakpoint_array > threshold) + 1
+    starts = np.concatenate(([0], ends))
+    if len(ends) == 0 or ends[-1] < total:
+        ends = np.append(ends, total)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
 class ParentDocumentRetriever:
     def __init__(
         self,
         embeddings: Embeddings,
+        reuse_sentence_embeddings: bool = REUSE_SENTENCE_EMBEDDINGS,
     ):
         self.sentence_splitters = SentenceSplitter()
         self.embeddings = embeddings
+        self.reuse_sentence_embeddings = reuse_sentence_embeddings
+        self.max_concurrency = MAX_CHUNKING_CONCURRENCY
         self.parent_buffer_size = 3
         self.child_buffer_size = 1
         self.parent_breakpoint_threshold_type = (
@@ -39,10 +59,10 @@ class ParentDocumentRetriever:
 
     def _calculate_breakpoint_threshold(
         self,
-        distances: List[float],
+        distances: np.ndarray,
         breakpoint_threshold_type: BreakPointThresholdTypeEnum,
         breakpoint_threshold_amount: float,
-    ) -> Tuple[float, List[float]]:
+    ) -> Tuple[float, np.ndarray]:
         if breakpoint_threshold_type == BreakPointThresholdTypeEnum.PERCENTILE:
             return (
                 cast(
@@ -85,37 +105,85 @@ class ParentDocumentRetriever:
                 f"{self.breakpoint_threshold_type}"
             )
 
-    def _calculate_sentence_distances(
-        self,
-        single_sentences_list: List[str],
-        buffer_size: int,
-    ) -> Tuple[List[float], List[dict]]:
+    def _pool_window_embeddings(
+        self, sentence_embeddings: np.ndarray, buffer_size: int
+    ) -> np.ndarray:
+        total = len(sentence_embeddings)
+        cumulative = np.zeros(
+            (total + 1, sentence_embeddings.shape[1]), dtype=np.float32
+        )
+        np.cumsum(sentence_embeddings, axis=0, out=cumulative[1:])
+
+        positions = np.arange(total)
+        starts = np.maximum(positions - buffer_size, 0)
+        ends = np.minimum(positions + buffer_size + 1, total)
+
+        return (cumulative[ends] - cumulative[starts]) / (ends - starts)[:, None]
+
+    def _combine_sentence_windows(
+        self, single_sentences_list: List[str], buffer_size: int
+    ) -> List[dict]:
         _sentences = [
             {"sentence": x, "index": i} for i, x in enumerate(single_sentences_list)
         ]
-        sentences = combine_sentences(_sentences, buffer_size)
-        embeddings = self.embeddings.embed_documents(
-            [x["combined_sentence"] for x in sentences]
-        )
-        for i, sentence in enumerate(sentences):
-            sentence["combined_sentence_embedding"] = embeddings[i]
+        return combine_sentences(_sentences, buffer_size)
 
-        return calculate_cosine_distances(sentences)
+    def _window_embeddings(
+        self,
+        single_sentences_list: List[str],
+        buffer_size: int,
+        sentence_embeddings: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        if sentence_embeddings is None:
+            sentences = self._combine_sentence_windows(
+                single_sentences_list=single_sentences_list, buffer_size=buffer_size
+            )
+            return np.asarray(
+                self.embeddings.embed_documents(
+                    [x["combined_sentence"] for x in sentences]
+                ),
+                dtype=np.float32,
+            )
+        return self._pool_window_embeddings(
+            sentence_embeddings=sentence_embeddings, buffer_size=buffer_size
+        )
 
-    def _split_text(
+    async def _awindow_embeddings(
         self,
-        text: str,
-        breakpoint_threshold_type: BreakPointThresholdTypeEnum,
-        breakpoint_threshold_amount: int,
+        single_sentences_list: List[str],
         buffer_size: int,
-    ) -> List[str]:
-        single_sentences_list = self.sentence_splitters.split_text(text=text)
+        sentence_embeddings: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        if sentence_embeddings is None:
+            sentences = self._combine_sentence_windows(
+                single_sentences_list=single_sentences_list, buffer_size=buffer_size
+            )
+            return np.asarray(
+                await self.embeddings.aembed_documents(
+                    [x["combined_sentence"] for x in sentences]
+                ),
+                dtype=np.float32,
+            )
+        return await asyncio.to_thread(
+            self._window_embeddings,
+            single_sentences_list=single_sentences_list,
+            buffer_size=buffer_size,
+            sentence_embeddings=sentence_embeddings,
+        )
 
-        if len(single_sentences_list) == 1:
-            return single_sentences_list
+    def _calculate_sentence_distances(
+        self, window_embeddings: np.ndarray
+    ) -> np.ndarray:
+        return adjacent_cosine_distances(window_embeddings)
 
-        distances, sentences = self._calculate_sentence_distances(
-            single_sentences_list=single_sentences_list, buffer_size=buffer_size
+    def _breakpoint_groups(
+        self,
+        window_embeddings: np.ndarray,
+        breakpoint_threshold_type: BreakPointThresholdTypeEnum,
+        breakpoint_threshold_amount: float,
+    ) -> List[Tuple[int, int]]:
+        distances = self._calculate_sentence_distances(
+            window_embeddings=window_embeddings
         )
 
         breakpoint_distance_threshold, breakpoint_array = (
@@ -126,36 +194,67 @@ class ParentDocumentRetriever:
             )
         )
 
-        indices_above_thresh = [
-            i
-            for i, x in enumerate(breakpoint_array)
-            if x > breakpoint_distance_threshold
-        ]
+        return breakpoint_groups(
+            breakpoint_array=breakpoint_array,
+            threshold=breakpoint_distance_threshold,
+            total=len(window_embeddings),
+        )
 
-        chunks = []
-        start_index = 0
+    def _group_sentences(
+        self,
+        single_sentences_list: List[str],
+        breakpoint_threshold_type: BreakPointThresholdTypeEnum,
+        breakpoint_threshold_amount: float,
+        buffer_size: int,
+        sentence_embeddings: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, int]]:
+        if len(single_sentences_list) == 1:
+            return [(0, 1)]
 
-        for index in indices_above_thresh:
-            end_index = index
+        window_embeddings = self._window_embeddings(
+            single_sentences_list=single_sentences_list,
+            buffer_size=buffer_size,
+            sentence_embeddings=sentence_embeddings,
+        )
 
-            group = sentences[start_index : end_index + 1]
-            combined_text = " ".join([d["sentence"] for d in group])
-            chunks.append(combined_text)
-            start_index = index + 1
+        return self._breakpoint_groups(
+            window_embeddings=window_embeddings,
+            breakpoint_threshold_type=breakpoint_threshold_type,
+            breakpoint_threshold_amount=breakpoint_threshold_amount,
+        )
 
-        if start_index < len(sentences):
-            combined_text = " ".join([d["sentence"] for d in sentences[start_index:]])
-            chunks.append(combined_text)
-        return chunks
+    async def _agroup_sentences(
+        self,
+        single_sentences_list: List[str],
+        breakpoint_threshold_type: BreakPointThresholdTypeEnum,
+        breakpoint_threshold_amount: float,
+        buffer_size: int,
+        sentence_embeddings: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, int]]:
+        if len(single_sentences_list) == 1:
+            return [(0, 1)]
 
-    def _create_documents(
+        window_embeddings = await self._awindow_embeddings(
+            single_sentences_list=single_sentences_list,
+            buffer_size=buffer_size,
+            sentence_embeddings=sentence_embeddings,
+        )
+
+        return await asyncio.to_thread(
+            self._breakpoint_groups,
+            window_embeddings=window_embeddings,
+            breakpoint_threshold_type=breakpoint_threshold_type,
+            breakpoint_threshold_amount=breakpoint_threshold_amount,
+        )
+
+    def _create_documents_per_text(
         self,
         child_documents: bool,
         texts: List[str],
         metadatas: Optional[List[dict]] = None,
-    ) -> List[Document]:
+    ) -> List[List[Document]]:
         _metadatas = metadatas or [{}] * len(texts)
-        documents = []
+        documents_per_text = []
         breakpoint_threshold_type = self.parent_breakpoint_threshold_type
         breakpoint_threshold_amount = self.parent_breakpoint_threshold
         buffer_size = self.parent_buffer_size
@@ -164,18 +263,38 @@ class ParentDocumentRetriever:
             breakpoint_threshold_amount = self.child_breakpoint_threshold
             buffer_size = self.child_buffer_size
 
-        for i, text in enumerate(texts):
-            for chunk in self._split_text(
-                text=text,
+        sentences_per_text = self.sentence_splitters.split_texts(texts=texts)
+
+        for i, single_sentences_list in enumerate(sentences_per_text):
+            documents = []
+            groups = self._group_sentences(
+                single_sentences_list=single_sentences_list,
                 breakpoint_threshold_type=breakpoint_threshold_type,
                 breakpoint_threshold_amount=breakpoint_threshold_amount,
                 buffer_size=buffer_size,
-            ):
+            )
+            for start, end in groups:
+                chunk = " ".join(single_sentences_list[start:end])
                 metadata = copy.deepcopy(_metadatas[i])
                 new_doc = Document(page_content=chunk, metadata=metadata)
                 documents.append(new_doc)
+            documents_per_text.append(documents)
 
-        return documents
+        return documents_per_text
+
+    def _create_documents(
+        self,
+        child_documents: bool,
+        texts: List[str],
+        metadatas: Optional[List[dict]] = None,
+    ) -> List[Document]:
+        return [
+            document
+            for documents in self._create_documents_per_text(
+                child_documents=child_documents, texts=texts, metadatas=metadatas
+            )
+            for document in documents
+        ]
 
     def _split_documents(self, documents: Iterable[Document]) -> List[dict]:
 
@@ -193,16 +312,231 @@ class ParentDocumentRetriever:
         logger.info(f"length of parent chunked docs: {len(parent_chunked_docs)}")
 
         if len(parent_chunked_docs) != 0:
-            for doc in parent_chunked_docs:
-                text = [doc.page_content]
-                child_chunked_doc = self._create_documents(
-                    child_documents=True,
-                    texts=text,
-                )
+            child_chunked_docs = self._create_documents_per_text(
+                child_documents=True,
+                texts=[doc.page_content for doc in parent_chunked_docs],
+            )
+            for doc, child_chunked_doc in zip(parent_chunked_docs, child_chunked_docs):
                 data = {"parent_doc": doc, "child_doc": child_chunked_doc}
                 splitted_data.append(data)
 
         return splitted_data
 
+    def _chunk_embedding(self, sentence_embeddings: np.ndarray) -> np.ndarray:
+        if len(sentence_embeddings) == 1:
+            return sentence_embeddings[0]
+
+        pooled = sentence_embeddings.mean(axis=0, dtype=np.float32)
+        norm = np.linalg.norm(pooled)
+        if norm > 0:
+            pooled /= norm
+        return pooled
+
+    def _assemble_from_sentence_embeddings(
+        self,
+        sentences_per_text: List[List[str]],
+        metadatas: List[dict],
+        all_embeddings: np.ndarray,
+    ) -> List[dict]:
+        splitted_data: List[dict] = []
+
+        offset = 0
+        for i, sentences in enumerate(sentences_per_text):
+            sentence_embeddings = all_embeddings[offset : offset + len(sentences)]
+            offset += len(sentences)
+
+            if not sentences:
+                continue
+
+            parent_groups = self._group_sentences(
+                single_sentences_list=sentences,
+                breakpoint_threshold_type=self.parent_breakpoint_threshold_type,
+                breakpoint_threshold_amount=self.parent_breakpoint_threshold,
+                buffer_size=self.parent_buffer_size,
+                sentence_embeddings=sentence_embeddings,
+            )
+
+            for parent_start, parent_end in parent_groups:
+                parent_sentences = sentences[parent_start:parent_end]
+                parent_embeddings = sentence_embeddings[parent_start:parent_end]
+
+                child_groups = self._group_sentences(
+                    single_sentences_list=parent_sentences,
+                    breakpoint_threshold_type=self.child_breakpoint_threshold_type,
+                    breakpoint_threshold_amount=self.child_breakpoint_threshold,
+                    buffer_size=self.child_buffer_size,
+                    sentence_embeddings=parent_embeddings,
+                )
+
+                child_docs = []
+                child_embeddings = np.empty(
+                    (len(child_groups), sentence_embeddings.shape[1]),
+                    dtype=np.float32,
+                )
+                for j, (child_start, child_end) in enumerate(child_groups):
+                    child_docs.append(
+                        Document(
+                            page_content=" ".join(
+                                parent_sentences[child_start:child_end]
+                            ),
+                            metadata={},
+                        )
+                    )
+                    child_embeddings[j] = self._chunk_embedding(
+                        parent_embeddings[child_start:child_end]
+                    )
+
+                parent_doc = Document(
+                    page_content=" ".join(parent_sentences),
+                    metadata=copy.deepcopy(metadatas[i]),
+                )
+                splitted_data.append(
+                    {
+                        "parent_doc": parent_doc,
+                        "child_doc": child_docs,
+                        "child_doc_embeddings": child_embeddings,
+                    }
+                )
+
+        logger.info(
+            f"embedded {len(all_embeddings)} sentences once for "
+            f"{len(splitted_data)} parent chunked docs"
+        )
+
+        return splitted_data
+
+    def _split_documents_reusing_embeddings(
+        self, documents: Iterable[Document]
+    ) -> List[dict]:
+        texts, metadatas = [], []
+        for doc in documents:
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
+
+        sentences_per_text = self.sentence_splitters.split_texts(texts=texts)
+        all_sentences = [
+            sentence for sentences in sentences_per_text for sentence in sentences
+        ]
+
+        if not all_sentences:
+            return []
+
+        all_embeddings = np.asarray(
+            self.embeddings.embed_documents(all_sentences), dtype=np.float32
+        )
+
+        return self._assemble_from_sentence_embeddings(
+            sentences_per_text=sentences_per_text,
+            metadatas=metadatas,
+            all_embeddings=all_embeddings,
+        )
+
+    async def _asplit_documents_reusing_embeddings(
+        self, documents: Iterable[Document]
+    ) -> List[dict]:
+        texts, metadatas = [], []
+        for doc in documents:
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
+
+        sentences_per_text = await self.sentence_splitters.asplit_texts(texts=texts)
+        all_sentences = [
+            sentence for sentences in sentences_per_text for sentence in sentences
+        ]
+
+        if not all_sentences:
+            return []
+
+        all_embeddings = np.asarray(
+            await self.embeddings.aembed_documents(all_sentences), dtype=np.float32
+        )
+
+        return await asyncio.to_thread(
+            self._assemble_from_sentence_embeddings,
+            sentences_per_text=sentences_per_text,
+            metadatas=metadatas,
+            all_embeddings=all_embeddings,
+        )
+
+    async def _asplit_documents(self, documents: Iterable[Document]) -> List[dict]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def group_with_limit(sentences: List[str], child_documents: bool):
+            async with semaphore:
+                if child_documents:
+                    return await self._agroup_sentences(
+                        single_sentences_list=sentences,
+                        breakpoint_threshold_type=self.child_breakpoint_threshold_type,
+                        breakpoint_threshold_amount=self.child_breakpoint_threshold,
+                        buffer_size=self.child_buffer_size,
+                    )
+                return await self._agroup_sentences(
+                    single_sentences_list=sentences,
+                    breakpoint_threshold_type=self.parent_breakpoint_threshold_type,
+                    breakpoint_threshold_amount=self.parent_breakpoint_threshold,
+                    buffer_size=self.parent_buffer_size,
+                )
+
+        texts, metadatas = [], []
+        for doc in documents:
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
+
+        sentences_per_text = await self.sentence_splitters.asplit_texts(texts=texts)
+
+        parent_groups_per_text = await asyncio.gather(
+            *[
+                group_with_limit(sentences=sentences, child_documents=False)
+                for sentences in sentences_per_text
+                if sentences
+            ]
+        )
+
+        parent_chunked_docs: List[Document] = []
+        non_empty = [i for i, sentences in enumerate(sentences_per_text) if sentences]
+        for i, groups in zip(non_empty, parent_groups_per_text):
+            for start, end in groups:
+                parent_chunked_docs.append(
+                    Document(
+                        page_content=" ".join(sentences_per_text[i][start:end]),
+                        metadata=copy.deepcopy(metadatas[i]),
+                    )
+                )
+
+        logger.info(f"length of parent chunked docs: {len(parent_chunked_docs)}")
+
+        child_sentences_per_parent = await self.sentence_splitters.asplit_texts(
+            texts=[doc.page_content for doc in parent_chunked_docs]
+        )
+
+        child_groups_per_parent = await asyncio.gather(
+            *[
+                group_with_limit(sentences=sentences, child_documents=True)
+                for sentences in child_sentences_per_parent
+            ]
+        )
+
+        splitted_data: List[dict] = []
+        for doc, sentences, groups in zip(
+            parent_chunked_docs, child_sentences_per_parent, child_groups_per_parent
+        ):
+            child_chunked_doc = [
+                Document(page_content=" ".join(sentences[start:end]), metadata={})
+                for start, end in groups
+            ]
+            splitted_data.append({"parent_doc": doc, "child_doc": child_chunked_doc})
+
+        return splitted_data
+
     def transform_documents(self, documents: Sequence[Document]) -> List[dict]:
+        if self.reuse_sentence_embeddings:
+            return self._split_documents_reusing_embeddings(list(documents))
         return self._split_documents(list(documents))
+
+    def close(self):
+        self.sentence_splitters.shutdown()
+
+    async def atransform_documents(self, documents: Sequence[Document]) -> List[dict]:
+        if self.reuse_sentence_embeddings:
+            return await self._asplit_documents_reusing_embeddings(list(documents))
+        return await self._asplit_documents(list(documents))
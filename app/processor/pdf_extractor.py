@@ -0,0 +1,124 @@
+import asyncio
+import io
+import logging
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, AsyncIterator, Deque, List, Optional, Tuple, Union
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from app.constants.globals import (
+    PDF_EXTRACT_PROCESSES,
+    PDF_MAX_PENDING_SHARDS,
+    PDF_PAGES_PER_SHARD,
+    PDF_PARALLEL_MIN_PAGES,
+)
+from app.utils.process_pool import spawn_process_pool
+
+logger = logging.getLogger(__name__)
+
+
+PdfSource = Union[str, bytes]
+
+
+def _extract_page_range(source: PdfSource, start: int, end: int) -> List[str]:
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def count_pages(source: Union[str, IO[bytes]]) -> int:
+    try:
+        return len(PdfReader(source).pages)
+    finally:
+        if not isinstance(source, str):
+            source.seek(0)
+
+
+class ParallelPdfExtractor:
+    def __init__(
+        self,
+        n_process: int = PDF_EXTRACT_PROCESSES,
+        pages_per_shard: int = PDF_PAGES_PER_SHARD,
+        min_pages: int = PDF_PARALLEL_MIN_PAGES,
+        max_pending_shards: int = PDF_MAX_PENDING_SHARDS,
+    ):
+        self.n_process = n_process
+        self.pages_per_shard = pages_per_shard
+        self.min_pages = min_pages
+        self.max_pending_shards = max(max_pending_shards, 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = spawn_process_pool(max_workers=self.n_process)
+            logger.info(f"started pdf extraction pool with {self.n_process} workers")
+        return self._pool
+
+    def should_parallelize(self, total_pages: int) -> bool:
+        return self.n_process > 1 and total_pages >= self.min_pages
+
+    def _shards(
+        self, total_pages: int, pdf: PdfSource, start_page: int = 0
+    ) -> List[Tuple[int, int]]:
+        pages_per_shard = self.pages_per_shard
+        if isinstance(pdf, bytes):
+            # in-memory files are pickled to every shard, so keep one shard per worker
+            pages_per_shard = max(
+                pages_per_shard, math.ceil(total_pages / self.n_process)
+            )
+        return [
+            (start, min(start + pages_per_shard, total_pages))
+            for start in range(start_page, total_pages, pages_per_shard)
+        ]
+
+    async def astream_pages(
+        self, pdf: PdfSource, source: str, total_pages: int, start_page: int = 0
+    ) -> AsyncIterator[List[Document]]:
+        loop = asyncio.get_running_loop()
+        shards = iter(self._shards(total_pages, pdf, start_page=start_page))
+        pending: Deque[Tuple[int, asyncio.Future]] = deque()
+
+        try:
+            while True:
+                # only a bounded window of shards runs ahead of the consumer, so page
+                # text never piles up faster than it is chunked and stored
+                while len(pending) < self.max_pending_shards:
+                    shard = next(shards, None)
+                    if shard is None:
+                        break
+                    pending.append(
+                        (
+                            shard[0],
+                            loop.run_in_executor(
+                                self.pool, _extract_page_range, pdf, *shard
+                            ),
+                        )
+                    )
+                if not pending:
+                    break
+
+                # shards finish out of order, awaiting them in order keeps page order
+                # while later shards keep extracting in the pool
+                start, future = pending.popleft()
+                texts = await future
+                yield [
+                    Document(
+                        page_content=text,
+                        metadata={
+                            "source": source,
+                            "page": start + offset,
+                            "total_pages": total_pages,
+                        },
+                    )
+                    for offset, text in enumerate(texts)
+                ]
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
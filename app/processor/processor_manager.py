@@ -1,16 +1,25 @@
 import asyncio
 import logging
-from typing import List, Tuple
+import time
+from typing import List, Optional, Tuple
 
 from sqlalchemy import case, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.aws.client import AwsClientManager
 from app.core.config import Settings
 from app.dao.models import FileForIngestion, ReceivedSqsMessage
+from app.dao.ingestion_dao import delete_ingestion_checkpoints
 from app.dao.schema import IngestionJob, KnowledgeBaseDocument, OperationStatusEnum
 from app.milvus.client import MilvusOps
 from app.processor.ingest_data import IngestData
 from app.core.db import SessionLocal
+from app.embeddings.cache import EmbeddingCache
+from app.embeddings.gateway import EmbeddingGateway
+from app.core.metrics import (
+    INGESTION_JOB_SECONDS,
+    SQS_RECEIVE_LAG_SECONDS,
+    JobMetrics,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -26,6 +35,8 @@ class ProcessorManager:
         aws_client_manager: AwsClientManager,
         settings: Settings,
         milvus_ops: MilvusOps,
+        embedding_cache: EmbeddingCache,
+        embedding_gateway: EmbeddingGateway,
     ):
         self.aws_client_manager: AwsClientManager = aws_client_manager
         self.settings: Settings = settings
@@ -33,10 +44,15 @@ class ProcessorManager:
             settings=settings,
             aws_client_manager=self.aws_client_manager,
             milvus_ops=milvus_ops,
+            embedding_cache=embedding_cache,
+            embedding_gateway=embedding_gateway,
         )
 
+    def close(self):
+        self.ingest_data_ops.close()
+
     async def _process_tasks_concurrently(
-        self, message: ReceivedSqsMessage
+        self, message: ReceivedSqsMessage, job_metrics: JobMetrics
     ) -> Tuple[List, List]:
         tasks_to_run = []
         indexing_task_present = False
@@ -51,6 +67,14 @@ class ProcessorManager:
                         user_id=message.body.user_id,
                         category=message.body.category,
                         collection_name=message.body.collection_name,
+                        ingestion_job_id=message.body.ingestion_job_id,
+                        parsing_tier=message.body.parsing_tier,
+                        dimension=message.body.dimension,
+                        search_method=message.body.search_method,
+                        chunking_strategy=message.body.chunking_strategy,
+                        kb_id=message.body.kb_id,
+                        deduplicate_chunks=message.body.deduplicate_chunks,
+                        job_metrics=job_metrics,
                     )
                 )
             )
@@ -61,7 +85,12 @@ class ProcessorManager:
             tasks_to_run.append(
                 asyncio.create_task(
                     self.ingest_data_ops.reindex_data(
-                        files=delete_files, collection_name=message.body.collection_name
+                        files=delete_files,
+                        collection_name=message.body.collection_name,
+                        user_id=message.body.user_id,
+                        category=message.body.category,
+                        dimension=message.body.dimension,
+                        search_method=message.body.search_method,
                     )
                 )
             )
@@ -105,15 +134,23 @@ class ProcessorManager:
         logger.info("successfully updated document statuses")
 
     async def _set_ingestion_job_status(
-        self, db: AsyncSession, job_id: int, status: OperationStatusEnum
+        self,
+        db: AsyncSession,
+        job_id: int,
+        status: OperationStatusEnum,
+        metrics_summary: Optional[dict] = None,
     ):
-        stmt = (
-            update(IngestionJob)
-            .where(IngestionJob.id == job_id)
-            .values(op_status=status)
-        )
+        values = {"op_status": status}
+        if metrics_summary is not None:
+            values["metrics_summary"] = metrics_summary
+
+        stmt = update(IngestionJob).where(IngestionJob.id == job_id).values(**values)
         await db.execute(stmt)
 
+        # checkpoints only matter while the message can still be redelivered
+        if status in (OperationStatusEnum.SUCCESS, OperationStatusEnum.FAILED):
+            await delete_ingestion_checkpoints(db=db, ingestion_job_ids=[job_id])
+
     async def _bulk_delete_documents(self, db: AsyncSession, doc_ids: List[int]):
         if not doc_ids:
             logger.info("no document statuses to update")
@@ -127,10 +164,18 @@ class ProcessorManager:
 
     async def process_message(self, message: ReceivedSqsMessage):
         logger.info("initiating processing message")
+        started = time.perf_counter()
+        job_metrics = JobMetrics(
+            ingestion_job_id=message.body.ingestion_job_id,
+            receive_lag_seconds=message.receive_lag_seconds,
+        )
+        if job_metrics.receive_lag_seconds is not None:
+            SQS_RECEIVE_LAG_SECONDS.observe(job_metrics.receive_lag_seconds)
+
         try:
             job_failed = False
             indexing_results, deletion_results = await self._process_tasks_concurrently(
-                message=message
+                message=message, job_metrics=job_metrics
             )
             logger.info("indexing and reindexing is completed")
 
@@ -186,17 +231,26 @@ class ProcessorManager:
                     if job_failed
                     else OperationStatusEnum.SUCCESS
                 )
+                job_metrics.total_seconds = time.perf_counter() - started
+                metrics_summary = job_metrics.summary()
                 await self._set_ingestion_job_status(
                     db=db,
                     job_id=message.body.ingestion_job_id,
                     status=final_job_status,
+                    metrics_summary=metrics_summary,
                 )
 
                 await db.commit()
 
+                INGESTION_JOB_SECONDS.labels(
+                    status=final_job_status.value.lower()
+                ).observe(job_metrics.total_seconds)
                 logger.info(
                     f"Database updates for job {message.body.ingestion_job_id} committed with final status: {final_job_status.name}"
                 )
+                logger.info(
+                    f"ingestion job {message.body.ingestion_job_id} metrics: {metrics_summary}"
+                )
 
         except Exception as e:
             logger.error(
@@ -204,11 +258,16 @@ class ProcessorManager:
                 exc_info=True,
             )
             try:
+                job_metrics.total_seconds = time.perf_counter() - started
+                INGESTION_JOB_SECONDS.labels(status="failed").observe(
+                    job_metrics.total_seconds
+                )
                 async with SessionLocal() as db:
                     await self._set_ingestion_job_status(
                         db=db,
                         job_id=message.body.ingestion_job_id,
                         status=OperationStatusEnum.FAILED,
+                        metrics_summary=job_metrics.summary(),
                     )
                     await db.commit()
                     logger.warning(
@@ -0,0 +1,76 @@
+import asyncio
+import copy
+import logging
+from typing import List, Sequence
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from app.constants.globals import (
+    RECURSIVE_CHILD_CHUNK_OVERLAP,
+    RECURSIVE_CHILD_CHUNK_TOKENS,
+    RECURSIVE_PARENT_CHUNK_OVERLAP,
+    RECURSIVE_PARENT_CHUNK_TOKENS,
+)
+from app.constants.models import OPENAI_EMBEDDINGS_MODEL
+from app.embeddings.metered import get_encoding
+
+logger = logging.getLogger(__name__)
+
+
+class RecursiveTokenChunker:
+    def __init__(
+        self,
+        model: str = OPENAI_EMBEDDINGS_MODEL,
+        parent_chunk_tokens: int = RECURSIVE_PARENT_CHUNK_TOKENS,
+        parent_chunk_overlap: int = RECURSIVE_PARENT_CHUNK_OVERLAP,
+        child_chunk_tokens: int = RECURSIVE_CHILD_CHUNK_TOKENS,
+        child_chunk_overlap: int = RECURSIVE_CHILD_CHUNK_OVERLAP,
+    ):
+        # sizes are counted in tokens of the model the child chunks are embedded
+        # with, so a child never gets truncated by the embedding request
+        encoding = get_encoding(model)
+
+        def token_length(text: str) -> int:
+            return len(encoding.encode(text, disallowed_special=()))
+
+        self.parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=parent_chunk_tokens,
+            chunk_overlap=parent_chunk_overlap,
+            length_function=token_length,
+        )
+        self.child_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=child_chunk_tokens,
+            chunk_overlap=child_chunk_overlap,
+            length_function=token_length,
+        )
+
+    def transform_documents(self, documents: Sequence[Document]) -> List[dict]:
+        splitted_data: List[dict] = []
+
+        for document in documents:
+            for parent_text in self.parent_splitter.split_text(document.page_content):
+                child_docs = [
+                    Document(page_content=child_text, metadata={})
+                    for child_text in self.child_splitter.split_text(parent_text)
+                ]
+                if not child_docs:
+                    continue
+                splitted_data.append(
+                    {
+                        "parent_doc": Document(
+                            page_content=parent_text,
+                            metadata=copy.deepcopy(document.metadata),
+                        ),
+                        "child_doc": child_docs,
+                    }
+                )
+
+        logger.info(f"length of parent chunked docs: {len(splitted_data)}")
+
+        return splitted_data
+
+    async def atransform_documents(self, documents: Sequence[Document]) -> List[dict]:
+        return await asyncio.to_thread(self.transform_documents, list(documents))
+
+    def close(self):
+        pass
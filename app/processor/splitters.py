@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import spacy
+from concurrent.futures import ProcessPoolExecutor
 from langchain.text_splitter import TextSplitter
 from app.constants.models import (
     SPACY_MODEL,
@@ -9,19 +11,118 @@ from app.constants.models import (
     SPACY_NER,
     SPACY_SENTENCIZER,
 )
-from typing import List
+from app.constants.globals import (
+    SENTENCE_SPLIT_PROCESSES,
+    SENTENCE_SPLIT_BATCH_SIZE,
+    SENTENCE_SPLIT_POOL_MIN_CHARS,
+)
+from app.core.metrics import measure_stage
+from app.utils.process_pool import spawn_process_pool
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+_worker_nlp = None
+
+
+def _load_sentencizer():
+    nlp = spacy.load(
+        SPACY_MODEL, exclude=[SPACY_PARSER, SPACY_TAGGER, SPACY_LEM, SPACY_NER]
+    )
+    nlp.add_pipe(SPACY_SENTENCIZER)
+    return nlp
+
+
+def _init_worker():
+    global _worker_nlp
+    _worker_nlp = _load_sentencizer()
+
+
+def _pipe_sentences(nlp, texts: List[str], batch_size: int) -> List[List[str]]:
+    return [
+        [sent.text.strip() for sent in doc.sents]
+        for doc in nlp.pipe(texts, batch_size=batch_size)
+    ]
+
+
+def _split_shard(texts: List[str], batch_size: int) -> List[List[str]]:
+    return _pipe_sentences(_worker_nlp, texts, batch_size)
+
 
 class SentenceSplitter(TextSplitter):
-    def __init__(self):
+    def __init__(
+        self,
+        n_process: int = SENTENCE_SPLIT_PROCESSES,
+        batch_size: int = SENTENCE_SPLIT_BATCH_SIZE,
+    ):
         super().__init__()
-        self.nlp = spacy.load(
-            SPACY_MODEL, exclude=[SPACY_PARSER, SPACY_TAGGER, SPACY_LEM, SPACY_NER]
-        )
-        self.nlp.add_pipe(SPACY_SENTENCIZER)
+        self.nlp = _load_sentencizer()
+        self.n_process = n_process
+        self.batch_size = batch_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = spawn_process_pool(
+                max_workers=self.n_process, initializer=_init_worker
+            )
+            logger.info(f"started sentence splitter pool with {self.n_process} workers")
+        return self._pool
 
     def split_text(self, text) -> List[str]:
         doc = self.nlp(text=text)
         return [sent.text.strip() for sent in doc.sents]
+
+    def _use_pool(self, texts: List[str]) -> bool:
+        return (
+            self.n_process > 1
+            and len(texts) > 1
+            and sum(len(text) for text in texts) >= SENTENCE_SPLIT_POOL_MIN_CHARS
+        )
+
+    def _shard(self, texts: List[str]) -> List[List[str]]:
+        target = sum(len(text) for text in texts) / (self.n_process * 2)
+        shards: List[List[str]] = [[]]
+        shard_chars = 0
+        for text in texts:
+            if shards[-1] and shard_chars >= target:
+                shards.append([])
+                shard_chars = 0
+            shards[-1].append(text)
+            shard_chars += len(text)
+        return shards
+
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
+        with measure_stage("sentence_split"):
+            if not self._use_pool(texts):
+                return _pipe_sentences(self.nlp, texts, self.batch_size)
+
+            futures = [
+                self.pool.submit(_split_shard, shard, self.batch_size)
+                for shard in self._shard(texts)
+            ]
+            return [sentences for future in futures for sentences in future.result()]
+
+    async def asplit_texts(self, texts: List[str]) -> List[List[str]]:
+        with measure_stage("sentence_split"):
+            if not self._use_pool(texts):
+                return await asyncio.to_thread(
+                    _pipe_sentences, self.nlp, texts, self.batch_size
+                )
+
+            loop = asyncio.get_running_loop()
+            shard_results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        self.pool, _split_shard, shard, self.batch_size
+                    )
+                    for shard in self._shard(texts)
+                ]
+            )
+            return [sentences for shard in shard_results for sentences in shard]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -12,6 +12,7 @@ from app.constants.globals import (
     TOTAL_POOL_SIZE,
     TIME_THRESHOLD,
     MAX_CONCURRENT_PROVISIONER,
+    MODEL_DIMENSION,
 )
 from app.utils.name import generate_random_string
 from app.utils.application_timezone import get_current_time
@@ -38,7 +39,9 @@ class ProvisionManager:
         self._reconcile_trigger_queue = asyncio.Queue()
         self._cleanup_trigger_queue = asyncio.Queue()
 
-    async def provision_new_collection(self, search_method: SearchMethodEnum):
+    async def provision_new_collection(
+        self, search_method: SearchMethodEnum, dimension: int = MODEL_DIMENSION
+    ):
         collection_name = f"_{generate_random_string()}"
         collection_record_id = None
         try:
@@ -48,6 +51,7 @@ class ProvisionManager:
                         collection_name=collection_name,
                         status=ProvisionerStatusEnum.PROVISIONING,
                         search_method=search_method,
+                        dimension=dimension,
                     )
                     db.add(new_collection)
                 await db.refresh(new_collection)
@@ -66,6 +70,7 @@ class ProvisionManager:
                 self.milvusOps.create_collection,
                 collection_name=collection_name,
                 collection_type=search_method,
+                dimension=dimension,
             )
             logger.info(
                 f"successfully created collection '{collection_name}' in milvus"
@@ -108,6 +113,8 @@ class ProvisionManager:
     async def reconcile_collections(self):
         time_threshold = get_current_time() - timedelta(minutes=TIME_THRESHOLD)
 
+        # pools are kept warm for the default dimension only, other dimensions
+        # are provisioned when a knowledge base asks for them
         async with SessionLocal() as db:
             stmt = select(
                 func.count(MilvusCollections.id).label("total"),
@@ -206,7 +213,7 @@ class ProvisionManager:
                         else_=0,
                     )
                 ).label("ivf_provisioning_count"),
-            )
+            ).where(MilvusCollections.dimension == MODEL_DIMENSION)
 
             counts = (await db.execute(stmt)).one()
 
@@ -0,0 +1,39 @@
+import asyncio
+import itertools
+from collections import deque
+
+
+class ByteBudget:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self._holders = 0
+        self._tickets = itertools.count()
+        self._waiting: deque = deque()
+        self._condition = asyncio.Condition()
+
+    def _fits(self, ticket: int, size: int) -> bool:
+        # admission is first come first served so a large item is never starved by
+        # smaller ones, and an item larger than the whole budget is still admitted
+        # once nothing else holds it
+        if self._waiting[0] != ticket:
+            return False
+        return self._holders == 0 or self.used_bytes + size <= self.max_bytes
+
+    async def acquire(self, size: int):
+        async with self._condition:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            try:
+                await self._condition.wait_for(lambda: self._fits(ticket, size))
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+            self.used_bytes += size
+            self._holders += 1
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.used_bytes -= size
+            self._holders -= 1
+            self._condition.notify_all()
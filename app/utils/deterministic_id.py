@@ -1,7 +1,11 @@
 import uuid
 
-def generate_chunk_id(file_name: str, parent_id: int, chunk_index: int) -> str:
-    unique_name = f"{file_name}::parent:{parent_id}::chunk:{chunk_index}"
+def generate_chunk_id(
+    kb_doc_id: int, parent_hash: str, occurrence: int, chunk_index: int
+) -> str:
+    unique_name = (
+        f"kb_doc:{kb_doc_id}::parent:{parent_hash}:{occurrence}::chunk:{chunk_index}"
+    )
 
     deterministic_id = uuid.uuid5(uuid.NAMESPACE_DNS, unique_name)
 
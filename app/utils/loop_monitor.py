@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Optional
+
+import numpy as np
+from app.constants.globals import (
+    LOOP_LAG_SAMPLE_INTERVAL,
+    LOOP_LAG_BUDGET_SECONDS,
+    LOOP_LAG_WINDOW_SIZE,
+)
+from app.dao.models import EventLoopLagStats
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopLagMonitor:
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_SAMPLE_INTERVAL,
+        budget: float = LOOP_LAG_BUDGET_SECONDS,
+        window_size: int = LOOP_LAG_WINDOW_SIZE,
+    ):
+        self.interval = interval
+        self.budget = budget
+        self._samples: deque = deque(maxlen=window_size)
+        self.max_lag = 0.0
+        self.total_samples = 0
+        self.budget_violations = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+
+            self._samples.append(lag)
+            self.total_samples += 1
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag > self.budget:
+                self.budget_violations += 1
+                logger.warning(
+                    f"event loop blocked for {lag * 1000:.1f} ms, "
+                    f"budget is {self.budget * 1000:.1f} ms"
+                )
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="event_loop_lag_monitor")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> EventLoopLagStats:
+        samples = np.asarray(self._samples) if self._samples else np.zeros(1)
+        return EventLoopLagStats(
+            message="successfully fetched event loop lag",
+            budget_ms=self.budget * 1000,
+            last_lag_ms=float(samples[-1]) * 1000,
+            p50_lag_ms=float(np.percentile(samples, 50)) * 1000,
+            p99_lag_ms=float(np.percentile(samples, 99)) * 1000,
+            max_lag_ms=self.max_lag * 1000,
+            samples=self.total_samples,
+            budget_violations=self.budget_violations,
+        )
@@ -0,0 +1,14 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+
+def spawn_process_pool(
+    max_workers: int, initializer: Optional[Callable[[], None]] = None
+) -> ProcessPoolExecutor:
+    # spawn keeps grpc and boto clients of the parent out of the workers
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+    )
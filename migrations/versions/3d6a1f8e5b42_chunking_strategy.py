@@ -0,0 +1,32 @@
+"""chunking strategy
+
+Revision ID: 3d6a1f8e5b42
+Revises: 9b4e2d7a6c13
+Create Date: 2026-10-17 20:11:52.604317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3d6a1f8e5b42'
+down_revision: Union[str, None] = '9b4e2d7a6c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+chunking_strategy = postgresql.ENUM('SEMANTIC', 'RECURSIVE', name='chunking_strategy', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    chunking_strategy.create(op.get_bind(), checkfirst=True)
+    op.add_column('knowledge_bases', sa.Column('chunking_strategy', chunking_strategy, server_default='SEMANTIC', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('knowledge_bases', 'chunking_strategy')
+    chunking_strategy.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,40 @@
+"""embedding cache
+
+Revision ID: 4f1c2a9d7e3b
+Revises: cada4d0aaebe
+Create Date: 2026-10-17 09:12:41.310254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1c2a9d7e3b'
+down_revision: Union[str, None] = 'cada4d0aaebe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('embedding_cache',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('dimension', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('embedding', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_used_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('model', 'dimension', 'content_hash', name='idx_unique_embedding_key')
+    )
+    op.create_index('idx_embedding_cache_last_used', 'embedding_cache', ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_embedding_cache_last_used', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
@@ -0,0 +1,28 @@
+"""collection dimension
+
+Revision ID: 5a8f3c1e9d27
+Revises: e41a7c9b2d05
+Create Date: 2026-10-17 18:02:11.514093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8f3c1e9d27'
+down_revision: Union[str, None] = 'e41a7c9b2d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('milvus_collections', sa.Column('dimension', sa.Integer(), server_default='3072', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('milvus_collections', 'dimension')
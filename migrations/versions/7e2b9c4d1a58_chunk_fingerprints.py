@@ -0,0 +1,46 @@
+"""chunk fingerprints
+
+Revision ID: 7e2b9c4d1a58
+Revises: 3d6a1f8e5b42
+Create Date: 2026-10-17 21:03:18.917254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b9c4d1a58'
+down_revision: Union[str, None] = '3d6a1f8e5b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('knowledge_bases', sa.Column('deduplicate_chunks', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.create_table('chunk_fingerprints',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('kb_id', sa.Integer(), nullable=False),
+    sa.Column('parent_id', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_id', sa.String(length=64), nullable=False),
+    sa.Column('simhash', sa.BigInteger(), nullable=False),
+    sa.Column('bands', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.ForeignKeyConstraint(['kb_id'], ['knowledge_bases.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['parent_id'], ['parent_chunked_docs.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_chunk_fingerprint_kb', 'chunk_fingerprints', ['kb_id'], unique=False)
+    op.create_index('idx_chunk_fingerprint_parent', 'chunk_fingerprints', ['parent_id'], unique=False)
+    op.create_index('idx_chunk_fingerprint_bands', 'chunk_fingerprints', ['bands'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_chunk_fingerprint_bands', table_name='chunk_fingerprints', postgresql_using='gin')
+    op.drop_index('idx_chunk_fingerprint_parent', table_name='chunk_fingerprints')
+    op.drop_index('idx_chunk_fingerprint_kb', table_name='chunk_fingerprints')
+    op.drop_table('chunk_fingerprints')
+    op.drop_column('knowledge_bases', 'deduplicate_chunks')
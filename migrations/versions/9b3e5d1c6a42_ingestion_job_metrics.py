@@ -0,0 +1,28 @@
+"""ingestion job metrics
+
+Revision ID: 9b3e5d1c6a42
+Revises: 4f1c2a9d7e3b
+Create Date: 2026-10-17 13:40:08.517392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e5d1c6a42'
+down_revision: Union[str, None] = '4f1c2a9d7e3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingestion_jobs', sa.Column('metrics_summary', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingestion_jobs', 'metrics_summary')
@@ -0,0 +1,32 @@
+"""compact vector layouts
+
+Revision ID: 9b4e2d7a6c13
+Revises: 5a8f3c1e9d27
+Create Date: 2026-10-17 19:24:37.208441
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4e2d7a6c13'
+down_revision: Union[str, None] = '5a8f3c1e9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE search_category ADD VALUE IF NOT EXISTS 'HNSW_FP16'")
+        op.execute("ALTER TYPE search_category ADD VALUE IF NOT EXISTS 'HNSW_INT8'")
+        op.execute("ALTER TYPE search_category ADD VALUE IF NOT EXISTS 'BIN_IVF_FLAT'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # postgres cannot drop values from an enum type, the extra labels are left in
+    # place and are harmless to older code
+    pass
@@ -0,0 +1,46 @@
+"""ingestion checkpoints
+
+Revision ID: b81d5e3f0c64
+Revises: 7e2b9c4d1a58
+Create Date: 2026-10-17 22:15:40.336819
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81d5e3f0c64'
+down_revision: Union[str, None] = '7e2b9c4d1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('parent_chunked_docs', sa.Column('ingestion_job_id', sa.BigInteger(), nullable=True))
+    op.create_foreign_key('parent_chunked_docs_ingestion_job_id_fkey', 'parent_chunked_docs', 'ingestion_jobs', ['ingestion_job_id'], ['id'], onupdate='CASCADE', ondelete='SET NULL')
+    op.create_table('ingestion_checkpoints',
+    sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+    sa.Column('ingestion_job_id', sa.BigInteger(), nullable=False),
+    sa.Column('kb_doc_id', sa.BigInteger(), nullable=False),
+    sa.Column('documents_done', sa.Integer(), nullable=False),
+    sa.Column('parent_chunks_done', sa.Integer(), nullable=False),
+    sa.Column('child_chunks_done', sa.Integer(), nullable=False),
+    sa.Column('deduplicated_chunks', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['ingestion_job_id'], ['ingestion_jobs.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['kb_doc_id'], ['knowledge_base_documents.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ingestion_job_id', 'kb_doc_id', name='idx_unique_ingestion_checkpoint')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ingestion_checkpoints')
+    op.drop_constraint('parent_chunked_docs_ingestion_job_id_fkey', 'parent_chunked_docs', type_='foreignkey')
+    op.drop_column('parent_chunked_docs', 'ingestion_job_id')
@@ -0,0 +1,32 @@
+"""chunk fingerprint duplicates
+
+Revision ID: c4f19a7e2d80
+Revises: b81d5e3f0c64
+Create Date: 2026-10-18 09:12:27.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f19a7e2d80'
+down_revision: Union[str, None] = 'b81d5e3f0c64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chunk_fingerprints', sa.Column('duplicate_of', sa.String(length=64), nullable=True))
+    op.add_column('chunk_fingerprints', sa.Column('content', sa.Text(), nullable=True))
+    op.create_index('idx_chunk_fingerprint_duplicate_of', 'chunk_fingerprints', ['duplicate_of'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_chunk_fingerprint_duplicate_of', table_name='chunk_fingerprints')
+    op.drop_column('chunk_fingerprints', 'content')
+    op.drop_column('chunk_fingerprints', 'duplicate_of')
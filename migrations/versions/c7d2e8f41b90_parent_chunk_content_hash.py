@@ -0,0 +1,54 @@
+"""parent chunk content hash
+
+Revision ID: c7d2e8f41b90
+Revises: 9b3e5d1c6a42
+Create Date: 2026-10-17 15:02:51.204613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e8f41b90'
+down_revision: Union[str, None] = '9b3e5d1c6a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('parent_chunked_docs', sa.Column('kb_doc_id', sa.BigInteger(), nullable=True))
+    op.add_column('parent_chunked_docs', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key('parent_chunked_docs_kb_doc_id_fkey', 'parent_chunked_docs', 'knowledge_base_documents', ['kb_doc_id'], ['id'], onupdate='CASCADE', ondelete='CASCADE')
+    op.create_index('idx_parent_chunk_kb_doc_hash', 'parent_chunked_docs', ['kb_doc_id', 'content_hash'], unique=False)
+
+    # existing chunks can only be attributed when the document belongs to a single knowledge base
+    op.execute(
+        """
+        UPDATE parent_chunked_docs AS p
+        SET kb_doc_id = kbd.id
+        FROM knowledge_base_documents AS kbd
+        WHERE kbd.document_id = p.document_id
+          AND (
+            SELECT count(*) FROM knowledge_base_documents AS other
+            WHERE other.document_id = p.document_id
+          ) = 1
+        """
+    )
+    op.execute(
+        """
+        UPDATE parent_chunked_docs
+        SET content_hash = encode(sha256(convert_to(chunk, 'UTF8')), 'hex')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_parent_chunk_kb_doc_hash', table_name='parent_chunked_docs')
+    op.drop_constraint('parent_chunked_docs_kb_doc_id_fkey', 'parent_chunked_docs', type_='foreignkey')
+    op.drop_column('parent_chunked_docs', 'content_hash')
+    op.drop_column('parent_chunked_docs', 'kb_doc_id')
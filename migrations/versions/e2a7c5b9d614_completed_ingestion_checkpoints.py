@@ -0,0 +1,28 @@
+"""completed ingestion checkpoints
+
+Revision ID: e2a7c5b9d614
+Revises: c4f19a7e2d80
+Create Date: 2026-10-18 10:04:51.226173
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c5b9d614'
+down_revision: Union[str, None] = 'c4f19a7e2d80'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ingestion_checkpoints', sa.Column('completed', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingestion_checkpoints', 'completed')
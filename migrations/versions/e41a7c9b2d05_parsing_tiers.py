@@ -0,0 +1,36 @@
+"""parsing tiers
+
+Revision ID: e41a7c9b2d05
+Revises: c7d2e8f41b90
+Create Date: 2026-10-17 16:21:37.880145
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a7c9b2d05'
+down_revision: Union[str, None] = 'c7d2e8f41b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+parsing_tier = postgresql.ENUM('FAST', 'HI_RES', 'AUTO', name='parsing_tier', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    parsing_tier.create(op.get_bind(), checkfirst=True)
+    op.add_column('knowledge_bases', sa.Column('parsing_tier', parsing_tier, server_default='AUTO', nullable=False))
+    op.add_column('knowledge_base_documents', sa.Column('parsing_tier', parsing_tier, nullable=True))
+    op.add_column('knowledge_base_documents', sa.Column('parse_seconds', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('knowledge_base_documents', 'parse_seconds')
+    op.drop_column('knowledge_base_documents', 'parsing_tier')
+    op.drop_column('knowledge_bases', 'parsing_tier')
+    parsing_tier.drop(op.get_bind(), checkfirst=True)
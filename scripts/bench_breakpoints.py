@@ -0,0 +1,97 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+from langchain_experimental.text_splitter import calculate_cosine_distances
+from app.processor.parent_document_retriever import (
+    adjacent_cosine_distances,
+    breakpoint_groups,
+)
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def list_breakpoints(window_embeddings: np.ndarray, percentile: float):
+    # the previous path: a dict per sentence, langchain's pairwise loop and a
+    # python scan over the distances
+    sentences = [
+        {"combined_sentence_embedding": embedding}
+        for embedding in window_embeddings.tolist()
+    ]
+    distances, sentences = calculate_cosine_distances(sentences)
+    threshold = np.percentile(distances, percentile)
+    indices_above_thresh = [i for i, x in enumerate(distances) if x > threshold]
+
+    groups = []
+    start_index = 0
+    for index in indices_above_thresh:
+        groups.append((start_index, index + 1))
+        start_index = index + 1
+    if start_index < len(sentences):
+        groups.append((start_index, len(sentences)))
+    return groups
+
+
+def numpy_breakpoints(window_embeddings: np.ndarray, percentile: float):
+    distances = adjacent_cosine_distances(window_embeddings)
+    threshold = np.percentile(distances, percentile)
+    return breakpoint_groups(
+        breakpoint_array=distances, threshold=threshold, total=len(window_embeddings)
+    )
+
+
+def best_of(rounds: int, fn, *args):
+    timings = []
+    result = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(sentences: int, dimension: int, rounds: int, percentile: float):
+    rng = np.random.default_rng(0)
+    # a random walk keeps neighbouring windows similar, like real prose
+    steps = rng.standard_normal((sentences, dimension)).astype(np.float32)
+    window_embeddings = np.cumsum(steps, axis=0)
+    window_embeddings /= np.linalg.norm(window_embeddings, axis=1, keepdims=True)
+
+    list_seconds, list_groups = best_of(
+        rounds, list_breakpoints, window_embeddings, percentile
+    )
+    numpy_seconds, numpy_groups = best_of(
+        rounds, numpy_breakpoints, window_embeddings, percentile
+    )
+
+    if list_groups != numpy_groups:
+        logger.warning(
+            f"group boundaries differ: {len(list_groups)} vs {len(numpy_groups)} groups"
+        )
+    logger.info(
+        f"{sentences} sentences at dimension {dimension}: list path "
+        f"{list_seconds * 1000:.1f}ms, numpy path {numpy_seconds * 1000:.1f}ms, "
+        f"{list_seconds / numpy_seconds:.1f}x faster, {len(numpy_groups)} groups"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="compare sentence distance and breakpoint computation paths"
+    )
+    parser.add_argument("--sentences", type=int, default=10_000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--percentile", type=float, default=85.0)
+    args = parser.parse_args()
+
+    main(
+        sentences=args.sentences,
+        dimension=args.dimension,
+        rounds=args.rounds,
+        percentile=args.percentile,
+    )
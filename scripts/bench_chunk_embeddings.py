@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import logging
+import time
+
+from app.constants.models import LOCAL_EMBEDDINGS_MODEL
+from app.dao.schema import ParsingTierEnum
+from app.embeddings.local import LocalEmbeddings, local_embedding_config
+from app.embeddings.metered import MeteredEmbeddings
+from app.core.metrics import FileMetrics, current_file_metrics
+from app.processor.loaders import DocumentLoaderFactory
+from app.processor.parent_document_retriever import ParentDocumentRetriever
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def main(file_path: str, model_name: str, rounds: int):
+    loader = DocumentLoaderFactory.create_loader(
+        file_path=file_path, parsing_tier=ParsingTierEnum.FAST
+    )
+    if loader is None:
+        raise RuntimeError(f"no loader available for {file_path}")
+
+    started = time.perf_counter()
+    documents = await asyncio.to_thread(loader.load)
+    logger.info(
+        f"loaded {len(documents)} documents in {time.perf_counter() - started:.2f}s"
+    )
+
+    local_embeddings = LocalEmbeddings(
+        config=local_embedding_config(model_name=model_name)
+    )
+    chunker = ParentDocumentRetriever(
+        embeddings=MeteredEmbeddings(
+            embeddings=local_embeddings,
+            model=model_name,
+            stage="chunk_embeddings",
+        )
+    )
+
+    try:
+        for i in range(rounds):
+            metrics = FileMetrics(kb_doc_id=0)
+            token = current_file_metrics.set(metrics)
+            try:
+                started = time.perf_counter()
+                chunked_docs = await chunker.atransform_documents(documents=documents)
+                elapsed = time.perf_counter() - started
+            finally:
+                current_file_metrics.reset(token)
+
+            child_chunks = sum(len(doc["child_doc"]) for doc in chunked_docs)
+            stages = {k: round(v, 3) for k, v in metrics.stage_seconds.items()}
+            logger.info(
+                f"round {i + 1}: {len(chunked_docs)} parent and {child_chunks} child "
+                f"chunks in {elapsed:.2f}s, stages {stages}, "
+                f"tokens {metrics.embedding_tokens}"
+            )
+    finally:
+        chunker.close()
+        local_embeddings.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="chunk a local file with the local embedding backend, no network needed"
+    )
+    parser.add_argument(
+        "file_path", help="path of a pdf, docx, txt or other supported file"
+    )
+    parser.add_argument("--model", default=LOCAL_EMBEDDINGS_MODEL)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(file_path=args.file_path, model_name=args.model, rounds=args.rounds)
+    )
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import SessionLocal, engine
+from app.dao.ingestion_dao import bulk_create_parent_chunks, create_parent_chunk
+from app.embeddings.cache import content_hash
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def orm_insert(db: AsyncSession, document_id: int, chunks: List[str]):
+    parent_doc_objects = []
+    for chunk in chunks:
+        parent_doc_obj = await create_parent_chunk(
+            db=db, document_id=document_id, chunk=chunk
+        )
+        db.add(parent_doc_obj)
+        parent_doc_objects.append(parent_doc_obj)
+
+    await db.flush(parent_doc_objects)
+    return [obj.id for obj in parent_doc_objects]
+
+
+async def bulk_insert(db: AsyncSession, document_id: int, chunks: List[str]):
+    return await bulk_create_parent_chunks(
+        db=db,
+        document_id=document_id,
+        kb_doc_id=None,
+        chunks=chunks,
+        content_hashes=[content_hash(chunk) for chunk in chunks],
+    )
+
+
+async def measure(
+    name: str,
+    insert_fn: Callable[[AsyncSession, int, List[str]], Awaitable[List[int]]],
+    document_id: int,
+    chunks: List[str],
+    rounds: int,
+) -> float:
+    timings = []
+    for _ in range(rounds):
+        # every round is rolled back so the benchmark leaves no rows behind
+        async with SessionLocal() as db:
+            started = time.perf_counter()
+            ids = await insert_fn(db, document_id, chunks)
+            timings.append(time.perf_counter() - started)
+            await db.rollback()
+
+        if len(ids) != len(chunks) or ids != sorted(ids):
+            raise RuntimeError(f"{name} returned ids out of order")
+
+    median = statistics.median(timings)
+    logger.info(
+        f"{name}: {len(chunks)} chunks, median {median * 1000:.1f} ms, "
+        f"min {min(timings) * 1000:.1f} ms over {rounds} rounds"
+    )
+    return median
+
+
+async def main(document_id: int, chunk_count: int, chunk_chars: int, rounds: int):
+    chunks = [f"{i:08d} " + "x" * chunk_chars for i in range(chunk_count)]
+
+    orm = await measure("orm flush", orm_insert, document_id, chunks, rounds)
+    bulk = await measure("insert returning", bulk_insert, document_id, chunks, rounds)
+
+    logger.info(f"bulk insert speedup: {orm / bulk:.2f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="compare ORM flush against bulk INSERT ... RETURNING for parent chunks"
+    )
+    parser.add_argument(
+        "--document-id",
+        type=int,
+        required=True,
+        help="id of an existing documents_registry row",
+    )
+    parser.add_argument("--chunks", type=int, default=800)
+    parser.add_argument("--chunk-chars", type=int, default=4000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            document_id=args.document_id,
+            chunk_count=args.chunks,
+            chunk_chars=args.chunk_chars,
+            rounds=args.rounds,
+        )
+    )
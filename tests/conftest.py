@@ -0,0 +1,6 @@
+import os
+
+# settings are read at import time, the example env file leaves these invalid
+os.environ.setdefault("FIRST_ADMIN", "admin@example.com")
+os.environ.setdefault("EMAILS_FROM_EMAIL", "noreply@example.com")
+os.environ.setdefault("AWS_PRESIGNED_URL_EXP", "3600")
@@ -0,0 +1,378 @@
+import copy
+import hashlib
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.dao.models import FileForIngestion
+from app.dao.schema import ChunkFingerprint
+from app.milvus.batch_writer import MilvusBatchWriter
+from app.milvus.client import MilvusOps
+from app.processor import ingest_data
+from app.processor.ingest_data import IngestData
+
+DIMENSION = 8
+COLLECTION = "collection"
+
+DAO_FUNCTIONS = (
+    "bulk_create_chunk_fingerprints",
+    "bulk_create_parent_chunks",
+    "confirm_parent_chunks",
+    "delete_parent_chunks_by_ids",
+    "delete_parent_chunks_for_kb_docs",
+    "find_fingerprints_sharing_bands",
+    "get_completed_kb_doc_ids",
+    "get_confirmed_hash_counts",
+    "get_ingestion_checkpoint",
+    "get_orphaned_duplicates",
+    "get_parent_chunk_hashes",
+    "get_parent_chunk_ids_for_kb_docs",
+    "get_unconfirmed_parent_ids",
+    "promote_chunk_fingerprints",
+    "record_document_parsing",
+    "repoint_chunk_fingerprints",
+    "save_ingestion_checkpoint",
+)
+
+
+class FakeSession:
+    # postgres is transactional, milvus is not: a rollback only undoes the store
+    def __init__(self, store: "FakeIngestionStore"):
+        self.store = store
+        self.commits = 0
+        self._snapshot = copy.deepcopy(store.state)
+
+    async def commit(self):
+        self.commits += 1
+        self._snapshot = copy.deepcopy(self.store.state)
+
+    async def rollback(self):
+        self.store.state = copy.deepcopy(self._snapshot)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeIngestionStore:
+    def __init__(self):
+        self.state: Dict[str, Any] = {
+            "next_id": 1,
+            "parents": {},
+            "fingerprints": {},
+            "checkpoints": {},
+            "parsing": {},
+        }
+
+    def _next_id(self) -> int:
+        value = self.state["next_id"]
+        self.state["next_id"] += 1
+        return value
+
+    @property
+    def parents(self) -> Dict[int, dict]:
+        return self.state["parents"]
+
+    @property
+    def fingerprints(self) -> Dict[int, dict]:
+        return self.state["fingerprints"]
+
+    @property
+    def checkpoints(self) -> Dict[tuple, dict]:
+        return self.state["checkpoints"]
+
+    def install(self, monkeypatch):
+        for name in DAO_FUNCTIONS:
+            monkeypatch.setattr(ingest_data, name, getattr(self, name))
+        monkeypatch.setattr(ingest_data, "SessionLocal", lambda: FakeSession(self))
+
+    async def get_parent_chunk_hashes(self, *, db, kb_doc_id):
+        return [
+            (parent_id, parent["content_hash"])
+            for parent_id, parent in sorted(self.parents.items())
+            if parent["kb_doc_id"] == kb_doc_id
+        ]
+
+    async def bulk_create_parent_chunks(
+        self,
+        *,
+        db,
+        document_id,
+        kb_doc_id,
+        chunks,
+        content_hashes,
+        ingestion_job_id=None,
+    ):
+        ids = []
+        for chunk, content_hash in zip(chunks, content_hashes):
+            parent_id = self._next_id()
+            self.parents[parent_id] = {
+                "document_id": document_id,
+                "kb_doc_id": kb_doc_id,
+                "chunk": chunk,
+                "content_hash": content_hash,
+                "ingestion_job_id": ingestion_job_id,
+            }
+            ids.append(parent_id)
+        return ids
+
+    async def confirm_parent_chunks(self, *, db, parent_ids, ingestion_job_id):
+        for parent_id in parent_ids:
+            self.parents[parent_id]["ingestion_job_id"] = ingestion_job_id
+
+    async def get_confirmed_hash_counts(self, *, db, kb_doc_id, ingestion_job_id):
+        counts: Dict[Optional[str], int] = {}
+        for parent in self.parents.values():
+            if (
+                parent["kb_doc_id"] == kb_doc_id
+                and parent["ingestion_job_id"] == ingestion_job_id
+            ):
+                counts[parent["content_hash"]] = (
+                    counts.get(parent["content_hash"], 0) + 1
+                )
+        return counts
+
+    async def get_unconfirmed_parent_ids(self, *, db, kb_doc_id, ingestion_job_id):
+        return [
+            parent_id
+            for parent_id, parent in sorted(self.parents.items())
+            if parent["kb_doc_id"] == kb_doc_id
+            and parent["ingestion_job_id"] != ingestion_job_id
+        ]
+
+    async def delete_parent_chunks_by_ids(self, *, db, parent_ids):
+        removed = set(parent_ids)
+        for parent_id in removed:
+            self.parents.pop(parent_id, None)
+        for fingerprint_id, fingerprint in list(self.fingerprints.items()):
+            if fingerprint["parent_id"] in removed:
+                del self.fingerprints[fingerprint_id]
+
+    async def get_parent_chunk_ids_for_kb_docs(self, *, db, kb_doc_ids, document_ids):
+        return [
+            parent_id
+            for parent_id, parent in sorted(self.parents.items())
+            if parent["kb_doc_id"] in kb_doc_ids
+        ]
+
+    async def delete_parent_chunks_for_kb_docs(self, *, db, kb_doc_ids, document_ids):
+        parent_ids = await self.get_parent_chunk_ids_for_kb_docs(
+            db=db, kb_doc_ids=kb_doc_ids, document_ids=document_ids
+        )
+        await self.delete_parent_chunks_by_ids(db=db, parent_ids=parent_ids)
+        return len(parent_ids)
+
+    async def record_document_parsing(
+        self, *, db, kb_doc_id, parsing_tier, parse_seconds
+    ):
+        self.state["parsing"][kb_doc_id] = parsing_tier
+
+    async def get_ingestion_checkpoint(self, *, db, ingestion_job_id, kb_doc_id):
+        checkpoint = self.checkpoints.get((ingestion_job_id, kb_doc_id))
+        return SimpleNamespace(**checkpoint) if checkpoint is not None else None
+
+    async def save_ingestion_checkpoint(
+        self, *, db, ingestion_job_id, kb_doc_id, completed=False, **progress
+    ):
+        self.checkpoints[(ingestion_job_id, kb_doc_id)] = dict(
+            progress, completed=completed
+        )
+
+    async def get_completed_kb_doc_ids(self, *, db, ingestion_job_id):
+        return [
+            kb_doc_id
+            for (job_id, kb_doc_id), checkpoint in self.checkpoints.items()
+            if job_id == ingestion_job_id and checkpoint["completed"]
+        ]
+
+    async def bulk_create_chunk_fingerprints(self, *, db, fingerprints):
+        for fingerprint in fingerprints:
+            self.fingerprints[self._next_id()] = dict(fingerprint)
+
+    async def find_fingerprints_sharing_bands(self, *, db, kb_id, bands):
+        wanted = set(bands)
+        return [
+            (fingerprint["chunk_id"], fingerprint["simhash"])
+            for fingerprint in self.fingerprints.values()
+            if fingerprint["kb_id"] == kb_id
+            and fingerprint["duplicate_of"] is None
+            and wanted.intersection(fingerprint["bands"])
+        ]
+
+    async def get_orphaned_duplicates(self, *, db, removed_parent_ids):
+        removed = set(removed_parent_ids)
+        removed_chunk_ids = {
+            fingerprint["chunk_id"]
+            for fingerprint in self.fingerprints.values()
+            if fingerprint["parent_id"] in removed
+            and fingerprint["duplicate_of"] is None
+        }
+        return [
+            (
+                ChunkFingerprint(id=fingerprint_id, **fingerprint),
+                make_file(self.parents[fingerprint["parent_id"]]["kb_doc_id"]),
+            )
+            for fingerprint_id, fingerprint in sorted(self.fingerprints.items())
+            if fingerprint["duplicate_of"] in removed_chunk_ids
+            and fingerprint["parent_id"] not in removed
+        ]
+
+    async def promote_chunk_fingerprints(self, *, db, fingerprint_ids):
+        for fingerprint_id in fingerprint_ids:
+            self.fingerprints[fingerprint_id].update(duplicate_of=None, content=None)
+
+    async def repoint_chunk_fingerprints(self, *, db, fingerprint_ids, duplicate_of):
+        for fingerprint_id in fingerprint_ids:
+            self.fingerprints[fingerprint_id]["duplicate_of"] = duplicate_of
+
+
+class FakeMilvusClient:
+    FILTER_PATTERN = re.compile(r"file_id == (\d+) and parent_id in \[([\d, ]*)\]")
+    FILES_PATTERN = re.compile(r"file_id in \[([\d, ]*)\]")
+
+    def __init__(self):
+        self.rows: Dict[str, dict] = {}
+
+    def upsert(self, collection_name: str, data: List[dict]):
+        for row in data:
+            self.rows[row["id"]] = row
+
+    def delete(self, collection_name: str, filter: str):
+        files = self.FILES_PATTERN.fullmatch(filter)
+        if files is not None:
+            file_ids = {int(value) for value in files.group(1).split(",") if value}
+            self.rows = {
+                row_id: row
+                for row_id, row in self.rows.items()
+                if row["file_id"] not in file_ids
+            }
+            return
+        match = self.FILTER_PATTERN.fullmatch(filter)
+        file_id = int(match.group(1))
+        parent_ids = {int(value) for value in match.group(2).split(",") if value}
+        self.rows = {
+            row_id: row
+            for row_id, row in self.rows.items()
+            if not (row["file_id"] == file_id and row["parent_id"] in parent_ids)
+        }
+
+    def texts(self, file_id: int) -> List[str]:
+        return sorted(
+            row["text_content"]
+            for row in self.rows.values()
+            if row["file_id"] == file_id
+        )
+
+
+def _vector(text: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(DIMENSION)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def chunk_paragraph(paragraph: str) -> dict:
+    return {
+        "parent_doc": Document(page_content=paragraph),
+        "child_doc": [
+            Document(page_content=sentence.strip())
+            for sentence in paragraph.split(". ")
+            if sentence.strip()
+        ],
+    }
+
+
+class FakeChunkStream:
+    # stands in for download, parse and chunk: every paragraph is one document and
+    # one parent, every sentence a child
+    def __init__(self, paragraphs: List[str], batch_size: int = 1):
+        self.paragraphs = paragraphs
+        self.batch_size = batch_size
+        self.skipped: List[int] = []
+        self.files: List[int] = []
+        self.fail_after_batches: Optional[int] = None
+
+    async def __call__(
+        self,
+        file,
+        parsing_tier,
+        chunking_strategy,
+        parsed,
+        prefetcher=None,
+        prefetch_position=None,
+        skip_documents=0,
+    ):
+        self.skipped.append(skip_documents)
+        self.files.append(file.kb_doc_id)
+        parsed.pages += skip_documents
+        batches = 0
+        for start in range(skip_documents, len(self.paragraphs), self.batch_size):
+            if (
+                self.fail_after_batches is not None
+                and batches >= self.fail_after_batches
+            ):
+                raise RuntimeError("worker died")
+            batch = self.paragraphs[start : start + self.batch_size]
+            parsed.pages += len(batch)
+            batches += 1
+            yield len(batch), [chunk_paragraph(paragraph) for paragraph in batch]
+
+
+def make_ingest(milvus_client: FakeMilvusClient) -> IngestData:
+    ingest = IngestData.__new__(IngestData)
+    milvus_ops = MilvusOps.__new__(MilvusOps)
+    milvus_ops.client = milvus_client
+    ingest.milvus_ops = milvus_ops
+    ingest.milvus_writer = MilvusBatchWriter(milvus_ops=milvus_ops)
+    # different models, so every child is embedded by the fake below
+    ingest.embedding_provider = SimpleNamespace(model="child-model")
+    ingest.chunk_embedding_provider = SimpleNamespace(model="chunk-model")
+    ingest.child_embeddings = {DIMENSION: None}
+    ingest.embedded: List[str] = []
+
+    async def get_concurrent_embeddings(documents, embedding_model, dimension):
+        texts = [doc.page_content for doc in documents]
+        ingest.embedded.extend(texts)
+        if not texts:
+            return np.empty((0, dimension), dtype=np.float32)
+        return np.stack([_vector(text) for text in texts])
+
+    ingest._get_concurrent_embeddings = get_concurrent_embeddings
+    return ingest
+
+
+def make_file(kb_doc_id: int = 1) -> FileForIngestion:
+    return FileForIngestion(
+        kb_doc_id=kb_doc_id,
+        doc_id=kb_doc_id,
+        file_name=f"doc-{kb_doc_id}.txt",
+        object_key=f"objects/doc-{kb_doc_id}.txt",
+    )
+
+
+async def ingest_file(
+    ingest: IngestData,
+    store: FakeIngestionStore,
+    stream: FakeChunkStream,
+    ingestion_job_id: int,
+    file: Optional[FileForIngestion] = None,
+    deduplicate_chunks: bool = False,
+) -> FakeSession:
+    ingest._stream_chunked_docs = stream
+    db = FakeSession(store)
+    await ingest._upsert_into_milvus(
+        file=file or make_file(),
+        user_id=1,
+        category="general",
+        collection_name=COLLECTION,
+        db=db,
+        ingestion_job_id=ingestion_job_id,
+        dimension=DIMENSION,
+        kb_id=1,
+        deduplicate_chunks=deduplicate_chunks,
+    )
+    return db
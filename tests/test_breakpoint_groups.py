@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from langchain_experimental.text_splitter import calculate_cosine_distances
+
+from app.processor.parent_document_retriever import (
+    BreakPointThresholdTypeEnum,
+    ParentDocumentRetriever,
+    adjacent_cosine_distances,
+    breakpoint_groups,
+)
+
+AMOUNTS = {
+    BreakPointThresholdTypeEnum.PERCENTILE: 85.0,
+    BreakPointThresholdTypeEnum.STANDARD_DEVIATION: 1.0,
+    BreakPointThresholdTypeEnum.INTERQUARTILE: 1.5,
+    BreakPointThresholdTypeEnum.GRADIENT: 90.0,
+}
+
+
+def _window_embeddings(sentences: int, seed: int) -> np.ndarray:
+    # a random walk keeps neighbouring windows similar, like real prose
+    rng = np.random.default_rng(seed)
+    walk = np.cumsum(rng.standard_normal((sentences, 16)), axis=0)
+    return walk / np.linalg.norm(walk, axis=1, keepdims=True)
+
+
+def _langchain_groups(window_embeddings, threshold_type, amount):
+    # langchain's pairwise distances and the list scan SemanticChunker.split_text
+    # runs over them. the threshold comes from the chunker itself, its
+    # interquartile fence starts at q3 where langchain starts at the mean
+    chunker = ParentDocumentRetriever.__new__(ParentDocumentRetriever)
+    distances, sentences = calculate_cosine_distances(
+        [
+            {"combined_sentence_embedding": embedding}
+            for embedding in window_embeddings.tolist()
+        ]
+    )
+    threshold, breakpoint_array = chunker._calculate_breakpoint_threshold(
+        distances=np.asarray(distances),
+        breakpoint_threshold_type=threshold_type,
+        breakpoint_threshold_amount=amount,
+    )
+    groups = []
+    start_index = 0
+    for index in [i for i, x in enumerate(breakpoint_array) if x > threshold]:
+        groups.append((start_index, index + 1))
+        start_index = index + 1
+    if start_index < len(sentences):
+        groups.append((start_index, len(sentences)))
+    return groups
+
+
+def test_adjacent_distances_match_langchain():
+    window_embeddings = _window_embeddings(50, seed=0)
+    distances, _ = calculate_cosine_distances(
+        [
+            {"combined_sentence_embedding": embedding}
+            for embedding in window_embeddings.tolist()
+        ]
+    )
+    np.testing.assert_allclose(
+        adjacent_cosine_distances(window_embeddings), distances, atol=1e-9
+    )
+
+
+@pytest.mark.parametrize("threshold_type", list(AMOUNTS))
+@pytest.mark.parametrize("seed", range(5))
+def test_groups_match_langchain(threshold_type, seed):
+    window_embeddings = _window_embeddings(200, seed=seed)
+    chunker = ParentDocumentRetriever.__new__(ParentDocumentRetriever)
+
+    groups = chunker._breakpoint_groups(
+        window_embeddings=window_embeddings,
+        breakpoint_threshold_type=threshold_type,
+        breakpoint_threshold_amount=AMOUNTS[threshold_type],
+    )
+
+    assert groups == _langchain_groups(
+        window_embeddings, threshold_type, AMOUNTS[threshold_type]
+    )
+
+
+@pytest.mark.parametrize(
+    "distances, expected",
+    [
+        # no breakpoint keeps everything in one group
+        ([0.1, 0.1, 0.1], [(0, 4)]),
+        # a breakpoint after the second to last sentence leaves a single tail
+        ([0.1, 0.1, 0.9], [(0, 3), (3, 4)]),
+        ([0.9, 0.1, 0.9], [(0, 1), (1, 3), (3, 4)]),
+    ],
+)
+def test_group_edges(distances, expected):
+    assert breakpoint_groups(np.asarray(distances), threshold=0.5, total=4) == expected
+
+
+def test_groups_cover_every_sentence_once():
+    groups = breakpoint_groups(
+        adjacent_cosine_distances(_window_embeddings(100, seed=1)),
+        threshold=0.05,
+        total=100,
+    )
+    assert groups[0][0] == 0 and groups[-1][1] == 100
+    assert all(end == start for (_, end), (start, _) in zip(groups, groups[1:]))
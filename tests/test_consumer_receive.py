@@ -0,0 +1,49 @@
+from app.constants.globals import (
+    SQS_BUSY_WAIT_SECONDS,
+    SQS_MAX_RECEIVE_BATCH,
+    SQS_MAX_WAIT_SECONDS,
+)
+from app.consumer.consumer_manager import ConsumerManager
+
+
+def _manager(max_in_flight: int, in_flight: int = 0) -> ConsumerManager:
+    manager = ConsumerManager.__new__(ConsumerManager)
+    manager.max_in_flight = max_in_flight
+    manager._in_flight = {object(): 0.0 for _ in range(in_flight)}
+    manager.receive_batch_size = min(SQS_MAX_RECEIVE_BATCH, max_in_flight)
+    manager.receive_wait_seconds = SQS_MAX_WAIT_SECONDS
+    return manager
+
+
+def test_batch_never_exceeds_the_free_slots():
+    manager = _manager(max_in_flight=4, in_flight=3)
+    manager._plan_receive(received=None)
+    assert manager.receive_batch_size == 1
+
+    manager = _manager(max_in_flight=50, in_flight=2)
+    manager._plan_receive(received=None)
+    assert manager.receive_batch_size == SQS_MAX_RECEIVE_BATCH
+
+
+def test_first_poll_keeps_the_long_wait():
+    manager = _manager(max_in_flight=4)
+    manager._plan_receive(received=None)
+    assert manager.receive_wait_seconds == SQS_MAX_WAIT_SECONDS
+
+
+def test_busy_queue_polls_short_and_empty_polls_back_off():
+    manager = _manager(max_in_flight=4)
+    manager._plan_receive(received=2)
+    assert manager.receive_wait_seconds == SQS_BUSY_WAIT_SECONDS
+
+    waits = []
+    for _ in range(10):
+        manager._plan_receive(received=0)
+        waits.append(manager.receive_wait_seconds)
+
+    assert waits == sorted(waits)
+    assert waits[0] == min(SQS_MAX_WAIT_SECONDS, SQS_BUSY_WAIT_SECONDS * 2)
+    assert waits[-1] == SQS_MAX_WAIT_SECONDS
+
+    manager._plan_receive(received=1)
+    assert manager.receive_wait_seconds == SQS_BUSY_WAIT_SECONDS
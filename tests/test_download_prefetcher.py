@@ -0,0 +1,142 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.metrics import measure_stage
+from app.processor import ingest_data
+from app.processor.downloader import DownloadPrefetcher
+from app.processor.ingest_data import (
+    CHUNK_EMBEDDINGS_STAGE,
+    IngestData,
+    ParsedFile,
+)
+from tests.fakes import (
+    COLLECTION,
+    DIMENSION,
+    FakeChunkStream,
+    FakeIngestionStore,
+    FakeMilvusClient,
+    FakeSession,
+    make_file,
+    make_ingest,
+)
+
+
+class FakeDownloader:
+    def __init__(self):
+        self.downloads = []
+
+    async def object_size(self, object_key):
+        return 10
+
+    @asynccontextmanager
+    async def download(self, object_key, size):
+        downloaded = SimpleNamespace(
+            object_key=object_key, size=size, download_seconds=0.0, closed=False
+        )
+        self.downloads.append(downloaded)
+        try:
+            yield downloaded
+        finally:
+            downloaded.closed = True
+
+
+async def test_files_sharing_an_object_key_each_get_an_open_copy():
+    downloader = FakeDownloader()
+    prefetcher = DownloadPrefetcher(
+        downloader=downloader, object_keys=["a.pdf", "b.pdf", "a.pdf"]
+    )
+
+    async with prefetcher:
+        async with prefetcher.get(prefetcher.claim("a.pdf")) as first:
+            assert not first.closed
+        # the first consumer is done and its copy is released
+        await asyncio.sleep(0)
+        assert first.closed
+
+        async with prefetcher.get(prefetcher.claim("a.pdf")) as second:
+            assert second is not first
+            assert not second.closed
+
+        async with prefetcher.get(prefetcher.claim("b.pdf")) as other:
+            assert other.object_key == "b.pdf"
+
+    assert len(downloader.downloads) == 3
+    assert prefetcher.stats.files == 3
+
+
+class PrefetchedChunkStream(FakeChunkStream):
+    async def __call__(
+        self, file, *args, prefetcher=None, prefetch_position=None, **kwargs
+    ):
+        async with prefetcher.get(position=prefetch_position):
+            async for batch in super().__call__(file, *args, **kwargs):
+                yield batch
+
+
+async def test_a_file_failing_before_its_download_gives_its_budget_back(monkeypatch):
+    store = FakeIngestionStore()
+    store.install(monkeypatch)
+    get_parent_chunk_hashes = store.get_parent_chunk_hashes
+
+    async def failing_parent_chunk_hashes(*, db, kb_doc_id):
+        if kb_doc_id == 1:
+            raise RuntimeError("database went away")
+        return await get_parent_chunk_hashes(db=db, kb_doc_id=kb_doc_id)
+
+    monkeypatch.setattr(
+        ingest_data, "get_parent_chunk_hashes", failing_parent_chunk_hashes
+    )
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+    ingest._stream_chunked_docs = PrefetchedChunkStream(["one sentence. another one"])
+    files = [make_file(1), make_file(2)]
+    # room for a single file, the second one is admitted once the first lets go
+    prefetcher = DownloadPrefetcher(
+        downloader=FakeDownloader(),
+        object_keys=[file.object_key for file in files],
+        max_bytes_in_flight=10,
+    )
+
+    async def upsert(file):
+        await ingest._upsert_into_milvus(
+            file=file,
+            user_id=1,
+            category="general",
+            collection_name=COLLECTION,
+            db=FakeSession(store),
+            ingestion_job_id=1,
+            dimension=DIMENSION,
+            kb_id=1,
+            prefetcher=prefetcher,
+        )
+
+    async with prefetcher:
+        with pytest.raises(RuntimeError):
+            await upsert(files[0])
+        await asyncio.wait_for(upsert(files[1]), timeout=1)
+
+    assert milvus.texts(2) == ["another one", "one sentence"]
+    assert prefetcher.budget.used_bytes == 0
+
+
+class EmbeddingChunker:
+    # a semantic chunker spends most of its time waiting on embedding requests
+    async def atransform_documents(self, documents):
+        with measure_stage(CHUNK_EMBEDDINGS_STAGE):
+            await asyncio.sleep(0.2)
+        return [{"parent_doc": document} for document in documents]
+
+
+async def test_chunking_cpu_time_leaves_out_embedding_waits():
+    ingest = IngestData.__new__(IngestData)
+    parsed = ParsedFile()
+
+    chunked = await ingest._chunk_batch(
+        chunker=EmbeddingChunker(), documents=["page"], parsed=parsed
+    )
+
+    assert chunked == [{"parent_doc": "page"}]
+    assert 0 <= parsed.cpu_seconds < 0.1
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from app.embeddings import cache as cache_module
+from app.embeddings.cache import EmbeddingCache, content_hash
+
+
+class FakeSession:
+    async def commit(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def persistent(monkeypatch):
+    rows = {}
+
+    async def get_cached_embeddings(*, db, model, dimension, content_hashes):
+        return {
+            key: rows[(model, dimension, key)]
+            for key in content_hashes
+            if (model, dimension, key) in rows
+        }
+
+    async def store_embeddings(*, db, model, dimension, entries):
+        for key, blob in entries.items():
+            rows[(model, dimension, key)] = blob
+
+    monkeypatch.setattr(cache_module, "SessionLocal", FakeSession)
+    monkeypatch.setattr(cache_module, "get_cached_embeddings", get_cached_embeddings)
+    monkeypatch.setattr(cache_module, "store_embeddings", store_embeddings)
+    return rows
+
+
+class Embedder:
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] * self.dimension for text in texts]
+
+
+async def test_duplicates_are_embedded_once_and_returned_in_order(persistent):
+    cache = EmbeddingCache(model="model-a")
+    embed = Embedder(dimension=4)
+
+    embeddings = await cache.aembed_documents(
+        texts=["a", "bbb", "a"], dimension=4, embed_missing=embed
+    )
+
+    assert embed.calls == [["a", "bbb"]]
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (3, 4)
+    assert embeddings[:, 0].tolist() == [1.0, 3.0, 1.0]
+    assert cache.misses == 3
+
+
+async def test_entries_are_keyed_by_model_dimension_and_content(persistent):
+    cache = EmbeddingCache(model="model-a")
+
+    await cache.aembed_documents(texts=["text"], dimension=4, embed_missing=Embedder(4))
+    shorter = Embedder(2)
+    other_model = Embedder(4)
+    assert (
+        await cache.aembed_documents(texts=["text"], dimension=2, embed_missing=shorter)
+    ).shape == (1, 2)
+    await cache.aembed_documents(
+        texts=["text"], dimension=4, embed_missing=other_model, model="model-b"
+    )
+
+    assert shorter.calls == [["text"]]
+    assert other_model.calls == [["text"]]
+    assert set(persistent) == {
+        ("model-a", 4, content_hash("text")),
+        ("model-a", 2, content_hash("text")),
+        ("model-b", 4, content_hash("text")),
+    }
+
+
+async def test_hits_come_from_memory_then_from_the_table(persistent):
+    embed = Embedder(4)
+    await EmbeddingCache(model="model-a").aembed_documents(
+        texts=["text"], dimension=4, embed_missing=embed
+    )
+
+    # a fresh process has an empty memory tier but shares the table
+    cache = EmbeddingCache(model="model-a")
+    await cache.aembed_documents(texts=["text"], dimension=4, embed_missing=embed)
+    await cache.aembed_documents(texts=["text"], dimension=4, embed_missing=embed)
+
+    assert len(embed.calls) == 1
+    assert cache.persistent_hits == 1
+    assert cache.memory_hits == 1
+    assert cache.stats().hit_ratio == 1.0
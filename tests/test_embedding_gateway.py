@@ -0,0 +1,178 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.embeddings import batcher as batcher_module
+from app.embeddings.batcher import TokenBudgetBatcher
+from app.embeddings.gateway import (
+    EmbeddingGateway,
+    EmbeddingPriority,
+    GatewayEmbeddings,
+)
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+def _rate_limit_error(retry_after_ms: int = 1) -> openai.RateLimitError:
+    response = httpx.Response(
+        429, headers={"retry-after-ms": str(retry_after_ms)}, request=REQUEST
+    )
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeEmbeddingsApi:
+    # stands in for client.embeddings.with_raw_response, every call takes the
+    # next outcome, an exception is raised and anything else is a success
+    def __init__(self, outcomes=()):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.with_raw_response = self
+
+    async def create(self, input, **params):
+        self.calls.append(list(input))
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, BaseException):
+            raise outcome
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text))])
+            for i, text in enumerate(input)
+        ]
+        response = SimpleNamespace(data=data, usage=SimpleNamespace(total_tokens=1))
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+
+def _gateway(outcomes=(), **kwargs) -> EmbeddingGateway:
+    kwargs.setdefault("requests_per_minute", 10_000)
+    kwargs.setdefault("tokens_per_minute", 1_000_000)
+    gateway = EmbeddingGateway(
+        settings=SimpleNamespace(OPENAI_KEY="test"),
+        reserved_interactive_slots=0,
+        **kwargs,
+    )
+    gateway.client = SimpleNamespace(embeddings=FakeEmbeddingsApi(outcomes))
+    return gateway
+
+
+async def test_success_grows_the_window_additively():
+    gateway = _gateway(initial_concurrency=4)
+
+    assert await gateway.aembed(["abc"], priority=EmbeddingPriority.BULK) == [[3.0]]
+    assert gateway.concurrency == pytest.approx(4.25)
+    assert gateway.in_flight == 0
+
+
+async def test_rate_limit_halves_the_window_and_retries():
+    gateway = _gateway([_rate_limit_error()], initial_concurrency=8)
+
+    assert await gateway.aembed(["ab"], priority=EmbeddingPriority.BULK) == [[2.0]]
+    # halved by the 429, then grown by the retry that went through
+    assert gateway.concurrency == pytest.approx(4.25)
+    assert len(gateway.client.embeddings.calls) == 2
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        openai.APITimeoutError(request=REQUEST),
+        openai.InternalServerError(
+            "bad gateway",
+            response=httpx.Response(502, request=REQUEST),
+            body=None,
+        ),
+    ],
+)
+async def test_other_failures_hold_the_window(error):
+    gateway = _gateway([error], initial_concurrency=4)
+
+    with pytest.raises(type(error)):
+        await gateway.aembed(["ab"], priority=EmbeddingPriority.BULK)
+    assert gateway.concurrency == 4
+    assert gateway.in_flight == 0
+
+
+async def test_interactive_requests_are_admitted_before_queued_bulk():
+    gateway = _gateway(initial_concurrency=1, max_concurrency=1)
+    await gateway._acquire(priority=EmbeddingPriority.BULK, tokens=1)
+    admitted = []
+
+    async def acquire(priority):
+        await gateway._acquire(priority=priority, tokens=1)
+        admitted.append(priority)
+
+    bulk = asyncio.create_task(acquire(EmbeddingPriority.BULK))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(acquire(EmbeddingPriority.INTERACTIVE))
+    await asyncio.sleep(0)
+    assert admitted == []
+
+    release = dict(reserved_tokens=1, used_tokens=1, headers=None, succeeded=True)
+    await gateway._release(rate_limited=False, **release)
+    await interactive
+    assert admitted == [EmbeddingPriority.INTERACTIVE]
+    assert not bulk.done()
+
+    await gateway._release(rate_limited=False, **release)
+    await bulk
+    assert admitted == [EmbeddingPriority.INTERACTIVE, EmbeddingPriority.BULK]
+
+
+async def test_synchronous_calls_are_admitted_through_the_gateway():
+    gateway = _gateway(initial_concurrency=4)
+    embeddings = GatewayEmbeddings(gateway, priority=EmbeddingPriority.BULK)
+
+    assert await asyncio.to_thread(embeddings.embed_documents, ["a", "bcd"]) == [
+        [1.0],
+        [3.0],
+    ]
+    assert gateway.client.embeddings.calls == [["a", "bcd"]]
+    # the request went through admission and release like an async one
+    assert gateway.concurrency == pytest.approx(4.25)
+
+    with pytest.raises(RuntimeError):
+        embeddings.embed_query("blocks the loop")
+
+
+class FlakyEmbeddings:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return [[0.0] for _ in texts]
+
+
+def _batcher(monkeypatch, embeddings) -> TokenBudgetBatcher:
+    # sub batches are retried after tokenisation, the encoding is not needed
+    monkeypatch.setattr(batcher_module, "get_encoding", lambda model: None)
+    return TokenBudgetBatcher(embeddings=embeddings, model="text-embedding-3-small")
+
+
+async def test_batcher_leaves_rate_limits_to_the_gateway(monkeypatch):
+    flaky = FlakyEmbeddings([_rate_limit_error()])
+    batcher = _batcher(monkeypatch, flaky)
+
+    with pytest.raises(openai.RateLimitError):
+        await batcher._embed_batch(["text"], index=0)
+    assert flaky.calls == 1
+
+
+async def test_batcher_retries_transient_network_errors(monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    flaky = FlakyEmbeddings([openai.APIConnectionError(request=REQUEST)])
+    batcher = _batcher(monkeypatch, flaky)
+
+    assert await batcher._embed_batch(["text"], index=0) == [[0.0]]
+    assert flaky.calls == 2
+
+
+_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay, *args, **kwargs):
+    await _sleep(0)
@@ -0,0 +1,204 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.dao.schema import OperationStatusEnum
+from app.processor import ingest_data, processor_manager
+from app.processor.processor_manager import ProcessorManager
+from tests.fakes import (
+    COLLECTION,
+    DIMENSION,
+    FakeChunkStream,
+    FakeIngestionStore,
+    FakeMilvusClient,
+    FakeSession,
+    chunk_paragraph,
+    ingest_file,
+    make_file,
+    make_ingest,
+)
+
+PARAGRAPHS = [
+    "alpha one. alpha two",
+    "beta one. beta two",
+    "gamma one. gamma two",
+    "delta one. delta two",
+]
+
+
+def _children(paragraphs):
+    return sorted(
+        doc.page_content
+        for paragraph in paragraphs
+        for doc in chunk_paragraph(paragraph)["child_doc"]
+    )
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeIngestionStore()
+    store.install(monkeypatch)
+    return store
+
+
+async def test_redelivery_resumes_after_the_last_committed_batch(store):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+
+    stream = FakeChunkStream(PARAGRAPHS)
+    stream.fail_after_batches = 2
+    with pytest.raises(RuntimeError):
+        await ingest_file(ingest, store, stream, ingestion_job_id=7)
+
+    checkpoint = store.checkpoints[(7, 1)]
+    assert checkpoint["documents_done"] == 2
+    assert not checkpoint["completed"]
+    assert milvus.texts(1) == _children(PARAGRAPHS[:2])
+
+    ingest.embedded.clear()
+    stream = FakeChunkStream(PARAGRAPHS)
+    await ingest_file(ingest, store, stream, ingestion_job_id=7)
+
+    assert stream.skipped == [2]
+    # nothing committed before the crash is embedded again
+    assert sorted(ingest.embedded) == _children(PARAGRAPHS[2:])
+    assert milvus.texts(1) == _children(PARAGRAPHS)
+    assert len(store.parents) == 4
+    assert store.checkpoints[(7, 1)]["completed"]
+    assert store.checkpoints[(7, 1)]["parent_chunks_done"] == 4
+
+
+async def test_a_batch_lost_in_the_crash_is_rolled_back_and_redone(store):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+
+    stream = FakeChunkStream(PARAGRAPHS, batch_size=2)
+    stream.fail_after_batches = 1
+    with pytest.raises(RuntimeError):
+        await ingest_file(ingest, store, stream, ingestion_job_id=3)
+
+    await ingest_file(ingest, store, FakeChunkStream(PARAGRAPHS, batch_size=2), 3)
+
+    assert len(store.parents) == 4
+    assert milvus.texts(1) == _children(PARAGRAPHS)
+
+
+async def test_repeated_parents_keep_their_occurrence_across_a_resume(store):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+    paragraphs = [PARAGRAPHS[0], PARAGRAPHS[1], PARAGRAPHS[0], PARAGRAPHS[2]]
+
+    stream = FakeChunkStream(paragraphs)
+    stream.fail_after_batches = 2
+    with pytest.raises(RuntimeError):
+        await ingest_file(ingest, store, stream, ingestion_job_id=1)
+    await ingest_file(ingest, store, FakeChunkStream(paragraphs), 1)
+
+    assert len(store.parents) == 4
+    assert len(milvus.rows) == 8
+
+
+async def test_removed_parents_are_deleted_after_a_resumed_reingestion(store):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+    await ingest_file(ingest, store, FakeChunkStream(PARAGRAPHS[:3]), 1)
+
+    updated = [PARAGRAPHS[0], PARAGRAPHS[3]]
+    stream = FakeChunkStream(updated)
+    stream.fail_after_batches = 1
+    with pytest.raises(RuntimeError):
+        await ingest_file(ingest, store, stream, ingestion_job_id=2)
+    # nothing is removed before the new version has been seen in full
+    assert milvus.texts(1) == _children(PARAGRAPHS[:3])
+
+    await ingest_file(ingest, store, FakeChunkStream(updated), 2)
+
+    assert milvus.texts(1) == _children(updated)
+    assert sorted(parent["chunk"] for parent in store.parents.values()) == sorted(
+        updated
+    )
+
+
+async def test_files_completed_by_an_earlier_delivery_are_skipped(store, monkeypatch):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+    await ingest_file(
+        ingest, store, FakeChunkStream(PARAGRAPHS[:1]), 9, file=make_file(1)
+    )
+
+    stream = FakeChunkStream(PARAGRAPHS[1:2])
+    ingest._stream_chunked_docs = stream
+    ingest.max_concurrency = 2
+    stats = SimpleNamespace(
+        files=0,
+        bytes_downloaded=0,
+        download_seconds=0.0,
+        network_wait_seconds=0.0,
+        cpu_seconds=0.0,
+    )
+    prefetched = []
+
+    class Prefetcher:
+        def __init__(self, object_keys):
+            prefetched.extend(object_keys)
+            self.stats = stats
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        def claim(self, object_key):
+            return prefetched.index(object_key)
+
+        def discard(self, position):
+            pass
+
+    ingest.downloader = SimpleNamespace(prefetch=Prefetcher)
+    monkeypatch.setattr(ingest_data, "SessionLocal", lambda: FakeSession(store))
+
+    results = await ingest.index_data(
+        files=[make_file(1), make_file(2)],
+        user_id=1,
+        category="general",
+        collection_name=COLLECTION,
+        ingestion_job_id=9,
+        dimension=DIMENSION,
+    )
+
+    assert sorted(results) == [
+        (1, OperationStatusEnum.SUCCESS),
+        (2, OperationStatusEnum.SUCCESS),
+    ]
+    assert stream.files == [2]
+    assert prefetched == [make_file(2).object_key]
+
+
+@pytest.mark.parametrize(
+    "status, cleared",
+    [
+        (OperationStatusEnum.SUCCESS, True),
+        (OperationStatusEnum.FAILED, True),
+        (OperationStatusEnum.PENDING, False),
+    ],
+)
+async def test_checkpoints_are_dropped_once_the_job_is_final(
+    monkeypatch, status, cleared
+):
+    deleted = []
+
+    async def delete_ingestion_checkpoints(*, db, ingestion_job_ids):
+        deleted.extend(ingestion_job_ids)
+
+    class Db:
+        async def execute(self, stmt):
+            pass
+
+    monkeypatch.setattr(
+        processor_manager, "delete_ingestion_checkpoints", delete_ingestion_checkpoints
+    )
+    manager = ProcessorManager.__new__(ProcessorManager)
+    await manager._set_ingestion_job_status(db=Db(), job_id=4, status=status)
+
+    assert deleted == ([4] if cleared else [])
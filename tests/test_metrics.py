@@ -0,0 +1,48 @@
+from prometheus_client import REGISTRY
+
+from app.core.metrics import FileMetrics, current_file_metrics, measure_stage
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_time_is_observed_once_per_file():
+    count = _sample("neurostash_ingestion_stage_seconds_count", stage="metrics_test")
+    total = _sample("neurostash_ingestion_stage_seconds_sum", stage="metrics_test")
+    metrics = FileMetrics(kb_doc_id=1)
+    token = current_file_metrics.set(metrics)
+    try:
+        for _ in range(3):
+            with measure_stage("metrics_test"):
+                pass
+        metrics.add_stage("metrics_test", 2.0)
+    finally:
+        current_file_metrics.reset(token)
+
+    # nothing reaches the histogram until the file finishes
+    assert (
+        _sample("neurostash_ingestion_stage_seconds_count", stage="metrics_test")
+        == count
+    )
+
+    metrics.finish(status="success", seconds=3.0)
+
+    assert (
+        _sample("neurostash_ingestion_stage_seconds_count", stage="metrics_test")
+        == count + 1
+    )
+    assert (
+        _sample("neurostash_ingestion_stage_seconds_sum", stage="metrics_test")
+        >= total + 2.0
+    )
+
+
+def test_stages_outside_a_file_are_not_observed():
+    count = _sample("neurostash_ingestion_stage_seconds_count", stage="metrics_free")
+    with measure_stage("metrics_free"):
+        pass
+    assert (
+        _sample("neurostash_ingestion_stage_seconds_count", stage="metrics_free")
+        == count
+    )
@@ -0,0 +1,204 @@
+from app.dao.schema import OperationStatusEnum
+from app.processor.near_duplicates import (
+    FINGERPRINT_BITS,
+    NearDuplicateIndex,
+    fingerprint_bands,
+    is_fingerprintable,
+    simhash,
+    to_signed,
+    to_unsigned,
+)
+from tests.fakes import (
+    COLLECTION,
+    DIMENSION,
+    FakeChunkStream,
+    FakeIngestionStore,
+    FakeMilvusClient,
+    ingest_file,
+    make_file,
+    make_ingest,
+)
+
+SENTENCE = "the quarterly report shows revenue growing steadily across every region"
+
+
+def test_simhash_is_stable_and_fits_64_bits():
+    assert simhash(SENTENCE) == simhash(SENTENCE)
+    assert 0 <= simhash(SENTENCE) < 1 << FINGERPRINT_BITS
+    # case and punctuation are not part of the shingles
+    assert simhash(SENTENCE) == simhash(SENTENCE.upper() + "!")
+
+
+def test_simhash_of_a_small_edit_stays_close():
+    edited = SENTENCE.replace("steadily", "slowly")
+    unrelated = "milvus stores dense vectors next to sparse ones for hybrid search"
+    close = (simhash(SENTENCE) ^ simhash(edited)).bit_count()
+    far = (simhash(SENTENCE) ^ simhash(unrelated)).bit_count()
+    assert close < far
+
+
+def test_fingerprint_bands_keep_band_positions_apart():
+    bands = fingerprint_bands(0, bands=4)
+    assert len(set(bands)) == 4
+    assert (
+        fingerprint_bands(0xFFFF, bands=4)[0] != fingerprint_bands(0xFFFF, bands=4)[1]
+    )
+
+
+def test_fingerprints_within_bands_minus_one_bits_share_a_band():
+    fingerprint = simhash(SENTENCE)
+    flipped = fingerprint ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+    assert set(fingerprint_bands(fingerprint, bands=4)) & set(
+        fingerprint_bands(flipped, bands=4)
+    )
+
+
+def test_signed_round_trip():
+    for fingerprint in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(fingerprint)
+        assert -(1 << 63) <= signed < 1 << 63
+        assert to_unsigned(signed) == fingerprint
+
+
+def test_short_texts_are_not_fingerprinted():
+    assert not is_fingerprintable("too short to trust", min_words=8)
+    assert is_fingerprintable(SENTENCE, min_words=8)
+
+
+def test_index_returns_the_chunk_it_matched():
+    index = NearDuplicateIndex(max_distance=3)
+    fingerprint = simhash(SENTENCE)
+    index.add(fingerprint, "chunk-a")
+
+    assert index.find(fingerprint) == "chunk-a"
+    assert index.find(fingerprint ^ 0b101) == "chunk-a"
+    assert index.find(fingerprint ^ 0b1111) is None
+    assert index.find(~fingerprint & ((1 << 64) - 1)) is None
+
+
+def _paragraph(*sentences: str) -> str:
+    return ". ".join(sentences)
+
+
+FIRST = "the first sentence talks about storing parent chunks in postgres tables"
+SECOND = "the second sentence explains how child chunks are embedded in batches"
+THIRD = "the third sentence covers deleting stale vectors from the milvus collection"
+FOURTH = "the fourth sentence describes the queue that feeds every ingestion worker"
+EDITED = "an edited sentence now replaces the one that described vector deletion"
+
+
+async def test_editing_a_paragraph_keeps_its_unchanged_children(monkeypatch):
+    store = FakeIngestionStore()
+    store.install(monkeypatch)
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+
+    original = [_paragraph(FIRST, SECOND, THIRD), _paragraph(FOURTH)]
+    await ingest_file(
+        ingest, store, FakeChunkStream(original), 1, deduplicate_chunks=True
+    )
+    assert milvus.texts(1) == sorted([FIRST, SECOND, THIRD, FOURTH])
+
+    # the parent hash changes, its untouched children must not be skipped as
+    # duplicates of the parent that is about to be removed
+    edited = [_paragraph(FIRST, SECOND, EDITED), _paragraph(FOURTH)]
+    await ingest_file(
+        ingest, store, FakeChunkStream(edited), 2, deduplicate_chunks=True
+    )
+
+    assert milvus.texts(1) == sorted([FIRST, SECOND, EDITED, FOURTH])
+    assert len(store.parents) == 2
+
+
+async def test_duplicate_is_restored_when_its_original_is_removed(monkeypatch):
+    store = FakeIngestionStore()
+    store.install(monkeypatch)
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+
+    original = [_paragraph(FIRST, SECOND), _paragraph(THIRD, FIRST)]
+    await ingest_file(
+        ingest, store, FakeChunkStream(original), 1, deduplicate_chunks=True
+    )
+    # the repeat in the second paragraph is only kept as an alias
+    assert milvus.texts(1) == sorted([FIRST, SECOND, THIRD])
+
+    # the first paragraph changes and no longer holds the original, the second
+    # paragraph is unchanged and is not chunked again
+    edited = [_paragraph(FOURTH, SECOND), _paragraph(THIRD, FIRST)]
+    await ingest_file(
+        ingest, store, FakeChunkStream(edited), 2, deduplicate_chunks=True
+    )
+
+    assert milvus.texts(1) == sorted([FOURTH, SECOND, THIRD, FIRST])
+    assert not any(
+        fingerprint["duplicate_of"] is not None
+        for fingerprint in store.fingerprints.values()
+        if fingerprint["content"] == FIRST
+    )
+
+
+async def _ingest_shared_boilerplate(monkeypatch):
+    store = FakeIngestionStore()
+    store.install(monkeypatch)
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+
+    # FIRST plays the header both documents carry
+    for kb_doc_id, paragraph in (
+        (1, _paragraph(FIRST, SECOND)),
+        (2, _paragraph(FIRST, THIRD)),
+    ):
+        await ingest_file(
+            ingest,
+            store,
+            FakeChunkStream([paragraph]),
+            1,
+            file=make_file(kb_doc_id),
+            deduplicate_chunks=True,
+        )
+
+    # the knowledge base stores the shared text once
+    assert milvus.texts(1) == sorted([FIRST, SECOND])
+    assert milvus.texts(2) == [THIRD]
+    return ingest, store, milvus
+
+
+async def test_documents_share_one_copy_of_repeated_text(monkeypatch):
+    ingest, store, milvus = await _ingest_shared_boilerplate(monkeypatch)
+
+    # the first document drops the header, the second one gets its copy back
+    await ingest_file(
+        ingest,
+        store,
+        FakeChunkStream([_paragraph(FOURTH, SECOND)]),
+        2,
+        file=make_file(1),
+        deduplicate_chunks=True,
+    )
+
+    assert milvus.texts(1) == sorted([FOURTH, SECOND])
+    assert milvus.texts(2) == sorted([FIRST, THIRD])
+    row = next(row for row in milvus.rows.values() if row["text_content"] == FIRST)
+    assert row["object_key"] == make_file(2).object_key
+
+
+async def test_deleting_a_document_restores_text_it_shared(monkeypatch):
+    ingest, store, milvus = await _ingest_shared_boilerplate(monkeypatch)
+
+    statuses = await ingest.reindex_data(
+        files=[make_file(1)],
+        collection_name=COLLECTION,
+        user_id=1,
+        category="general",
+        dimension=DIMENSION,
+    )
+
+    assert statuses == [(1, OperationStatusEnum.SUCCESS)]
+    assert milvus.texts(1) == []
+    assert milvus.texts(2) == sorted([FIRST, THIRD])
+    assert all(
+        fingerprint["duplicate_of"] is None
+        for fingerprint in store.fingerprints.values()
+    )
+    assert {parent["kb_doc_id"] for parent in store.parents.values()} == {2}
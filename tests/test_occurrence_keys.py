@@ -0,0 +1,81 @@
+import pytest
+
+from app.processor.ingest_data import _occurrence_keys
+from tests.fakes import (
+    FakeChunkStream,
+    FakeIngestionStore,
+    FakeMilvusClient,
+    chunk_paragraph,
+    ingest_file,
+    make_ingest,
+)
+
+ALPHA = "alpha one. alpha two"
+BETA = "beta one. beta two"
+GAMMA = "gamma one. gamma two"
+
+
+def test_repeated_hashes_are_numbered_by_occurrence():
+    assert _occurrence_keys(["a", "b", "a", None, "a", None]) == [
+        ("a", 0),
+        ("b", 0),
+        ("a", 1),
+        (None, 0),
+        ("a", 2),
+        (None, 1),
+    ]
+
+
+def test_a_shared_seen_dict_keeps_counting_across_batches():
+    seen = {}
+    assert _occurrence_keys(["a", "b"], seen=seen) == [("a", 0), ("b", 0)]
+    assert _occurrence_keys(["a"], seen=seen) == [("a", 1)]
+    assert seen == {"a": 2, "b": 1}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeIngestionStore()
+    store.install(monkeypatch)
+    return store
+
+
+def _children(paragraphs):
+    return sorted(
+        doc.page_content
+        for paragraph in paragraphs
+        for doc in chunk_paragraph(paragraph)["child_doc"]
+    )
+
+
+async def test_reordered_parents_are_not_embedded_again(store):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+    await ingest_file(ingest, store, FakeChunkStream([ALPHA, BETA]), 1)
+
+    ingest.embedded.clear()
+    await ingest_file(ingest, store, FakeChunkStream([BETA, GAMMA, ALPHA]), 2)
+
+    assert sorted(ingest.embedded) == _children([GAMMA])
+    assert milvus.texts(1) == _children([ALPHA, BETA, GAMMA])
+
+
+async def test_one_copy_of_a_repeated_parent_is_added_and_removed(store):
+    milvus = FakeMilvusClient()
+    ingest = make_ingest(milvus)
+    await ingest_file(ingest, store, FakeChunkStream([ALPHA, BETA]), 1)
+
+    ingest.embedded.clear()
+    await ingest_file(ingest, store, FakeChunkStream([ALPHA, BETA, ALPHA]), 2)
+    # only the second occurrence is new
+    assert sorted(ingest.embedded) == _children([ALPHA])
+    assert [parent["chunk"] for parent in store.parents.values()].count(ALPHA) == 2
+
+    ingest.embedded.clear()
+    await ingest_file(ingest, store, FakeChunkStream([BETA, ALPHA]), 3)
+
+    assert ingest.embedded == []
+    assert sorted(parent["chunk"] for parent in store.parents.values()) == sorted(
+        [ALPHA, BETA]
+    )
+    assert milvus.texts(1) == _children([ALPHA, BETA])
@@ -0,0 +1,52 @@
+import os
+import socket
+import subprocess
+import sys
+
+from app.core.temp import ScratchSpace
+
+
+def _leftover(base, name):
+    path = base / name
+    path.mkdir()
+    (path / "download.pdf").write_bytes(b"partial")
+    return path
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_only_leftovers_of_dead_processes_are_purged(tmp_path):
+    hostname = socket.gethostname()
+    dead = _leftover(tmp_path, f"{hostname}-{_dead_pid()}-0badf00d")
+    running = _leftover(tmp_path, f"{hostname}-{os.getppid()}-00c0ffee")
+    other_host = _leftover(tmp_path, f"other-host-{_dead_pid()}-0badf00d")
+    reused_pid = _leftover(tmp_path, f"{hostname}-{os.getpid()}-0badf00d")
+
+    first = ScratchSpace(max_bytes=1024, directory=str(tmp_path))
+    with open(os.path.join(first.directory, "in-use.pdf"), "wb") as f:
+        f.write(b"in use")
+    second = ScratchSpace(max_bytes=1024, directory=str(tmp_path))
+
+    assert not dead.exists()
+    assert not reused_pid.exists()
+    assert running.exists()
+    assert other_host.exists()
+    # a second scratch space of the same process leaves the first one alone
+    assert os.path.exists(os.path.join(first.directory, "in-use.pdf"))
+    assert first.directory != second.directory
+
+
+async def test_reserved_paths_live_in_the_process_directory(tmp_path):
+    scratch_space = ScratchSpace(max_bytes=1024, directory=str(tmp_path))
+
+    async with scratch_space.reserve(size=10, suffix=".pdf") as path:
+        assert os.path.dirname(path) == scratch_space.directory
+        with open(path, "wb") as f:
+            f.write(b"data")
+
+    assert not os.path.exists(path)
+    assert scratch_space.used_bytes == 0
@@ -0,0 +1,155 @@
+import numpy as np
+from pymilvus.client.search_result import Hit
+
+from app.dao.models import SearchResponse
+from app.dao.schema import SearchMethodEnum
+from app.milvus.client import SEARCH_OUTPUT_FIELDS
+from app.milvus.entity import CollectionSchemaBatch, get_global_searching_configuration
+from app.milvus.searching import SearchOps
+from app.milvus.vector_layout import (
+    DENSE_VECTOR_LAYOUTS,
+    RERANK_VECTOR_FIELD,
+    decode_rerank_vector,
+    encode_dense_vectors,
+)
+
+QUERY = np.asarray([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+VECTORS = {
+    "far": np.asarray([0.0, 1.0, 0.0, 0.0], dtype=np.float32),
+    "close": np.asarray([0.9, 0.1, 0.0, 0.0], dtype=np.float32),
+    "closest": np.asarray([1.0, 0.01, 0.0, 0.0], dtype=np.float32),
+}
+
+
+def _batch(search_method):
+    return CollectionSchemaBatch(
+        ids=list(VECTORS),
+        text_dense_vectors=np.stack(list(VECTORS.values())),
+        text_contents=list(VECTORS),
+        parent_ids=[1, 2, 3],
+        category="general",
+        object_key="objects/doc.txt",
+        file_name="doc.txt",
+        user_id=1,
+        file_id=1,
+        search_method=search_method,
+    )
+
+
+class FakeMilvusOps:
+    # returns the stored rows in insertion order, the way a coarse compact index
+    # can rank them
+    def __init__(self, search_method):
+        self.rows = _batch(search_method).rows()
+        self.search_config = get_global_searching_configuration()
+        self.output_fields = None
+
+    def dense_search(
+        self, collection_name, generated_embeddings, search_method, limit, output_fields
+    ):
+        self.output_fields = output_fields
+        return [
+            [
+                Hit(
+                    {
+                        "id": row["id"],
+                        "distance": 0.0,
+                        "entity": {field: row.get(field) for field in output_fields},
+                    },
+                    pk_name="id",
+                )
+                for row in self.rows[:limit]
+            ]
+        ]
+
+    def sparse_search(self, collection_name, query, limit):
+        return []
+
+
+class FailingProvider:
+    model = "text-embedding-3-small"
+
+    def embeddings(self, *args, **kwargs):
+        raise AssertionError("the provider must not be called to rerank")
+
+
+def _search_ops(search_method):
+    search_ops = SearchOps.__new__(SearchOps)
+    search_ops.milvus_ops = FakeMilvusOps(search_method)
+    search_ops.embedding_provider = FailingProvider()
+    return search_ops
+
+
+def test_compact_layouts_store_a_half_precision_copy():
+    for search_method in (SearchMethodEnum.HNSW_INT8, SearchMethodEnum.BIN_IVF_FLAT):
+        layout = DENSE_VECTOR_LAYOUTS[search_method]
+        row = _batch(search_method).rows()[1]
+        assert row[RERANK_VECTOR_FIELD].dtype == np.float16
+        np.testing.assert_allclose(
+            decode_rerank_vector(row[RERANK_VECTOR_FIELD].tobytes(), layout),
+            VECTORS["close"],
+            atol=1e-3,
+        )
+
+    row = _batch(SearchMethodEnum.HNSW).rows()[1]
+    assert RERANK_VECTOR_FIELD not in row
+
+
+def test_float16_vectors_decode_from_the_bytes_milvus_returns():
+    layout = DENSE_VECTOR_LAYOUTS[SearchMethodEnum.HNSW_FP16]
+    encoded = encode_dense_vectors(VECTORS["close"][None, :], layout)[0]
+    np.testing.assert_allclose(
+        decode_rerank_vector([encoded.tobytes()], layout), VECTORS["close"], atol=1e-3
+    )
+
+
+async def test_rerank_scores_candidates_with_the_stored_vectors():
+    for search_method in (
+        SearchMethodEnum.HNSW_INT8,
+        SearchMethodEnum.BIN_IVF_FLAT,
+        SearchMethodEnum.HNSW,
+    ):
+        search_ops = _search_ops(search_method)
+        result = await search_ops._reranked_search(
+            collection_name="collection",
+            query="query",
+            generated_embeddings=QUERY.tolist(),
+            limit=2,
+            search_method=search_method,
+        )
+
+        assert [hit.id for hit in result[0]] == ["closest", "close"]
+
+
+async def test_candidates_without_a_stored_vector_keep_their_index_order():
+    search_ops = _search_ops(SearchMethodEnum.HNSW_INT8)
+    del search_ops.milvus_ops.rows[2][RERANK_VECTOR_FIELD]
+
+    result = await search_ops._reranked_search(
+        collection_name="collection",
+        query="query",
+        generated_embeddings=QUERY.tolist(),
+        limit=3,
+        search_method=SearchMethodEnum.HNSW_INT8,
+    )
+
+    assert [hit.id for hit in result[0]] == ["close", "far", "closest"]
+
+
+async def test_rerank_vectors_are_not_returned_to_the_client():
+    for search_method in (SearchMethodEnum.HNSW_INT8, SearchMethodEnum.HNSW):
+        search_ops = _search_ops(search_method)
+        result = await search_ops._reranked_search(
+            collection_name="collection",
+            query="query",
+            generated_embeddings=QUERY.tolist(),
+            limit=3,
+            search_method=search_method,
+        )
+
+        for hit in result[0]:
+            assert set(hit["entity"]) == set(SEARCH_OUTPUT_FIELDS)
+        # float16 bytes would fail to serialise in the route's response model
+        SearchResponse(
+            message="ok", response=[hit.to_dict() for hit in result[0]]
+        ).model_dump_json()